@@ -21,8 +21,13 @@ from __future__ import absolute_import
 import importlib
 import logging
 
+import metrics
 from ovirt_provider_config_common import auth_plugin
+from ovirt_provider_config_common import auth_token_cache_negative_ttl
+from ovirt_provider_config_common import auth_token_cache_size
+from ovirt_provider_config_common import auth_token_cache_ttl
 from .plugin import Plugin
+from .plugin_facade import CachingPlugin
 
 
 TOKEN_HTTP_HEADER_FIELD_NAME = 'X-Auth-Token'
@@ -32,7 +37,22 @@ plugin = None
 
 def init():
     global plugin
-    plugin = _load_plugin(auth_plugin())
+    plugin = _cache_validations(_load_plugin(auth_plugin()))
+
+
+def _cache_validations(loaded_plugin):
+    if auth_token_cache_size() <= 0 or auth_token_cache_ttl() <= 0:
+        return loaded_plugin
+    caching_plugin = CachingPlugin(
+        loaded_plugin,
+        max_size=auth_token_cache_size(),
+        ttl=auth_token_cache_ttl(),
+        negative_ttl=auth_token_cache_negative_ttl(),
+    )
+    metrics.add_stats(
+        'auth_token_cache', 'Token validations cache', caching_plugin.stats
+    )
+    return caching_plugin
 
 
 def _load_plugin(plugin_name):
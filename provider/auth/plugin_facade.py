@@ -18,7 +18,16 @@
 #
 from __future__ import absolute_import
 
+from collections import namedtuple
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
 import auth.core
+import metrics
+from .errors import Unauthorized
+from .plugin import Plugin
 
 
 def create_token(user_at_domain, user_password):
@@ -28,4 +37,123 @@ def create_token(user_at_domain, user_password):
 
 def validate_token(token):
     auth.core.plugin_loaded()
-    return auth.core.plugin.validate_token(token)
+    start = time.monotonic()
+    result = 'error'
+    try:
+        valid = auth.core.plugin.validate_token(token)
+        result = 'valid' if valid else 'invalid'
+        return valid
+    except Unauthorized:
+        result = 'invalid'
+        raise
+    finally:
+        metrics.AUTH_VALIDATION_DURATION.observe(
+            time.monotonic() - start, (result,)
+        )
+
+
+class _Outcome(namedtuple('_Outcome', ['result', 'error', 'expires'])):
+    # The error is kept as the type and the arguments of the exception: a
+    # single instance raised again and again, from concurrent threads too,
+    # would keep growing its traceback
+    def get(self):
+        if self.error:
+            error_type, error_args = self.error
+            raise error_type(*error_args)
+        return self.result
+
+
+class _PendingValidation(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.outcome = None
+
+
+class CachingPlugin(Plugin):
+    """
+    Wraps a plugin and remembers the outcome of validate_token.
+    Valid tokens are remembered for `ttl` seconds, rejected tokens for
+    `negative_ttl` seconds. Timeouts and errors reaching the engine are
+    never remembered. Concurrent validations of the same token wait for a
+    single call of the wrapped plugin.
+    Tokens are kept only as sha256 digests, the least recently used ones are
+    dropped above `max_size` entries.
+    """
+
+    def __init__(
+        self, plugin, max_size, ttl, negative_ttl, clock=time.monotonic
+    ):
+        self.plugin = plugin
+        self._max_size = max_size
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = OrderedDict()
+        self._pending = {}
+        self._hits = 0
+        self._misses = 0
+        self._collapsed = 0
+
+    def create_token(self, user_at_domain, user_password):
+        return self.plugin.create_token(user_at_domain, user_password)
+
+    def validate_token(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            outcome = self._outcomes.get(key)
+            if outcome and outcome.expires > self._clock():
+                self._outcomes.move_to_end(key)
+                self._hits += 1
+                return outcome.get()
+            pending = self._pending.get(key)
+            waiting = pending is not None
+            if waiting:
+                self._collapsed += 1
+            else:
+                self._misses += 1
+                pending = self._pending[key] = _PendingValidation()
+        if waiting:
+            pending.done.wait()
+            return pending.outcome.get()
+        try:
+            pending.outcome = self._validate(key, token)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+        return pending.outcome.get()
+
+    def _validate(self, key, token):
+        try:
+            result = self.plugin.validate_token(token)
+        except Unauthorized as e:
+            return self._remember(
+                key, _Outcome(None, _error(e), self._negative_ttl)
+            )
+        except Exception as e:
+            return _Outcome(None, _error(e), 0)
+        ttl = self._ttl if result else self._negative_ttl
+        return self._remember(key, _Outcome(result, None, ttl))
+
+    def _remember(self, key, outcome):
+        outcome = outcome._replace(expires=self._clock() + outcome.expires)
+        with self._lock:
+            self._outcomes[key] = outcome
+            self._outcomes.move_to_end(key)
+            while len(self._outcomes) > self._max_size:
+                self._outcomes.popitem(last=False)
+        return outcome
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._outcomes),
+                'hits': self._hits,
+                'misses': self._misses,
+                'collapsed': self._collapsed,
+            }
+
+
+def _error(exception):
+    return type(exception), exception.args
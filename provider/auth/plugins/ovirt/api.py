@@ -23,6 +23,8 @@ import requests
 from auth import Forbidden
 from auth import Timeout
 
+from . import engine_session
+
 API_PATH = '/api'
 HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'}
 
@@ -46,10 +48,10 @@ def follow_link(obj, rel, engine_host, token, ca_file, timeout):
 
 def _http_get(url, token, ca_file, timeout, params=None):
     try:
-        response = requests.get(
+        response = engine_session.get(
             url,
+            ca_file,
             headers=_get_headers(token),
-            verify=ca_file,
             timeout=timeout,
             params=params,
         )
@@ -0,0 +1,118 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+import os
+import ssl
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves import urllib_parse
+from six.moves.http_cookiejar import DefaultCookiePolicy
+
+from . import plugin
+
+# The requests to the engine share a session, keeping the connections alive,
+# per engine origin and CA file. The CA file of a session is loaded once into
+# an SSL context used by all of its connections.
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get(url, ca_file, **kwargs):
+    return _session(url, ca_file).get(url, verify=ca_file, **kwargs)
+
+
+def post(url, ca_file, **kwargs):
+    return _session(url, ca_file).post(url, verify=ca_file, **kwargs)
+
+
+def close():
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def _session(url, ca_file):
+    parts = urllib_parse.urlsplit(url)
+    key = (parts.scheme.lower(), parts.netloc.lower(), ca_file)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _create_session(
+                    parts.scheme.lower(), ca_file
+                )
+    return session
+
+
+def _create_session(scheme, ca_file):
+    session = requests.Session()
+    # The requests are authenticated by the tokens of different users, a
+    # cookie set by the engine for one of them must not be sent for another
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    ssl_context = None
+    if scheme == 'https' and _is_ca_file(ca_file):
+        ssl_context = ssl.create_default_context(cafile=ca_file)
+    adapter = _EngineAdapter(ssl_context, _pool_size())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _is_ca_file(ca_file):
+    return isinstance(ca_file, str) and os.path.isfile(ca_file)
+
+
+def _pool_size():
+    # The plugin module imports this one, it is resolved on use
+    return plugin.OVirtPlugin._http_pool_size()
+
+
+class _EngineAdapter(HTTPAdapter):
+    def __init__(self, ssl_context, pool_size):
+        self._ssl_context = ssl_context
+        super(_EngineAdapter, self).__init__(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._ssl_context is not None:
+            kwargs['ssl_context'] = self._ssl_context
+        super(_EngineAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super(
+            _EngineAdapter, self
+        ).build_connection_pool_key_attributes(request, verify, cert)
+        if self._ssl_context is not None:
+            # The CA file is already loaded into the SSL context, passing it
+            # on would load it again for each new connection
+            pool_kwargs.pop('ca_certs', None)
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        super(_EngineAdapter, self).cert_verify(conn, url, verify, cert)
+        if self._ssl_context is not None:
+            conn.ca_certs = None
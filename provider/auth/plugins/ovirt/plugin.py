@@ -26,6 +26,7 @@ from ovirt_provider_config import KEY_OVIRT_HOST
 from ovirt_provider_config import KEY_OVIRT_BASE
 from ovirt_provider_config import KEY_OVIRT_CA_FILE
 from ovirt_provider_config import KEY_OVIRT_AUTH_TIMEOUT
+from ovirt_provider_config import KEY_OVIRT_HTTP_POOL_SIZE
 from ovirt_provider_config import KEY_OVIRT_SSO_CLIENT_ID
 from ovirt_provider_config import KEY_OVIRT_SSO_CLIENT_SECRET
 from ovirt_provider_config import DEFAULT_OVIRT_HOST
@@ -34,6 +35,7 @@ from ovirt_provider_config import DEFAULT_OVIRT_CA_FILE
 from ovirt_provider_config import DEFAULT_OVIRT_SSO_CLIENT_ID
 from ovirt_provider_config import DEFAULT_OVIRT_SSO_CLIENT_SECRET
 from ovirt_provider_config import DEFAULT_OVIRT_AUTH_TIMEOUT
+from ovirt_provider_config import DEFAULT_OVIRT_HTTP_POOL_SIZE
 
 from . import sso
 
@@ -78,6 +80,14 @@ class OVirtPlugin(Plugin):
             DEFAULT_OVIRT_AUTH_TIMEOUT,
         )
 
+    @staticmethod
+    def _http_pool_size():
+        return ovirt_provider_config.getint(
+            CONFIG_SECTION_OVIRT,
+            KEY_OVIRT_HTTP_POOL_SIZE,
+            DEFAULT_OVIRT_HTTP_POOL_SIZE,
+        )
+
     @staticmethod
     def _sso_client_id():
         return ovirt_provider_config.get(
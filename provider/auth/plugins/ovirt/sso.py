@@ -25,6 +25,8 @@ from auth import BadGateway
 from auth import Unauthorized
 from auth import Timeout
 
+from . import engine_session
+
 AUTH_PATH = '/sso/oauth'
 TOKEN_PATH = '/token'
 TOKEN_INFO_PATH = '/token-info'
@@ -63,11 +65,11 @@ def _inspect_response(func):
 
 @_inspect_response
 @_translate_request_exception
-def _post(url, *args, **kwargs):
+def _post(url, ca_file, **kwargs):
     _get_logger().debug(
         'Connecting to oVirt engine\'s SSO module: {}'.format(url)
     )
-    return requests.post(url, *args, **kwargs)
+    return engine_session.post(url, ca_file, **kwargs)
 
 
 def _get_logger():
@@ -92,7 +94,7 @@ def _get_sso_token(username, password, engine_url, ca_file, timeout):
         _token_url(engine_url),
         headers=AUTH_HEADERS,
         data=post_data,
-        verify=ca_file,
+        ca_file=ca_file,
         timeout=timeout,
     )
 
@@ -125,7 +127,7 @@ def _profile_list(
             'scope': PUBLIC_AUTHZ_SEARCH_SCOPE,
         },
         auth=(client_id, client_secret),
-        verify=ca_file,
+        ca_file=ca_file,
         timeout=timeout,
     )
 
@@ -138,7 +140,7 @@ def get_token_info(
         headers=AUTH_HEADERS,
         data={'token': token},
         auth=(client_id, client_secret),
-        verify=ca_file,
+        ca_file=ca_file,
         timeout=timeout,
     )
 
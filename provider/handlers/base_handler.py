@@ -19,14 +19,20 @@
 from __future__ import absolute_import
 
 import abc
+from collections.abc import Iterator
+import html
+import itertools
 import json as libjson
 import logging
 import six
+import time
 
 from six.moves.BaseHTTPServer import BaseHTTPRequestHandler
 from six.moves import http_client
 from six.moves import urllib_parse
 
+import metrics
+
 from auth import BadGateway
 from auth import Forbidden
 from auth import Unauthorized
@@ -52,12 +58,18 @@ ERROR_MESSAGE = """
 
 ERROR_CONTENT_TYPE = 'application/json'
 
+# Responses are streamed in chunks of at least this size, smaller ones are
+# sent at once with their length
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class Response(object):
-    def __init__(self, json=None, code=None, headers=None):
+    def __init__(self, json=None, code=None, headers=None, filtered=False):
         self.body = json
         self.code = code
         self.headers = headers
+        # The body has already been filtered by the query of the request
+        self.filtered = filtered
 
 
 class PathNotFoundError(AttributeError):
@@ -90,7 +102,20 @@ class BaseHandler(BaseHTTPRequestHandler):
         error_message_format = ERROR_MESSAGE
     error_content_type = ERROR_CONTENT_TYPE
 
-    # TODO: this is made configurable in a later patch
+    # Connections are kept open between requests as long as the server
+    # agrees, see _keep_connection_alive
+    protocol_version = 'HTTP/1.1'
+    server = None
+    query = None
+    # A handlers.response_cache.ResponseCache for the responses of the
+    # requests is_cached tells, or None to build every response
+    response_cache = None
+    # A profiler.RequestProfiler picking the requests to profile, or None
+    profiler = None
+    _requests_on_connection = 0
+    _request_consumed = False
+    _route = None
+    _response_code = None
 
     def __init__(self, request, client_address, server):
         self._run_server(request, client_address, server)
@@ -98,6 +123,27 @@ class BaseHandler(BaseHTTPRequestHandler):
     def _run_server(self, request, client_address, server):
         BaseHTTPRequestHandler.__init__(self, request, client_address, server)
 
+    def setup(self):
+        self.timeout = getattr(self.server, 'keep_alive_timeout', None)
+        BaseHTTPRequestHandler.setup(self)
+
+    def handle_one_request(self):
+        # Waiting for the next request on a kept alive connection may be cut
+        # short by the server, to free the worker for a queued connection
+        wait_for_request = getattr(self.server, 'wait_for_request', None)
+        if (
+            self._requests_on_connection
+            and wait_for_request
+            and not wait_for_request(self.connection, self.rfile, self.timeout)
+        ):
+            self.close_connection = True
+            return
+        BaseHTTPRequestHandler.handle_one_request(self)
+
+    def parse_request(self):
+        self._request_consumed = False
+        return BaseHTTPRequestHandler.parse_request(self)
+
     def do_GET(self):
         self._handle_request(GET, code=http_client.OK)
 
@@ -135,19 +181,91 @@ class BaseHandler(BaseHTTPRequestHandler):
                 ),
             )
 
+    def send_response(self, code, message=None):
+        self._response_code = code
+        BaseHTTPRequestHandler.send_response(self, code, message)
+
     def _handle_request(self, method, code=http_client.OK, content=None):
+        handler = type(self).__name__
+        self._route = None
+        self._response_code = None
+        metrics.REQUESTS_IN_FLIGHT.inc((handler,))
+        profile = self.profiler.start(self.headers) if self.profiler else None
+        start = time.monotonic()
+        try:
+            self._serve_request(method, code, content)
+        finally:
+            duration = time.monotonic() - start
+            metrics.REQUESTS_IN_FLIGHT.dec((handler,))
+            metrics.REQUEST_DURATION.observe(
+                duration,
+                (
+                    handler,
+                    method,
+                    self._route or 'unknown',
+                    str(self._response_code),
+                ),
+            )
+            if profile:
+                self.profiler.finish(
+                    profile,
+                    duration,
+                    '{method} {path} {route} {code}'.format(
+                        method=method,
+                        path=self.path,
+                        route=self._route,
+                        code=self._response_code,
+                    ),
+                    authenticated=self._is_authenticated(),
+                )
+
+    def _is_authenticated(self):
+        """
+        :return: Whether the request served last was authenticated
+        """
+        return False
+
+    def _serve_request(self, method, code, content):
+        self._request_consumed = True
         self._log_request(method, self.path, content)
         try:
             path_parts, query = self._parse_request_path(self.path)
+            self.query = query
+            self._route = self.get_route(method, path_parts)
             self._validate_request(method, id)
+            etag = self.get_etag(method, path_parts) if method == GET else None
+            if etag and self._is_not_modified(etag):
+                self._process_not_modified(etag)
+                return
+            cache = (
+                self.response_cache
+                if etag and self.is_cached(method, path_parts)
+                else None
+            )
+            cached_body = cache.get(self.path, etag) if cache else None
+            if cached_body is not None:
+                self._process_encoded_response(cached_body, code, etag)
+                return
             response = self.handle_request(method, path_parts, content)
             result = (
                 self._filter_results(query, response)
-                if should_be_filtered(response.body, query, path_parts, method)
+                if not response.filtered
+                and should_be_filtered(
+                    response.body, query, path_parts, method
+                )
                 else response.body
             )
-            body = libjson.dumps(result) if result else None
-            self._process_response(body, response.code or code)
+            if response.code not in (None, code):
+                cache = None
+            if _is_streamed(result):
+                self._process_streamed_response(
+                    result, response.code or code, etag, cache
+                )
+            else:
+                body = libjson.dumps(result) if result else None
+                if cache and body:
+                    cache.put(self.path, etag, body.encode())
+                self._process_response(body, response.code or code, etag)
         except PathNotFoundError as e:
             message = 'Incorrect path: {}'.format(self.path)
             self._handle_response_exception(
@@ -248,24 +366,145 @@ class BaseHandler(BaseHTTPRequestHandler):
                 '{method} request must specify an id'.format(method=method)
             )
 
-    def _process_response(self, response, response_code):
-        self._set_response_headers(response_code, response)
+    def _is_not_modified(self, etag):
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        # GET requests use the weak comparison
+        return '*' in tags or etag in (
+            tag[2:] if tag.startswith('W/') else tag for tag in tags
+        )
+
+    def _process_not_modified(self, etag):
+        logging.debug('Response code: {}'.format(http_client.NOT_MODIFIED))
+        self.send_response(http_client.NOT_MODIFIED)
+        self.send_header('ETag', etag)
+        self._send_connection_header()
+        self.end_headers()
+
+    def _process_response(self, response, response_code, etag=None):
+        body = response.encode() if response else None
+        self._set_response_headers(response_code, body, etag)
         logging.debug('Response code: {}'.format(response_code))
-        if response:
+        if body:
             logging.debug('Response body: {}'.format(response))
-            self.wfile.write(response.encode())
+            self.wfile.write(body)
+
+    def _process_encoded_response(self, body, response_code, etag=None):
+        self._set_response_headers(response_code, body, etag)
+        logging.debug('Response code: {}'.format(response_code))
+        self.wfile.write(body)
+
+    def _process_streamed_response(
+        self, result, response_code, etag=None, cache=None
+    ):
+        """
+        Writes the JSON document chunk by chunk, while the iterators in the
+        result are consumed. The first chunk is encoded before any header is
+        sent, so failures to start the response are still reported as
+        errors.
+        If a cache is given, the document is kept in it once it was sent.
+        """
+        chunks = _encode_json_chunks(result, STREAM_CHUNK_SIZE)
+        if cache:
+            chunks = cache.collect(self.path, etag, chunks)
+        first_chunk = next(chunks)
+        next_chunk = next(chunks, None)
+        logging.debug('Response code: {}'.format(response_code))
+        if next_chunk is None:
+            self._set_response_headers(response_code, first_chunk, etag)
+            self.wfile.write(first_chunk)
+            return
+
+        chunked = getattr(self, 'request_version', None) == 'HTTP/1.1'
+        self.send_response(response_code)
+        self.send_header('Content-Type', 'application/json')
+        if etag:
+            self.send_header('ETag', etag)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self._send_connection_header()
+        else:
+            # The end of a body of unknown length is marked by closing
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        try:
+            for chunk in itertools.chain((first_chunk, next_chunk), chunks):
+                if not chunk:
+                    continue
+                if chunked:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                else:
+                    self.wfile.write(chunk)
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except Exception:
+            # Too late for an error response, the client sees the response
+            # is incomplete when the connection is closed
+            logging.exception(
+                'Failed to stream the response to {path}'.format(
+                    path=self.path
+                )
+            )
+            self.close_connection = True
 
     def _get_content(self):
         content_length = int(self.headers['Content-Length'])
         content = self.rfile.read(content_length)
         return content
 
-    def _set_response_headers(self, response_code, response):
+    def _set_response_headers(self, response_code, response, etag=None):
         self.send_response(response_code)
         if response:
             self.send_header('Content-Type', 'application/json')
+        if etag:
+            self.send_header('ETag', etag)
+        if response_code != http_client.NO_CONTENT:
+            self.send_header(
+                'Content-Length', str(len(response) if response else 0)
+            )
+        self._send_connection_header()
         self.end_headers()
 
+    def _send_connection_header(self):
+        if not self._keep_connection_alive():
+            self.send_header('Connection', 'close')
+
+    def _keep_connection_alive(self):
+        self._requests_on_connection += 1
+        keep_alive = getattr(self.server, 'keep_alive', None)
+        return keep_alive is None or keep_alive(self._requests_on_connection)
+
+    def send_error(self, code, message=None, explain=None):
+        """
+        BaseHTTPRequestHandler.send_error always closes the connection. This
+        is still done for requests which could not be parsed, but errors
+        reported for a completely read request keep the connection open.
+        """
+        if six.PY2 or not self._request_consumed:
+            BaseHTTPRequestHandler.send_error(self, code, message, explain)
+            return
+        shortmsg, longmsg = self.responses.get(code, ('???', '???'))
+        message = shortmsg if message is None else message
+        explain = longmsg if explain is None else explain
+        self.log_error('code %d, message %s', code, message)
+        body = (
+            self.error_message_format
+            % {
+                'code': code,
+                'message': html.escape(message, quote=False),
+                'explain': html.escape(explain, quote=False),
+            }
+        ).encode('UTF-8', 'replace')
+        self.send_response(code, message)
+        self.send_header('Content-Type', self.error_content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self._send_connection_header()
+        self.end_headers()
+        self.wfile.write(body)
+
     def _handle_response_exception(
         self,
         e,
@@ -318,3 +557,68 @@ class BaseHandler(BaseHTTPRequestHandler):
         :return: An instance of Response
         """
         pass
+
+    def get_etag(self, method, path_parts):
+        """
+        :return: The entity tag of the response to a GET request, or None if
+        the response is not tagged. It has to be known before the request is
+        handled, so requests repeating the tag of the current response in
+        If-None-Match are answered with 304 Not Modified without building the
+        response.
+        """
+        return None
+
+    def get_route(self, method, path_parts):
+        """
+        :return: The name of the route serving the request, used to tell
+        apart the requests in the metrics, or None if the path is unknown
+        """
+        return None
+
+    def is_cached(self, method, path_parts):
+        """
+        :return: True if the response to a GET request may be served from
+        response_cache, as long as its entity tag does not change
+        """
+        return False
+
+
+def _is_streamed(result):
+    return isinstance(result, dict) and any(
+        isinstance(value, Iterator) for value in result.values()
+    )
+
+
+def _encode_json_chunks(result, chunk_size):
+    chunk = []
+    length = 0
+    for part in _encode_json_parts(result):
+        chunk.append(part)
+        length += len(part)
+        if length >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            length = 0
+    yield b''.join(chunk)
+
+
+def _encode_json_parts(result):
+    """
+    Encodes the dict like json.dumps does, but the values which are iterators
+    are encoded as lists, item by item.
+    """
+    yield b'{'
+    for i, (key, value) in enumerate(result.items()):
+        if i:
+            yield b', '
+        yield libjson.dumps(key).encode() + b': '
+        if isinstance(value, Iterator):
+            yield b'['
+            for j, item in enumerate(value):
+                if j:
+                    yield b', '
+                yield libjson.dumps(item).encode()
+            yield b']'
+        else:
+            yield libjson.dumps(value).encode()
+    yield b'}'
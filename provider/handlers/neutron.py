@@ -18,21 +18,114 @@
 #
 from __future__ import absolute_import
 
+import logging
+
+import ovn_connection
+
 from auth import validate_token
 from auth import Forbidden
 from auth import TOKEN_HTTP_HEADER_FIELD_NAME
+from handlers import GET
+from handlers.base_handler import ConflictError
 from handlers.selecting_handler import SelectingHandler
 from handlers.neutron_responses import responses
 from neutron.neutron_api import NeutronApi
+from ovndb.group_commit import StaleTransaction
+from ovirt_provider_config_common import config_snapshot
+
+# The times a change is validated, if it turns out to have been validated
+# against an outdated replica
+MAX_VALIDATIONS = 3
 
 
 class NeutronHandler(SelectingHandler):
+    def handle_request(self, method, path_parts, content):
+        if method == GET:
+            return SelectingHandler.handle_request(
+                self, method, path_parts, content
+            )
+        # The token may be validated by a round trip to the engine, which
+        # must not hold back the changes of the other requests. Requests for
+        # unknown routes still fail as such, whatever their token.
+        self.get_response_handler(self.get_responses(), method, path_parts)
+        self._validate_token()
+        # Requests are served by concurrent workers, but changes are still
+        # validated one at a time, see ovn_connection.write_lock. A request
+        # validated against an outdated replica is validated again once the
+        # changes pending are committed, holding the lock until its own are.
+        for validation in range(MAX_VALIDATIONS):
+            try:
+                with ovn_connection.write_lock(exclusive=validation > 0):
+                    return SelectingHandler.handle_request(
+                        self, method, path_parts, content
+                    )
+            except StaleTransaction:
+                logging.debug(
+                    'Validating %s %s again, as the replica was outdated',
+                    method,
+                    self.path,
+                )
+        raise ConflictError(
+            'The request conflicted with concurrent changes {} times'.format(
+                MAX_VALIDATIONS
+            )
+        )
+
+    # The NeutronApi serving the request in progress, GET requests may be
+    # served from the follower replica
+    _neutron_api = None
+    _reading = False
+    # The token is validated once per request, even if both the version and
+    # the content of the response are read
+    _token_validated = False
+
+    def _serve_request(self, method, code, content):
+        self._reading = method == GET
+        self._token_validated = False
+        try:
+            return SelectingHandler._serve_request(self, method, code, content)
+        finally:
+            self._neutron_api = None
+
+    def _get_neutron_api(self):
+        # Picked once, so that the version and the content of a response are
+        # read from the same replica
+        if self._neutron_api is None:
+            self._neutron_api = (
+                NeutronApi.shared_reader()
+                if self._reading
+                else NeutronApi.shared()
+            )
+        return self._neutron_api
+
     def call_response_handler(self, response_handler, content, parameters):
+        self._validate_token()
+        return response_handler(self._get_neutron_api(), content, parameters)
+
+    def get_version(self, tables):
+        # Even whether anything changed is told only to authorized clients
+        self._validate_token()
+        version = ovn_connection.table_version(
+            self._get_neutron_api().idl, tables
+        )
+        if version is None:
+            return None
+        # The responses depend on the configuration too, e.g. the tenant id
+        return '{generation}-{version}'.format(
+            generation=config_snapshot().generation, version=version
+        )
+
+    def _is_authenticated(self):
+        return self._token_validated
+
+    def _validate_token(self):
+        if self._token_validated:
+            return
         if not validate_token(
             self.headers.get(TOKEN_HTTP_HEADER_FIELD_NAME, '')
         ):
             raise Forbidden()
-        return response_handler(NeutronApi(), content, parameters)
+        self._token_validated = True
 
     @staticmethod
     def get_responses():
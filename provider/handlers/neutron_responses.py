@@ -19,14 +19,23 @@ from __future__ import absolute_import
 
 import json
 
+import constants as ovnconst
+
 from handlers.base_handler import GET
 from handlers.base_handler import DELETE
 from handlers.base_handler import POST
 from handlers.base_handler import PUT
 from handlers.base_handler import Response
 
+from handlers.pagination import page_links
+from handlers.responses_utils import get_entities
 from handlers.responses_utils import get_entity
+from handlers.responses_utils import get_filters
+from handlers.responses_utils import get_page
+from handlers.responses_utils import get_query
 from handlers.selecting_handler import rest
+from handlers.selecting_handler import cached
+from handlers.selecting_handler import versioned_by
 from ovirt_provider_config_common import neutron_url_with_version
 
 
@@ -57,21 +66,43 @@ EXTENSION_ENTITY = 'extensions/{alias}'
 
 FLOATINGIPS = 'floatingips'
 
+# The tables the entities are read from
+NETWORK_TABLES = (ovnconst.TABLE_LS, ovnconst.TABLE_LSP)
+PORT_TABLES = (
+    ovnconst.TABLE_LSP,
+    ovnconst.TABLE_LS,
+    ovnconst.TABLE_DHCP_Options,
+    ovnconst.TABLE_LRP,
+)
+SUBNET_TABLES = (ovnconst.TABLE_DHCP_Options,)
+ROUTER_TABLES = (
+    ovnconst.TABLE_LR,
+    ovnconst.TABLE_ROUTES,
+    ovnconst.TABLE_LSP,
+    ovnconst.TABLE_LS,
+    ovnconst.TABLE_DHCP_Options,
+    ovnconst.TABLE_LRP,
+)
+SECURITY_GROUP_TABLES = (ovnconst.TABLE_PORT_GROUP, ovnconst.TABLE_ACL)
+
 
 _responses = {}
 
 
 @rest(GET, NETWORK_ENTITY, _responses)
+@versioned_by(*NETWORK_TABLES)
 def show_network(nb_db, content, parameters):
     return Response({'network': nb_db.get_network(parameters[NETWORK_ID])})
 
 
 @rest(GET, PORT_ENTITY, _responses)
+@versioned_by(*PORT_TABLES)
 def show_port(nb_db, content, parameters):
     return Response({'port': nb_db.get_port(parameters[PORT_ID])})
 
 
 @rest(GET, SUBNET_ENTITY, _responses)
+@versioned_by(*SUBNET_TABLES)
 def show_subnet(nb_db, content, parameters):
     return Response({'subnet': nb_db.get_subnet(parameters[SUBNET_ID])})
 
@@ -105,20 +136,46 @@ def show_extension(nb_db, content, parameters):
 
 
 @rest(GET, NETWORKS, _responses)
+@versioned_by(*NETWORK_TABLES)
+@cached
 def get_networks(nb_db, content, parameters):
-    networks = nb_db.list_networks()
-    return Response({'networks': networks})
+    return _list_response(NETWORKS, nb_db.iter_networks, parameters)
 
 
 @rest(GET, PORTS, _responses)
+@versioned_by(*PORT_TABLES)
+@cached
 def get_ports(nb_db, content, parameters):
-    ports = nb_db.list_ports()
-    return Response({'ports': ports})
+    return _list_response(PORTS, nb_db.iter_ports, parameters)
 
 
 @rest(GET, SUBNETS, _responses)
+@versioned_by(*SUBNET_TABLES)
+@cached
 def get_subnets(nb_db, content, parameters):
-    return Response({'subnets': nb_db.list_subnets()})
+    return _list_response(SUBNETS, nb_db.iter_subnets, parameters)
+
+
+def _list_response(collection, iter_entities, parameters):
+    page = get_page(parameters)
+    entities = iter_entities(get_filters(parameters), page)
+    if not page.is_paginated:
+        # Streamed to the client as the entities are mapped
+        return Response(
+            {collection: (page.project(entity) for entity in entities)},
+            filtered=True,
+        )
+    entities = list(entities)
+    body = {collection: [page.project(entity) for entity in entities]}
+    links = page_links(
+        neutron_url_with_version() + collection,
+        entities,
+        page,
+        get_query(parameters),
+    )
+    if links:
+        body[collection + '_links'] = links
+    return Response(body, filtered=True)
 
 
 @rest(DELETE, NETWORK_ENTITY, _responses)
@@ -141,23 +198,26 @@ def delete_subnet(nb_db, content, parameters):
 
 @rest(POST, NETWORKS, _responses)
 def post_networks(nb_db, content, parameters):
-    received_network = get_entity(content, 'network')
-    network = nb_db.add_network(received_network)
-    return Response({'network': network})
+    received_networks, bulk = get_entities(content, 'network', NETWORKS)
+    if bulk:
+        return Response({NETWORKS: nb_db.add_networks(received_networks)})
+    return Response({'network': nb_db.add_network(received_networks[0])})
 
 
 @rest(POST, PORTS, _responses)
 def post_ports(nb_db, content, parameters):
-    received_port = get_entity(content, 'port')
-    port = nb_db.add_port(received_port)
-    return Response({'port': port})
+    received_ports, bulk = get_entities(content, 'port', PORTS)
+    if bulk:
+        return Response({PORTS: nb_db.add_ports(received_ports)})
+    return Response({'port': nb_db.add_port(received_ports[0])})
 
 
 @rest(POST, SUBNETS, _responses)
 def post_subnets(nb_db, content, parameters):
-    received_subnet = get_entity(content, 'subnet')
-    subnet = nb_db.add_subnet(received_subnet)
-    return Response({'subnet': subnet})
+    received_subnets, bulk = get_entities(content, 'subnet', SUBNETS)
+    if bulk:
+        return Response({SUBNETS: nb_db.add_subnets(received_subnets)})
+    return Response({'subnet': nb_db.add_subnet(received_subnets[0])})
 
 
 @rest(PUT, NETWORK_ENTITY, _responses)
@@ -198,8 +258,10 @@ def get_debug(nb_db, content, parameters):
 
 
 @rest(GET, ROUTERS, _responses)
+@versioned_by(*ROUTER_TABLES)
+@cached
 def get_routers(nb_db, content, parameters):
-    return Response({'routers': nb_db.list_routers()})
+    return _list_response(ROUTERS, nb_db.iter_routers, parameters)
 
 
 @rest(POST, ROUTERS, _responses)
@@ -251,6 +313,8 @@ def get_floating_ips(nb_db, content, parameters):
 
 
 @rest(GET, SECURITY_GROUPS, _responses)
+@versioned_by(*SECURITY_GROUP_TABLES)
+@cached
 def get_security_groups(nb_db, content, parameters):
     return Response({'security_groups': nb_db.list_security_groups()})
 
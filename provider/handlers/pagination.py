@@ -0,0 +1,118 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+from six.moves import urllib_parse
+
+from handlers.base_handler import BadRequestError
+from handlers.query_filter import FIELDS
+from handlers.query_filter import LIMIT
+from handlers.query_filter import MARKER
+from handlers.query_filter import PAGE_REVERSE
+
+ID = 'id'
+
+
+class Page(namedtuple('Page', ['limit', 'marker', 'reverse', 'fields'])):
+    """
+    The page of a list requested by the limit, marker and page_reverse
+    query parameters, and the fields requested by the fields parameters.
+    Paginated lists are sorted by id. A page holds the entities following
+    the marker, or preceding it if reversed, in ascending order.
+    """
+
+    @property
+    def is_paginated(self):
+        return bool(self.limit or self.marker or self.reverse)
+
+    def requires(self, field, filters=None):
+        """
+        :return: True if the field has to be computed, to be returned or
+        filtered on.
+        """
+        return (
+            not self.fields or field in self.fields or field in (filters or {})
+        )
+
+    def project(self, item):
+        if not self.fields:
+            return item
+        return {key: item[key] for key in self.fields if key in item}
+
+
+ALL = Page(limit=None, marker=None, reverse=False, fields=None)
+
+
+def query_page(query):
+    """
+    :return: The Page requested by a parsed query
+    """
+    query = query or {}
+    limit = query.get(LIMIT, ['0'])[0]
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise BadRequestError(
+            'Invalid limit: {limit}'.format(limit=query[LIMIT][0])
+        )
+    return Page(
+        limit=limit or None,
+        marker=query.get(MARKER, [None])[0],
+        reverse=query.get(PAGE_REVERSE, ['False'])[0].lower() == 'true',
+        fields=query.get(FIELDS),
+    )
+
+
+def page_links(url, items, page, query):
+    """
+    :return: The links to the next and previous pages of a paginated list,
+    as expected by a Neutron client. A next page is assumed as long as
+    the page is full, a previous page as long as a marker was passed.
+    """
+    if not page.is_paginated or not items:
+        return []
+    is_full = bool(page.limit) and len(items) >= page.limit
+    is_following = page.marker is not None
+    has_next, has_previous = (
+        (is_following, is_full) if page.reverse else (is_full, is_following)
+    )
+    links = []
+    if has_next:
+        links.append(_page_link('next', url, query, items[-1][ID], False))
+    if has_previous:
+        links.append(_page_link('previous', url, query, items[0][ID], True))
+    return links
+
+
+def _page_link(rel, url, query, marker, reverse):
+    link_query = dict(query or {})
+    link_query[MARKER] = [marker]
+    link_query.pop(PAGE_REVERSE, None)
+    if reverse:
+        link_query[PAGE_REVERSE] = ['True']
+    return {
+        'rel': rel,
+        'href': '{url}?{query}'.format(
+            url=url, query=urllib_parse.urlencode(link_query, doseq=True)
+        ),
+    }
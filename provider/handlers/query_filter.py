@@ -19,16 +19,30 @@
 
 
 from handlers import GET
-from ovirt_provider_config_common import url_filter_exception
+from ovirt_provider_config_common import config_snapshot
+
+LIMIT = 'limit'
+MARKER = 'marker'
+PAGE_REVERSE = 'page_reverse'
+FIELDS = 'fields'
+PAGINATION_KEYS = (LIMIT, MARKER, PAGE_REVERSE, FIELDS)
+
+
+def query_filters(query):
+    """
+    :return: The filters of a parsed query as a dict, mapping the name of the
+    filtered field to the requested value.
+    """
+    filter_exceptions = config_snapshot().url_filter_exceptions
+    return {
+        key: val[0]
+        for (key, val) in (query or {}).items()
+        if key not in filter_exceptions and key not in PAGINATION_KEYS
+    }
 
 
 def filter_query_results(items, query):
-    filter_exceptions = url_filter_exception().split(',')
-    valid_filters = [
-        (key, val)
-        for (key, val) in query.items()
-        if key not in filter_exceptions
-    ]
+    valid_filters = list(query_filters(query).items())
     return list(
         filter(
             lambda item: all(_filter_query_result(item, valid_filters)), items
@@ -53,7 +67,15 @@ def _compare_query_values(entity_value, query_value):
     return entity_value == query_value
 
 
+def item_matches(item, filters):
+    """
+    :return: True if the REST representation of an entity matches the
+    filters returned by query_filters
+    """
+    return all(_filter_query_result(item, filters.items()))
+
+
 def _filter_query_result(result, valid_filters):
     return [
-        _compare_query_values(result.get(k), v[0]) for (k, v) in valid_filters
+        _compare_query_values(result.get(k), v) for (k, v) in valid_filters
     ]
@@ -0,0 +1,97 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+
+class ResponseCache(object):
+    """
+    Keeps the encoded bodies of responses, each under the key of the request
+    together with the version of the sources the response was built from.
+    A body is returned only for the version it was stored with, so it is
+    invalidated as soon as any of its sources change.
+    The least recently used bodies are dropped when the bodies take more
+    than `max_size` bytes, bodies larger than that are never kept.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        # key -> (version, body)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            return None
+
+    def put(self, key, version, body):
+        if len(body) > self._max_size:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, body)
+            self._size += len(body)
+            while self._size > self._max_size:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def collect(self, key, version, chunks):
+        """
+        Yields the chunks of a response while it is sent, and keeps the body
+        once all of them were sent, unless it grew too large to be kept.
+        """
+        body = []
+        size = 0
+        for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if size <= self._max_size:
+                    body.append(chunk)
+                else:
+                    body = None
+            yield chunk
+        if body is not None:
+            self.put(key, version, b''.join(body))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._size -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
@@ -21,6 +21,9 @@ from __future__ import absolute_import
 import json
 
 from handlers.base_handler import BadRequestError
+from handlers.pagination import query_page
+from handlers.query_filter import query_filters
+from handlers.selecting_handler import QUERY_PARAMETER
 
 
 def get_entity(content, entity_name=None):
@@ -29,3 +32,41 @@ def get_entity(content, entity_name=None):
         return content_json[entity_name] if entity_name else content_json
     except (ValueError, KeyError) as e:
         raise BadRequestError(e)
+
+
+def get_entities(content, entity_name, collection_name):
+    """
+    :return: The entities of a request creating either a single entity, or
+    many of them by listing them under collection_name as in the Neutron bulk
+    create requests, and whether the request is a bulk one
+    """
+    content_json = get_entity(content)
+    if collection_name not in content_json:
+        try:
+            return [content_json[entity_name]], False
+        except KeyError as e:
+            raise BadRequestError(e)
+    entities = content_json[collection_name]
+    if not isinstance(entities, list):
+        raise BadRequestError(
+            '{collection} must be a list'.format(collection=collection_name)
+        )
+    return entities, True
+
+
+def get_filters(parameters):
+    """
+    :return: The filters of the query of a list request, see query_filters
+    """
+    return query_filters(get_query(parameters))
+
+
+def get_query(parameters):
+    return (parameters or {}).get(QUERY_PARAMETER) or {}
+
+
+def get_page(parameters):
+    """
+    :return: The page of a list request, see query_page
+    """
+    return query_page(get_query(parameters))
@@ -28,6 +28,7 @@ from handlers.base_handler import MethodNotAllowedError
 PATH_SEPARATOR = '/'
 RESPONSE_VALUE_KEY = '#VALUE'
 RESPONSE_VALUE_PARAMETER = '#PARAMETER'
+QUERY_PARAMETER = '#QUERY'
 WILDCARD_KEY = '*'
 
 
@@ -144,6 +145,30 @@ def rest(method, path, response_handlers):
     return assign_response
 
 
+def versioned_by(*sources):
+    """
+    Decorator for GET request handlers, telling their responses change only
+    when one of the sources changes. The responses are tagged by the version
+    of the sources, see SelectingHandler.get_version.
+    """
+
+    def mark(funct):
+        funct.versioned_by = sources
+        return funct
+
+    return mark
+
+
+def cached(funct):
+    """
+    Decorator for versioned GET request handlers, telling their encoded
+    responses may be kept in the response cache of the handler and served
+    again while the version of their sources does not change.
+    """
+    funct.cached = True
+    return funct
+
+
 def _validate_path_parameters(parameter, parameters, current_map):
     duplicate_param_message = (
         'Duplicate parameter name: {name}. Parameter names within'
@@ -172,6 +197,9 @@ class SelectingHandler(BaseHandler):
         handler, parameters = self.get_response_handler(
             self.get_responses(), method, path_parts
         )
+        # The parsed query of the request, to let handlers of list requests
+        # filter the entities before they are built
+        parameters[QUERY_PARAMETER] = self.query or {}
         return self.call_response_handler(handler, content, parameters)
 
     @classmethod
@@ -200,6 +228,35 @@ class SelectingHandler(BaseHandler):
             raise MethodNotAllowedError()
         return method_map[method], parameters
 
+    def get_etag(self, method, path_parts):
+        sources = self._get_handler_attribute(
+            method, path_parts, 'versioned_by'
+        )
+        version = self.get_version(sources) if sources else None
+        return '"{version}"'.format(version=version) if version else None
+
+    def is_cached(self, method, path_parts):
+        return self._get_handler_attribute(method, path_parts, 'cached')
+
+    def get_route(self, method, path_parts):
+        return self._get_handler_attribute(method, path_parts, '__name__')
+
+    def _get_handler_attribute(self, method, path_parts, name):
+        try:
+            handler, _ = self.get_response_handler(
+                self.get_responses(), method, path_parts
+            )
+        except (PathNotFoundError, MethodNotAllowedError):
+            return None
+        return getattr(handler, name, None)
+
+    def get_version(self, sources):
+        """
+        :return: A string which changes whenever any of the sources changes,
+        or None if the version is not known
+        """
+        return None
+
     @abc.abstractmethod
     def call_response_handler(self, response_handler, content, parameters):
         pass
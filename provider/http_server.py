@@ -0,0 +1,270 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import select
+import socket
+import ssl
+import threading
+import time
+
+from six.moves.BaseHTTPServer import HTTPServer
+
+
+SERVICE_UNAVAILABLE_BODY = (
+    b'{"error": {"message": "Too many requests in flight", '
+    b'"code": 503, "title": "Service Unavailable"}}'
+)
+SERVICE_UNAVAILABLE_RESPONSE = (
+    b'HTTP/1.0 503 Service Unavailable\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Content-Length: %d\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'%s'
+) % (len(SERVICE_UNAVAILABLE_BODY), SERVICE_UNAVAILABLE_BODY)
+
+TLS_HANDSHAKE_TIMEOUT = 10
+REJECT_HANDSHAKE_TIMEOUT = 1
+# Period in seconds an idle kept alive connection is checked for a request
+# or for other connections waiting for its worker
+IDLE_POLL_INTERVAL = 0.05
+
+
+class HTTPServerIPv6(HTTPServer):
+    address_family = socket.AF_INET6
+
+    # A single threaded server can not afford idle connections, each of
+    # them would block all other clients.
+    keep_alive_timeout = None
+
+    def keep_alive(self, requests_on_connection):
+        return False
+
+    def finish_request(self, request, client_address):
+        if isinstance(request, ssl.SSLSocket):
+            try:
+                request.settimeout(TLS_HANDSHAKE_TIMEOUT)
+                request.do_handshake()
+            except (ssl.SSLError, socket.error) as e:
+                logging.debug(
+                    'TLS handshake with {address} failed: {error}'.format(
+                        address=client_address[0], error=e
+                    )
+                )
+                return
+        HTTPServer.finish_request(self, request, client_address)
+
+
+class PooledHTTPServerIPv6(HTTPServerIPv6):
+    """
+    Serves connections on a bounded pool of worker threads.
+    At most `workers` connections are processed at the same time and at most
+    `max_queued` more wait for a free worker. Connections above that limit
+    are answered with 503 right away, so the accepting thread never blocks
+    behind a slow request.
+    A connection is kept open for at most `keep_alive_max_requests`
+    requests (0 for no limit) and `keep_alive_timeout` seconds of
+    inactivity, but only while no other connection waits for a worker: an
+    idle connection is closed as soon as one does.
+    """
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        workers,
+        max_queued,
+        keep_alive_timeout=None,
+        keep_alive_max_requests=0,
+    ):
+        HTTPServerIPv6.__init__(self, server_address, handler_class)
+        self.keep_alive_timeout = keep_alive_timeout
+        self._keep_alive_max_requests = keep_alive_max_requests
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix=handler_class.__name__,
+        )
+        self._workers = workers
+        self._max_in_flight = workers + max_queued
+        self._slots = threading.BoundedSemaphore(self._max_in_flight)
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._served = 0
+        self._rejected = 0
+
+    def keep_alive(self, requests_on_connection):
+        if (
+            self._keep_alive_max_requests
+            and requests_on_connection >= self._keep_alive_max_requests
+        ):
+            return False
+        with self._stats_lock:
+            return not self._queued
+
+    def wait_for_request(self, connection, rfile, timeout):
+        """
+        Waits up to timeout seconds for the next request on an idle kept
+        alive connection, polling it so that the worker is handed back as
+        soon as another connection waits for one.
+        :return: Whether the connection has input to read, including the end
+        of the stream
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not _has_buffered_input(connection, rfile):
+            with self._stats_lock:
+                if self._queued:
+                    return False
+            interval = IDLE_POLL_INTERVAL
+            if deadline is not None:
+                interval = min(interval, deadline - time.monotonic())
+                if interval <= 0:
+                    return False
+            readable, _, _ = select.select([connection], [], [], interval)
+            if readable:
+                return True
+        return True
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(False):
+            self._reject_request(request, client_address)
+            return
+        with self._stats_lock:
+            self._queued += 1
+        try:
+            self._executor.submit(
+                self._process_request_in_worker, request, client_address
+            )
+        except RuntimeError:
+            # The executor has been shut down, the server is going away
+            with self._stats_lock:
+                self._queued -= 1
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_in_worker(self, request, client_address):
+        with self._stats_lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._stats_lock:
+                self._active -= 1
+                self._served += 1
+            self._slots.release()
+
+    def _reject_request(self, request, client_address):
+        with self._stats_lock:
+            self._rejected += 1
+        logging.warning(
+            'Rejecting request from {address}, {limit} requests in '
+            'flight'.format(
+                address=client_address[0], limit=self._max_in_flight
+            )
+        )
+        try:
+            if isinstance(request, ssl.SSLSocket):
+                request.settimeout(REJECT_HANDSHAKE_TIMEOUT)
+                request.do_handshake()
+            request.sendall(SERVICE_UNAVAILABLE_RESPONSE)
+        except (socket.error, ValueError):
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'workers': self._workers,
+                'max_in_flight': self._max_in_flight,
+                'active': self._active,
+                'queued': self._queued,
+                'served': self._served,
+                'rejected': self._rejected,
+            }
+
+    def server_close(self):
+        HTTPServerIPv6.server_close(self)
+        self._executor.shutdown(wait=True)
+
+
+def _has_buffered_input(connection, rfile):
+    # A pipelined request may already be buffered by the reader or by TLS,
+    # where select can not see it
+    if isinstance(connection, ssl.SSLSocket) and connection.pending():
+        return True
+    timeout = connection.gettimeout()
+    connection.settimeout(0)
+    try:
+        return bool(rfile.peek(1))
+    except (ssl.SSLWantReadError, socket.error, ValueError):
+        return False
+    finally:
+        connection.settimeout(timeout)
+
+
+def create_server(
+    server_address,
+    handler_class,
+    workers,
+    max_queued,
+    keep_alive_timeout=None,
+    keep_alive_max_requests=0,
+):
+    if workers > 0:
+        return PooledHTTPServerIPv6(
+            server_address,
+            handler_class,
+            workers,
+            max(max_queued, 0),
+            keep_alive_timeout or None,
+            max(keep_alive_max_requests, 0),
+        )
+    return HTTPServerIPv6(server_address, handler_class)
+
+
+def create_ssl_context(key_file, cert_file, ciphers):
+    """
+    The context lives as long as the server, so its session cache and
+    session tickets let returning clients resume their TLS sessions instead
+    of doing a full handshake.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.maximum_version = ssl.TLSVersion.TLSv1_2
+    context.options |= ssl.OP_NO_COMPRESSION
+    context.set_ciphers(ciphers)
+    context.load_cert_chain(certfile=cert_file, keyfile=key_file)
+    return context
+
+
+def ssl_wrap(server, context):
+    # The handshake is done by the thread serving the connection, not by the
+    # one accepting connections.
+    server.socket = context.wrap_socket(
+        server.socket, server_side=True, do_handshake_on_connect=False
+    )
@@ -0,0 +1,259 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+import bisect
+import threading
+
+# Metrics of the provider, exposed in the Prometheus text format. Recording
+# a value only updates a few numbers under a lock, the text is built when the
+# metrics are scraped.
+
+PREFIX = 'ovirt_provider_ovn_'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _Metric(object):
+
+    type_name = None
+
+    def __init__(self, name, description, label_names=()):
+        self.name = PREFIX + name
+        self.description = description
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        # label values -> value
+        self._values = {}
+
+    def render(self):
+        lines = [
+            '# HELP {} {}'.format(self.name, self.description),
+            '# TYPE {} {}'.format(self.name, self.type_name),
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [_sample(self.name, self.label_names, labels, value)]
+
+
+class Gauge(_Metric):
+
+    type_name = 'gauge'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Counter(_Metric):
+    """
+    A count which only goes up, exposed with the _total suffix
+    """
+
+    type_name = 'counter'
+
+    def __init__(self, name, description, label_names=()):
+        super(Counter, self).__init__(
+            name + '_total', description, label_names
+        )
+
+    def inc(self, labels=(), amount=1):
+        if amount < 0:
+            raise ValueError('Counters can only be increased')
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(_Metric):
+
+    type_name = 'histogram'
+
+    def __init__(
+        self, name, description, label_names=(), buckets=LATENCY_BUCKETS
+    ):
+        super(Histogram, self).__init__(name, description, label_names)
+        self._buckets = buckets
+
+    def observe(self, value, labels=()):
+        bucket = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # the count of each bucket, the count of all values and
+                # their sum
+                counts = self._values[labels] = [0] * (len(self._buckets) + 2)
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def _render_value(self, labels, counts):
+        label_names = self.label_names + ('le',)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(
+                _sample(
+                    self.name + '_bucket',
+                    label_names,
+                    labels + (str(bound),),
+                    cumulative,
+                )
+            )
+        lines.append(
+            _sample(self.name + '_count', self.label_names, labels, cumulative)
+        )
+        lines.append(
+            _sample(self.name + '_sum', self.label_names, labels, counts[-1])
+        )
+        return lines
+
+
+def _sample(name, label_names, labels, value):
+    if not label_names:
+        return '{} {}'.format(name, value)
+    return '{}{{{}}} {}'.format(
+        name,
+        ','.join(
+            '{}="{}"'.format(label_name, _escape(label))
+            for label_name, label in zip(label_names, labels)
+        ),
+        value,
+    )
+
+
+def _escape(label):
+    return (
+        str(label)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+REQUEST_DURATION = Histogram(
+    'request_duration_seconds',
+    'Time to serve the HTTP requests, by route and response status.',
+    ('handler', 'method', 'route', 'code'),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'requests_in_flight',
+    'HTTP requests being served.',
+    ('handler',),
+)
+OVSDB_COMMAND_DURATION = Histogram(
+    'ovsdb_command_duration_seconds',
+    'Time to execute the OVSDB commands outside of transactions.',
+    ('command', 'result'),
+)
+OVSDB_TRANSACTION_DURATION = Histogram(
+    'ovsdb_transaction_duration_seconds',
+    'Time to commit the OVSDB transactions.',
+    ('result',),
+)
+OVSDB_CONNECTIONS = Counter(
+    'ovsdb_connections',
+    'Times each replica of the northbound db got in sync with a server.',
+    ('replica',),
+)
+OVSDB_REPLICA_READS = Counter(
+    'ovsdb_replica_reads',
+    'GET requests served from each replica of the northbound db.',
+    ('replica',),
+)
+OVSDB_GROUP_COMMIT = Counter(
+    'ovsdb_group_commit_transactions',
+    'Transactions queued for group commit, by whether they were committed '
+    'grouped, alone or rejected as validated against an outdated replica.',
+    ('outcome',),
+)
+AUTH_VALIDATION_DURATION = Histogram(
+    'auth_token_validation_duration_seconds',
+    'Time to validate the tokens of the requests, including cached '
+    'validations.',
+    ('result',),
+)
+
+_metrics = [
+    REQUEST_DURATION,
+    REQUESTS_IN_FLIGHT,
+    OVSDB_COMMAND_DURATION,
+    OVSDB_TRANSACTION_DURATION,
+    OVSDB_CONNECTIONS,
+    OVSDB_REPLICA_READS,
+    OVSDB_GROUP_COMMIT,
+    AUTH_VALIDATION_DURATION,
+]
+_stats = []
+
+
+def add_stats(name, description, get_stats):
+    """
+    Exposes each numeric value of the dict returned by get_stats as a gauge
+    named by the name and the key of the value. get_stats is called on every
+    scrape.
+    """
+    _stats.append((PREFIX + name, description, get_stats))
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, description, get_stats in list(_stats):
+        for key, value in sorted(get_stats().items()):
+            if isinstance(value, bool) or not isinstance(
+                value, (int, float)
+            ):
+                continue
+            metric_name = '{}_{}'.format(name, key)
+            lines.append(
+                '# HELP {} {} ({}).'.format(metric_name, description, key)
+            )
+            lines.append('# TYPE {} gauge'.format(metric_name))
+            lines.append('{} {}'.format(metric_name, value))
+    return '\n'.join(lines) + '\n'
@@ -29,6 +29,8 @@ from netaddr import IPAddress
 from netaddr import IPNetwork
 from netaddr.core import AddrFormatError
 
+from neutron.ip_ranges import IpRangeSet
+
 
 def get_port_ip(lsp, lrp=None):
     if not lsp.addresses:
@@ -61,14 +63,22 @@ def _get_all_macs(ports, get_macs):
 
 
 def random_unique_mac(ls_ports, router_ports):
+    return random_unique_macs(ls_ports, router_ports, 1)[0]
+
+
+def random_unique_macs(ls_ports, router_ports, count):
     all_macs = set().union(
         _get_all_macs(ls_ports, lambda p: get_port_mac(p)),
         _get_all_macs(router_ports, lambda p: p['mac']),
     )
+    return [_random_unused_mac(all_macs) for _ in range(count)]
+
 
+def _random_unused_mac(used_macs):
     for _ in range(99):
         mac = _random_mac()
-        if mac not in all_macs:
+        if mac not in used_macs:
+            used_macs.add(mac)
             return mac
 
     raise Exception('Unable to allocate an unused mac after 100 retries')
@@ -113,27 +123,15 @@ def _is_valid_ip(candidate):
 
 
 def get_network_exclude_ips(network):
-    exclude_values = network.other_config.get(
-        ovnconst.LS_OPTION_EXCLUDE_IPS, ''
+    return IpRangeSet.parse(
+        network.other_config.get(ovnconst.LS_OPTION_EXCLUDE_IPS, '')
     )
-    # TODO: should we care about IP ranges? we do not use them, but
-    # what if someone else will?
-    # lets raise for now
-    result = []
-    for exclude_value in exclude_values.split():
-        if ovnconst.LS_EXCLUDED_IP_DELIMITER in exclude_value:
-            raise NotImplementedError(
-                'Handling of ip ranges not yet implemented'
-            )
-        result.append(exclude_value)
-    return result
 
 
 def is_ip_available_in_network(network, ip):
     if any(ip == get_port_ip(port) for port in network.ports):
         return False
-    exclude_ips = get_network_exclude_ips(network)
-    return ip not in exclude_ips
+    return ip not in get_network_exclude_ips(network)
 
 
 def diff_routes(new_rest_routes, db_routes):
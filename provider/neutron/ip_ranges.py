@@ -0,0 +1,128 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+from bisect import bisect_left
+from bisect import bisect_right
+
+from netaddr import IPAddress
+from netaddr.core import AddrFormatError
+
+import constants as ovnconst
+
+
+class IpRangeSet(object):
+    """
+    A set of ip addresses stored as sorted, disjoint ranges, one list of
+    ranges per ip version. Lookups take O(log n) in the number of ranges.
+
+    It reads and writes the format of the exclude_ips option of a logical
+    switch: ips and ranges 'first..last' separated by spaces. Values which
+    are not ips are kept as they are.
+    """
+
+    def __init__(self):
+        self._starts = {4: [], 6: []}
+        self._ends = {4: [], 6: []}
+        self._unparsed = []
+
+    @classmethod
+    def parse(cls, value):
+        ranges = cls()
+        for token in (value or '').split():
+            try:
+                first, _, last = token.partition(
+                    ovnconst.LS_EXCLUDED_IP_DELIMITER
+                )
+                ranges.add(first, last or first)
+            except (AddrFormatError, ValueError):
+                ranges._unparsed.append(token)
+        return ranges
+
+    def add(self, first, last=None):
+        version, start, end = _range(first, last)
+        starts, ends = self._starts[version], self._ends[version]
+        # merges the ranges overlapping or adjacent to the new one
+        i = bisect_left(ends, start - 1)
+        j = bisect_right(starts, end + 1)
+        if i < j:
+            start = min(start, starts[i])
+            end = max(end, ends[j - 1])
+        starts[i:j] = [start]
+        ends[i:j] = [end]
+
+    def remove(self, first, last=None):
+        version, start, end = _range(first, last)
+        starts, ends = self._starts[version], self._ends[version]
+        i = bisect_left(ends, start)
+        j = bisect_right(starts, end)
+        if i >= j:
+            return
+        remaining = []
+        if starts[i] < start:
+            remaining.append((starts[i], start - 1))
+        if ends[j - 1] > end:
+            remaining.append((end + 1, ends[j - 1]))
+        starts[i:j] = [start for start, _ in remaining]
+        ends[i:j] = [end for _, end in remaining]
+
+    def __contains__(self, ip):
+        ip = IPAddress(ip)
+        value = int(ip)
+        starts = self._starts[ip.version]
+        i = bisect_right(starts, value) - 1
+        return i >= 0 and self._ends[ip.version][i] >= value
+
+    def __bool__(self):
+        return any(self._starts.values()) or bool(self._unparsed)
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return ' '.join(
+            [
+                _format_range(version, start, end)
+                for version in (4, 6)
+                for start, end in zip(
+                    self._starts[version], self._ends[version]
+                )
+            ]
+            + self._unparsed
+        )
+
+
+def _range(first, last):
+    first = IPAddress(first)
+    last = IPAddress(last) if last else first
+    if first.version != last.version or first > last:
+        raise ValueError(
+            'Invalid ip range {first}..{last}'.format(first=first, last=last)
+        )
+    return first.version, int(first), int(last)
+
+
+def _format_range(version, start, end):
+    if start == end:
+        return str(IPAddress(start, version))
+    return '{first}{delimiter}{last}'.format(
+        first=IPAddress(start, version),
+        delimiter=ovnconst.LS_EXCLUDED_IP_DELIMITER,
+        last=IPAddress(end, version),
+    )
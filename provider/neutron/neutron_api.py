@@ -18,6 +18,8 @@
 
 from __future__ import absolute_import
 
+import itertools
+import threading
 import uuid
 
 from functools import wraps
@@ -32,6 +34,9 @@ import neutron.validation as validate
 from handlers.base_handler import BadRequestError
 from handlers.base_handler import ElementNotFoundError
 from handlers.base_handler import MethodNotAllowedError
+from handlers.pagination import ALL
+from handlers.pagination import ID
+from handlers.query_filter import item_matches
 
 from neutron.neutron_api_mappers import AddRouterInterfaceMapper
 from neutron.neutron_api_mappers import NetworkMapper
@@ -93,29 +98,134 @@ def wrap_default_group_id(f):
     return inner
 
 
+def _select_rows(mapper, rows, filters, page):
+    """
+    :param rows: tuples of the rows an entity is built of, as taken by
+    mapper.ROW_FILTERS
+    :return: The list of the tuples matching the filters on the fields the
+    rows provide. When a page is requested, sorted by id and starting after
+    the marker.
+    """
+    rows = [row for row in rows if mapper.row_matches(filters or {}, *row)]
+    if not page.is_paginated:
+        return rows
+    get_id = mapper.ROW_FILTERS[ID]
+    rows.sort(key=lambda row: get_id(*row), reverse=page.reverse)
+    if page.marker is None:
+        return rows
+    if page.reverse:
+        return [row for row in rows if get_id(*row) < page.marker]
+    return [row for row in rows if get_id(*row) > page.marker]
+
+
+def _page_items(items, filters, page):
+    """
+    Applies the filters on the REST representations and cuts the page.
+    A reversed page is turned back into ascending order.
+    """
+    items = (item for item in items if item_matches(item, filters or {}))
+    if page.limit:
+        items = itertools.islice(items, page.limit)
+    if page.reverse:
+        items = reversed(list(items))
+    return items
+
+
 class NeutronApi(object):
-    def __init__(self, sec_group_support=None):
-        self.idl = ovn_connection.connect()
+    """
+    Holds no state of a request but the transaction in progress, which is
+    kept per thread by OvnTransactionManager. A single instance, see
+    shared(), serves all requests of the process, but the GET requests which
+    may be served from the follower replica, see shared_reader().
+    """
+
+    _shared = None
+    _shared_reader = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, sec_group_support=None, idl=None):
+        self.idl = idl or ovn_connection.connect()
         self.ovn_north = OvnNorth(self.idl)
-        self.security_group_support = (
-            sec_group_support or self.are_security_groups_supported()
-        )
+        self._sec_group_support = sec_group_support
+        # (tables of the schema, whether security groups are supported)
+        self._sec_group_support_by_schema = (None, False)
+        # Changes are written through the leader replica only
         self.tx_manager = ovn_connection.OvnTransactionManager(
-            self.idl.ovsdb_connection
+            ovn_connection.connect().ovsdb_connection
         )
 
-    # TODO: could this be moved to ovsdbapp?
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def shared_reader(cls):
+        """
+        :return: The instance reading from the replica picked for a GET
+        request by ovn_connection.read_api
+        """
+        idl = ovn_connection.read_api()
+        if idl is ovn_connection.connect():
+            return cls.shared()
+        if cls._shared_reader is None or cls._shared_reader.idl is not idl:
+            with cls._shared_lock:
+                if (
+                    cls._shared_reader is None
+                    or cls._shared_reader.idl is not idl
+                ):
+                    cls._shared_reader = cls(idl=idl)
+        return cls._shared_reader
+
+    @property
+    def security_group_support(self):
+        if self._sec_group_support:
+            return True
+        tables, supported = self._sec_group_support_by_schema
+        if tables is not self.idl.tables:
+            supported = self.are_security_groups_supported()
+            self._sec_group_support_by_schema = (self.idl.tables, supported)
+        return supported
+
     def _get_port_network(self, port):
-        networks = self.ovn_north.list_ls()
-        return next(network for network in networks if port in network.ports)
+        return self.ovn_north.get_ls(lsp=port)
 
     def _is_port_ovirt_controlled(self, port_row):
         return PortMapper.OVN_NIC_NAME in port_row.external_ids
 
-    @NetworkMapper.map_to_rest
-    def list_networks(self):
-        ls_rows = self.ovn_north.list_ls()
-        return [self._get_network(ls) for ls in ls_rows]
+    def list_networks(self, filters=None, page=ALL):
+        return list(self.iter_networks(filters, page))
+
+    def iter_networks(self, filters=None, page=ALL):
+        rows = _select_rows(
+            NetworkMapper,
+            ((ls,) for ls in self.ovn_north.list_ls()),
+            filters,
+            page,
+        )
+        with_localnet = any(
+            page.requires(field, filters)
+            for field in (
+                NetworkMapper.REST_PROVIDER_NETWORK_TYPE,
+                NetworkMapper.REST_PROVIDER_PHYSICAL_NETWORK,
+                NetworkMapper.REST_PROVIDER_SEGMENTATION_ID,
+            )
+        )
+        return _page_items(
+            (
+                NetworkMapper.row2rest(
+                    self._get_network(ls)
+                    if with_localnet
+                    else Network(ls=ls, localnet_lsp=None)
+                )
+                for ls, in rows
+            ),
+            filters,
+            page,
+        )
 
     def _get_network(self, ls):
         return Network(ls=ls, localnet_lsp=self._get_localnet_lsp(ls))
@@ -124,10 +234,24 @@ class NeutronApi(object):
     def get_network(self, network_id):
         return self._get_network(self.ovn_north.get_ls(ls_id=network_id))
 
+    def add_network(self, rest_data):
+        return self.add_networks([rest_data])[0]
+
+    def add_networks(self, rest_networks):
+        """
+        Creates all the networks in a single transaction, so either all of
+        them are created or none is.
+        """
+        with self.tx_manager.transaction():
+            network_ids = [
+                self._add_network(rest_network)
+                for rest_network in rest_networks
+            ]
+        return [self.get_network(network_id) for network_id in network_ids]
+
     @NetworkMapper.validate_add
     @NetworkMapper.map_from_rest
-    @NetworkMapper.map_to_rest
-    def add_network(
+    def _add_network(
         self,
         name,
         localnet=None,
@@ -137,7 +261,7 @@ class NeutronApi(object):
     ):
         with self.tx_manager.transaction() as tx:
             if localnet:
-                network_id = self._add_localnet_network(
+                return self._add_localnet_network(
                     name,
                     localnet,
                     vlan,
@@ -145,11 +269,7 @@ class NeutronApi(object):
                     port_security_enabled,
                     transaction=tx,
                 )
-            else:
-                network_id = self._create_network(
-                    name, tx, mtu, port_security_enabled
-                )
-        return self._get_network(self.ovn_north.get_ls(ls_id=network_id))
+            return self._create_network(name, tx, mtu, port_security_enabled)
 
     def _create_network(self, name, transaction, mtu=None, port_security=None):
         external_ids_dict = {NetworkMapper.OVN_NETWORK_NAME: name}
@@ -351,14 +471,80 @@ class NeutronApi(object):
                 return lsp
         return None
 
-    @PortMapper.map_to_rest
-    def list_ports(self):
-        return [
-            self._get_network_port(lsp, ls)
-            for ls in self.ovn_north.list_ls()
-            for lsp in ls.ports
-            if self._is_port_ovirt_controlled(lsp)
-        ]
+    def list_ports(self, filters=None, page=ALL):
+        return list(self.iter_ports(filters, page))
+
+    def iter_ports(self, filters=None, page=ALL):
+        """
+        Yields the REST representation of the ports, one by one.
+        The networks, subnets and router ports are read once and joined to
+        the ports in memory, instead of being looked up port by port.
+        Ports not matching the filters on the fields the rows provide, see
+        PortMapper.ROW_FILTERS, are skipped before they are joined, and
+        the join is skipped when the fixed_ips are not requested.
+        """
+        network_id = (filters or {}).get(PortMapper.REST_PORT_NETWORK_ID)
+        rows = _select_rows(
+            PortMapper,
+            (
+                (lsp, ls)
+                for ls in self.ovn_north.list_ls()
+                if network_id is None or str(ls.uuid) == network_id
+                for lsp in ls.ports
+                if self._is_port_ovirt_controlled(lsp)
+            ),
+            filters,
+            page,
+        )
+        if not page.requires(PortMapper.REST_PORT_FIXED_IPS, filters):
+            ports = (
+                NetworkPort(lsp=lsp, ls=ls, dhcp_options=None, lrp=None)
+                for lsp, ls in rows
+            )
+        else:
+            ports = self._join_ports(rows)
+        return _page_items(
+            (PortMapper.row2rest(port) for port in ports), filters, page
+        )
+
+    def _join_ports(self, rows):
+        dhcps_by_id = {}
+        dhcps_by_network_id = {}
+        for dhcp in self.ovn_north.list_dhcp():
+            dhcps_by_id[dhcp.uuid] = dhcp
+            dhcps_by_network_id.setdefault(
+                dhcp.external_ids[SubnetMapper.OVN_NETWORK_ID], dhcp
+            )
+        lrps_by_name = {}
+        if any(
+            lsp.options.get(ovnconst.LSP_OPTION_ROUTER_PORT)
+            for lsp, ls in rows
+        ):
+            lrps_by_name = {
+                lrp.name: lrp for lrp in self.ovn_north.list_lrp_rows()
+            }
+
+        for lsp, ls in rows:
+            dhcp_options = self._get_dhcp_from(
+                lsp, ls, dhcps_by_id, dhcps_by_network_id
+            )
+            lrp = None
+            lrp_name = lsp.options.get(ovnconst.LSP_OPTION_ROUTER_PORT)
+            if lrp_name:
+                lrp = lrps_by_name.get(lrp_name) or self.ovn_north.get_lrp(
+                    lrp_name=lrp_name
+                )
+            yield NetworkPort(
+                lsp=lsp, ls=ls, dhcp_options=dhcp_options, lrp=lrp
+            )
+
+    def _get_dhcp_from(self, lsp, ls, dhcps_by_id, dhcps_by_network_id):
+        dhcp_id = self._get_dhcp_id(lsp)
+        if dhcp_id:
+            dhcp = dhcps_by_id.get(dhcp_id)
+            # Let get_dhcp report subnets which are gone or not ovirt managed
+            return dhcp or self.ovn_north.get_dhcp(dhcp_id=dhcp_id)
+        return dhcps_by_network_id.get(str(ls.uuid))
 
     @PortMapper.map_to_rest
     def get_port(self, port_id):
@@ -366,10 +552,6 @@ class NeutronApi(object):
             self.ovn_north.get_lsp(ovirt_lsp_id=port_id)
         )
 
-    @PortMapper.map_to_rest
-    def _serialize_port(self, port):
-        return port
-
     def _get_network_port(self, lsp, ls=None):
         if ls is None:
             ls = self._get_port_network(lsp)
@@ -379,20 +561,56 @@ class NeutronApi(object):
         return NetworkPort(lsp=lsp, ls=ls, dhcp_options=dhcp_options, lrp=lrp)
 
     def _get_dhcp(self, lsp, ls):
-        dhcp_id = None
-        if lsp.dhcpv4_options:
-            dhcp_id = lsp.dhcpv4_options[0].uuid
-        if lsp.dhcpv6_options:
-            dhcp_id = lsp.dhcpv6_options[0].uuid
-
+        dhcp_id = self._get_dhcp_id(lsp)
         if dhcp_id:
             return self.ovn_north.get_dhcp(dhcp_id=dhcp_id)
         else:
             return self.ovn_north.get_dhcp(ls_id=ls.uuid)
 
+    @staticmethod
+    def _get_dhcp_id(lsp):
+        if lsp.dhcpv6_options:
+            return lsp.dhcpv6_options[0].uuid
+        if lsp.dhcpv4_options:
+            return lsp.dhcpv4_options[0].uuid
+        return None
+
+    def add_port(self, rest_data):
+        return self.add_ports([rest_data])[0]
+
+    def add_ports(self, rest_ports):
+        """
+        Creates all the ports in a single transaction, so either all of them
+        are created or none is. The macs of the ports not requesting one are
+        allocated together.
+        """
+        validate.fixed_ips_unique(rest_ports)
+        macs = iter(
+            self.ovn_north.allocate_macs(
+                sum(
+                    1
+                    for rest_port in rest_ports
+                    if not rest_port.get(PortMapper.REST_PORT_MAC_ADDRESS)
+                )
+            )
+        )
+        with self.tx_manager.transaction():
+            port_ids = [
+                self._add_port(
+                    rest_port
+                    if rest_port.get(PortMapper.REST_PORT_MAC_ADDRESS)
+                    else dict(
+                        rest_port,
+                        **{PortMapper.REST_PORT_MAC_ADDRESS: next(macs)}
+                    )
+                )
+                for rest_port in rest_ports
+            ]
+        return [self.get_port(port_id) for port_id in port_ids]
+
     @PortMapper.validate_add
     @PortMapper.map_from_rest
-    def add_port(
+    def _add_port(
         self,
         network_id,
         name,
@@ -416,9 +634,6 @@ class NeutronApi(object):
                 binding_host,
                 transaction=tx,
             )
-            mac = mac or ip_utils.random_unique_mac(
-                self.ovn_north.list_lsp(), self.ovn_north.list_lrp()
-            )
             tx.add(
                 self.get_update_port_addr_command(
                     port_id,
@@ -445,10 +660,7 @@ class NeutronApi(object):
             self._update_port_security_groups_command(
                 port_id, security_groups, tx
             )
-        port_data = self._get_network_port(
-            self.ovn_north.get_lsp(ovirt_lsp_id=port_id)
-        )
-        return self._serialize_port(port_data)
+        return port_id
 
     @PortMapper.validate_update
     @PortMapper.map_from_rest
@@ -625,7 +837,9 @@ class NeutronApi(object):
         if not ip:
             return ovnconst.LSP_ADDRESS_TYPE_DYNAMIC
         validate.ip_available_in_network(
-            self.ovn_north.get_ls(ls_id=network_id), ip
+            self.ovn_north.get_ls(ls_id=network_id),
+            ip,
+            self.ovn_north.is_ip_available_in_network,
         )
         return ip
 
@@ -634,6 +848,7 @@ class NeutronApi(object):
         port,
         router_port_name,
         router_id,
+        transaction,
         name=None,
         is_enabled=True,
         is_external_gateway=False,
@@ -648,20 +863,30 @@ class NeutronApi(object):
                 if is_external_gateway
                 else PortMapper.DEVICE_OWNER_ROUTER
             ),
+            transaction=transaction,
         )
 
-        self.ovn_north.create_ovn_update_command(ovnconst.TABLE_LSP, port).add(
-            ovnconst.ROW_LSP_TYPE,
-            ovnconst.LSP_TYPE_ROUTER,
-        ).add(
-            ovnconst.ROW_LSP_OPTIONS,
-            {ovnconst.LSP_OPTION_ROUTER_PORT: router_port_name},
-        ).add(
-            ovnconst.ROW_LSP_ADDRESSES, [ovnconst.LSP_ADDRESS_TYPE_ROUTER]
-        ).execute()
+        transaction.add(
+            self.ovn_north.create_ovn_update_command(ovnconst.TABLE_LSP, port)
+            .add(
+                ovnconst.ROW_LSP_TYPE,
+                ovnconst.LSP_TYPE_ROUTER,
+            )
+            .add(
+                ovnconst.ROW_LSP_OPTIONS,
+                {ovnconst.LSP_OPTION_ROUTER_PORT: router_port_name},
+            )
+            .add(
+                ovnconst.ROW_LSP_ADDRESSES, [ovnconst.LSP_ADDRESS_TYPE_ROUTER]
+            )
+            .build_command()
+        )
 
         self.ovn_north.clear_row_column(
-            ovnconst.TABLE_LSP, port, ovnconst.ROW_LSP_DHCPV4_OPTIONS
+            ovnconst.TABLE_LSP,
+            port,
+            ovnconst.ROW_LSP_DHCPV4_OPTIONS,
+            transaction=transaction,
         )
 
     def _get_validated_port_network_id(self, port, network_id):
@@ -750,17 +975,53 @@ class NeutronApi(object):
             ovnconst.TABLE_LSP, port_id
         ).add(ovnconst.ROW_LSP_PORT_SECURITY, [])
 
-    @SubnetMapper.map_to_rest
-    def list_subnets(self):
-        return self.ovn_north.list_dhcp()
+    def list_subnets(self, filters=None, page=ALL):
+        return list(self.iter_subnets(filters, page))
+
+    def iter_subnets(self, filters=None, page=ALL):
+        rows = _select_rows(
+            SubnetMapper,
+            ((dhcp,) for dhcp in self.ovn_north.list_dhcp()),
+            filters,
+            page,
+        )
+        return _page_items(
+            (SubnetMapper.row2rest(dhcp) for dhcp, in rows),
+            filters,
+            page,
+        )
 
     @SubnetMapper.map_to_rest
     def get_subnet(self, subnet_id):
         return self.ovn_north.get_dhcp(dhcp_id=subnet_id)
 
+    def add_subnet(self, rest_data):
+        return self.add_subnets([rest_data])[0]
+
+    def add_subnets(self, rest_subnets):
+        """
+        Creates all the subnets in a single transaction, so either all of
+        them are created or none is.
+        """
+        network_ids = [
+            rest_subnet.get(SubnetMapper.REST_SUBNET_NETWORK_ID)
+            for rest_subnet in rest_subnets
+        ]
+        for network_id in set(network_ids):
+            if network_ids.count(network_id) > 1:
+                raise SubnetConfigError(
+                    'Unable to create more than one subnet'
+                    ' for network {}'.format(network_id)
+                )
+        with self.tx_manager.transaction():
+            subnets = [
+                self._add_subnet(rest_subnet) for rest_subnet in rest_subnets
+            ]
+        return [self.get_subnet(str(subnet.result.uuid)) for subnet in subnets]
+
     @SubnetMapper.validate_add
     @SubnetMapper.map_from_rest
-    def add_subnet(
+    def _add_subnet(
         self,
         name,
         cidr,
@@ -797,23 +1058,29 @@ class NeutronApi(object):
             cidr, gateway, network_mtu, dns, ipv6_address_mode
         )
 
-        self.ovn_north.db_set(
-            ovnconst.TABLE_LS,
-            network_id,
-            (ovnconst.ROW_LS_OTHER_CONFIG, self.get_ls_options(cidr)),
-        )
-
-        subnet = self.ovn_north.add_dhcp_options(cidr, external_ids)
-        self.ovn_north.set_dhcp_options_options_column(subnet.uuid, options)
-
-        for port in network.ports:
-            if self._is_port_address_value_static(port.type):
-                continue
-            self.get_update_port_addr_command(
-                port, network_id=network_id
-            ).execute()
+        with self.tx_manager.transaction() as tx:
+            self.ovn_north.db_set(
+                ovnconst.TABLE_LS,
+                network_id,
+                (ovnconst.ROW_LS_OTHER_CONFIG, self.get_ls_options(cidr)),
+                transaction=tx,
+            )
+            subnet = self.ovn_north.add_dhcp_options(
+                cidr, external_ids, transaction=tx
+            )
+            self.ovn_north.set_dhcp_options_options_column(
+                subnet, options, transaction=tx
+            )
 
-        return self.get_subnet(subnet.uuid)
+            for port in network.ports:
+                if self._is_port_address_value_static(port.type):
+                    continue
+                update_command = self.get_update_port_addr_command(
+                    port, network_id=network_id
+                ).build_command()
+                if update_command:
+                    tx.add(update_command)
+        return subnet
 
     @staticmethod
     def get_ls_options(cidr):
@@ -930,7 +1197,7 @@ class NeutronApi(object):
                 ext_gw_dhcp_options_id=None,
                 gw_ip=None,
             )
-        gw_port = self.ovn_north.get_lsp(lsp_id=gw_port_id)
+        gw_port = self.ovn_north.get_lsp(gateway_of_lr=lr)
         ls = self._get_port_network(gw_port)
         ls_id = str(ls.uuid)
 
@@ -945,11 +1212,36 @@ class NeutronApi(object):
             gw_ip=gw_ip,
         )
 
-    @RouterMapper.map_to_rest
-    def list_routers(self):
-        return [
-            self._get_router_from_lr(lr) for lr in self.ovn_north.list_lr()
-        ]
+    def list_routers(self, filters=None, page=ALL):
+        return list(self.iter_routers(filters, page))
+
+    def iter_routers(self, filters=None, page=ALL):
+        rows = _select_rows(
+            RouterMapper,
+            ((lr,) for lr in self.ovn_north.list_lr()),
+            filters,
+            page,
+        )
+        with_gateway = page.requires(
+            RouterMapper.REST_ROUTER_EXTERNAL_GATEWAY_INFO, filters
+        )
+        return _page_items(
+            (
+                RouterMapper.row2rest(
+                    self._get_router_from_lr(lr)
+                    if with_gateway
+                    else Router(
+                        lr=lr,
+                        ext_gw_ls_id=None,
+                        ext_gw_dhcp_options_id=None,
+                        gw_ip=None,
+                    )
+                )
+                for lr, in rows
+            ),
+            filters,
+            page,
+        )
 
     def _add_router(
         self,
@@ -964,16 +1256,19 @@ class NeutronApi(object):
             gateway_ip, gateway_subnet_id, network_id
         )
         validate.no_default_gateway_in_routes(network_id is not None, routes)
-        self._reserve_network_ip(network_id, gateway_ip)
 
-        router = self.ovn_north.add_lr(name, enabled)
-        router_id = str(router.uuid)
-
-        self._add_external_gateway_to_router(
-            gateway_ip, gateway_subnet_id, network_id, router_id
-        )
-        self._add_routes_to_router(router_id, routes)
-        router = self.ovn_north.get_lr(lr_id=router_id)
+        with self.tx_manager.transaction() as tx:
+            self._reserve_network_ip(network_id, gateway_ip, tx)
+            # the router row does not exist until the transaction is
+            # committed, the following commands reference it by the command
+            add_lr_command = self.ovn_north.add_lr(
+                name, enabled, transaction=tx
+            )
+            self._add_external_gateway_to_router(
+                gateway_ip, gateway_subnet_id, network_id, add_lr_command, tx
+            )
+            self._add_routes_to_router(add_lr_command, routes, tx)
+        router = self.ovn_north.get_lr(lr_id=str(add_lr_command.result.uuid))
         return Router(
             lr=router,
             ext_gw_ls_id=network_id,
@@ -981,7 +1276,7 @@ class NeutronApi(object):
             gw_ip=gateway_ip,
         )
 
-    def _add_routes_to_router(self, router_id, routes):
+    def _add_routes_to_router(self, router_id, routes, transaction):
         if not routes:
             return
         for route in routes:
@@ -989,20 +1284,26 @@ class NeutronApi(object):
                 lrp_id=router_id,
                 prefix=route[RouterMapper.REST_ROUTER_DESTINATION],
                 nexthop=route[RouterMapper.REST_ROUTER_NEXTHOP],
+                transaction=transaction,
             )
 
     def _add_external_gateway_to_router(
-        self, gateway_ip, gateway_subnet_id, network_id, router_id
+        self, gateway_ip, gateway_subnet_id, network_id, router_id, transaction
     ):
         if network_id:
             self._add_external_gateway_interface(
-                router_id, network_id, gateway_subnet_id, gateway_ip
+                router_id,
+                network_id,
+                gateway_subnet_id,
+                gateway_ip,
+                transaction,
             )
             subnet = self.ovn_north.get_dhcp(dhcp_id=gateway_subnet_id)
             self.ovn_north.add_route(
                 lrp_id=router_id,
                 prefix=ip_utils.get_default_route(subnet),
                 nexthop=ip_utils.get_subnet_gateway(subnet),
+                transaction=transaction,
             )
 
     def _validate_external_gateway(
@@ -1013,7 +1314,9 @@ class NeutronApi(object):
                 network_id, gateway_subnet_id, is_external_gateway=True
             )
             validate.ip_available_in_network(
-                self.ovn_north.get_ls(ls_id=network_id), gateway_ip
+                self.ovn_north.get_ls(ls_id=network_id),
+                gateway_ip,
+                self.ovn_north.is_ip_available_in_network,
             )
 
     @RouterMapper.validate_add
@@ -1045,6 +1348,30 @@ class NeutronApi(object):
         routes=None,
     ):
         self._validate_external_gateway(gateway_ip, gateway_subnet, network_id)
+        with self.tx_manager.transaction() as tx:
+            self._update_router(
+                router_id,
+                name,
+                enabled,
+                network_id,
+                gateway_subnet,
+                gateway_ip,
+                routes,
+                tx,
+            )
+        return self.get_router(router_id)
+
+    def _update_router(
+        self,
+        router_id,
+        name,
+        enabled,
+        network_id,
+        gateway_subnet,
+        gateway_ip,
+        routes,
+        transaction,
+    ):
         lr = self.ovn_north.get_lr(lr_id=router_id)
 
         if routes is not None:
@@ -1059,10 +1386,15 @@ class NeutronApi(object):
             )
 
             for destination in removed_routes:
-                self.ovn_north.remove_static_route(lr, destination)
+                self.ovn_north.remove_static_route(
+                    lr, destination, transaction=transaction
+                )
             for destination in added_routes:
                 self.ovn_north.add_route(
-                    router_id, destination, added_routes[destination]
+                    router_id,
+                    destination,
+                    added_routes[destination],
+                    transaction=transaction,
                 )
 
         existing_gw_lsp_id = lr.external_ids.get(
@@ -1078,15 +1410,18 @@ class NeutronApi(object):
         )
         if is_updated_gw_different_than_existing:
             self._delete_router_interface_by_port(
-                router_id, existing_gw_lsp_id
+                router_id, existing_gw_lsp_id, transaction
             )
-        self._reserve_network_ip(network_id, gateway_ip)
+        self._reserve_network_ip(network_id, gateway_ip, transaction)
 
-        self.ovn_north.create_ovn_update_command(
-            ovnconst.TABLE_LR, router_id
-        ).add(ovnconst.ROW_LR_NAME, name, name).add(
-            ovnconst.ROW_LR_ENABLED, enabled
-        ).execute()
+        transaction.add(
+            self.ovn_north.create_ovn_update_command(
+                ovnconst.TABLE_LR, router_id
+            )
+            .add(ovnconst.ROW_LR_NAME, name, name)
+            .add(ovnconst.ROW_LR_ENABLED, enabled)
+            .build_command()
+        )
 
         should_external_gw_be_added = (
             is_updated_gw_different_than_existing
@@ -1095,9 +1430,8 @@ class NeutronApi(object):
 
         if should_external_gw_be_added:
             self._add_external_gateway_to_router(
-                gateway_ip, gateway_subnet, network_id, router_id
+                gateway_ip, gateway_subnet, network_id, router_id, transaction
             )
-        return self.get_router(router_id)
 
     def _is_updated_gw_different_than_existing(
         self, lr, new_gateway_subnet, new_gateway_ip, existing_lr_gw_lsp_id
@@ -1119,20 +1453,28 @@ class NeutronApi(object):
         )
 
     def delete_router(self, router_id):
-        existing_gw_lsp_id = self.ovn_north.get_lr(
-            lr_id=router_id
-        ).external_ids.get(RouterMapper.OVN_ROUTER_GATEWAY_PORT)
-        if existing_gw_lsp_id:
-            self._delete_router_interface_by_port(
-                router_id, existing_gw_lsp_id
-            )
-
-        validate.router_has_no_ports(self.ovn_north.get_lr(lr_id=router_id))
-        self.ovn_north.remove_router(router_id)
+        lr = self.ovn_north.get_lr(lr_id=router_id)
+        existing_gw_lsp_id = lr.external_ids.get(
+            RouterMapper.OVN_ROUTER_GATEWAY_PORT
+        )
+        validate.router_has_no_ports(
+            lr,
+            gateway_lrp=(
+                self.ovn_north.get_lrp(lsp_id=existing_gw_lsp_id)
+                if existing_gw_lsp_id
+                else None
+            ),
+        )
+        with self.tx_manager.transaction() as tx:
+            if existing_gw_lsp_id:
+                self._delete_router_interface_by_port(
+                    router_id, existing_gw_lsp_id, tx
+                )
+            self.ovn_north.remove_router(router_id, transaction=tx)
 
     def _validate_router_exists(self, router_id):
         try:
-            self.idl.lookup(ovnconst.TABLE_LR, router_id)
+            ovn_connection.lookup(self.idl, ovnconst.TABLE_LR, router_id)
         except RowNotFound:
             raise ElementNotFoundError(
                 'Router {router} does not exist'.format(router=router_id)
@@ -1148,7 +1490,7 @@ class NeutronApi(object):
     def _get_subnet_gateway_router_id(self, subnet):
         return subnet.external_ids.get(SubnetMapper.OVN_GATEWAY_ROUTER_ID)
 
-    def _set_subnet_gateway_router(self, subnet_id, router_id):
+    def _set_subnet_gateway_router(self, subnet_id, router_id, transaction):
         self.ovn_north.db_set(
             ovnconst.TABLE_DHCP_Options,
             subnet_id,
@@ -1156,14 +1498,16 @@ class NeutronApi(object):
                 ovnconst.ROW_DHCP_EXTERNAL_IDS,
                 {SubnetMapper.OVN_GATEWAY_ROUTER_ID: router_id},
             ),
+            transaction=transaction,
         )
 
-    def _clear_subnet_gateway_router(self, subnet_id):
+    def _clear_subnet_gateway_router(self, subnet_id, transaction):
         self.ovn_north.remove_key_from_column(
             ovnconst.TABLE_DHCP_Options,
             subnet_id,
             ovnconst.ROW_DHCP_EXTERNAL_IDS,
             SubnetMapper.OVN_GATEWAY_ROUTER_ID,
+            transaction=transaction,
         )
 
     def _validate_create_routing_lsp_by_subnet(
@@ -1198,7 +1542,7 @@ class NeutronApi(object):
             [lrp[ovnconst.ROW_LRP_NETWORKS] for lrp in router_ports], []
         )
 
-    def _create_routing_lsp_by_subnet(self, subnet_id, router_id):
+    def _create_routing_lsp_by_subnet(self, subnet_id, router_id, transaction):
         subnet = self.ovn_north.get_dhcp(dhcp_id=subnet_id)
         network_id = subnet.external_ids.get(SubnetMapper.OVN_NETWORK_ID)
         self._validate_create_routing_lsp_by_subnet(
@@ -1208,24 +1552,24 @@ class NeutronApi(object):
         lsp_id = self._create_port(
             ovnconst.ROUTER_SWITCH_PORT_NAME,
             network_id,
+            transaction=transaction,
         )
         lrp_name = self._create_router_port_name(lsp_id)
         self._connect_port_to_router(
             lsp_id,
             lrp_name,
             router_id,
+            transaction,
             name=ovnconst.ROUTER_SWITCH_PORT_NAME,
             is_enabled=True,
         )
-        self._set_subnet_gateway_router(subnet_id, router_id)
+        self._set_subnet_gateway_router(subnet_id, router_id, transaction)
         return (
             str(lsp_id),
             lrp_name,
             lrp_ip,
             network_id,
-            ip_utils.random_unique_mac(
-                self.ovn_north.list_lsp(), self.ovn_north.list_lrp()
-            ),
+            self.ovn_north.allocate_mac(),
         )
 
     def _validate_subnet_is_not_on_router(self, subnet_id, router_id):
@@ -1235,7 +1579,7 @@ class NeutronApi(object):
                 ' {subnet}'.format(subnet=subnet_id)
             )
 
-    def _update_routing_lsp_by_port(self, port_id, router_id):
+    def _update_routing_lsp_by_port(self, port_id, router_id, transaction):
         port = self.ovn_north.get_lsp(lsp_id=port_id)
         if port.type == ovnconst.LSP_TYPE_ROUTER:
             raise BadRequestError(
@@ -1249,7 +1593,7 @@ class NeutronApi(object):
         lrp_name = self._create_router_port_name(port.name)
         mac = ip_utils.get_port_mac(port)
         self._connect_port_to_router(
-            port.uuid, lrp_name, router_id, is_enabled=True
+            port.uuid, lrp_name, router_id, transaction, is_enabled=True
         )
         return (
             port_id,
@@ -1267,51 +1611,20 @@ class NeutronApi(object):
         )
         return ip_utils.get_ip_with_mask(ip=lsp_ip, cidr=ls_cidr)
 
-    def _reserve_network_ip(self, network_id, gateway_ip):
+    def _reserve_network_ip(self, network_id, gateway_ip, transaction):
         if not network_id:
             return
-        exclude_values = self.ovn_north.get_ls(
-            ls_id=network_id
-        ).other_config.get(ovnconst.LS_OPTION_EXCLUDE_IPS, {})
-        new_values = (
-            (exclude_values + ' ') if exclude_values else str()
-        ) + gateway_ip
-
-        self.ovn_north.db_set(
-            ovnconst.TABLE_LS,
-            network_id,
-            (
-                ovnconst.ROW_LS_OTHER_CONFIG,
-                {ovnconst.LS_OPTION_EXCLUDE_IPS: new_values},
-            ),
+        self.ovn_north.update_exclude_ips(
+            network_id, add=[gateway_ip], transaction=transaction
         )
 
-    def _release_network_ip(self, network_id, ip):
-        exclude_values = self.ovn_north.get_ls(
-            ls_id=network_id
-        ).other_config.get(ovnconst.LS_OPTION_EXCLUDE_IPS, '')
-        values = exclude_values.split()
-        values.remove(ip)
-
-        if values:
-            self.ovn_north.db_set(
-                ovnconst.TABLE_LS,
-                network_id,
-                (
-                    ovnconst.ROW_LS_OTHER_CONFIG,
-                    {ovnconst.LS_OPTION_EXCLUDE_IPS: ' '.join(values)},
-                ),
-            )
-        else:
-            self.ovn_north.remove_key_from_column(
-                ovnconst.TABLE_LS,
-                network_id,
-                ovnconst.ROW_LS_OTHER_CONFIG,
-                ovnconst.LS_OPTION_EXCLUDE_IPS,
-            )
+    def _release_network_ip(self, network_id, ip, transaction):
+        self.ovn_north.update_exclude_ips(
+            network_id, remove=[ip], transaction=transaction
+        )
 
     def _add_external_gateway_interface(
-        self, router_id, network_id, gateway_subnet_id, gateway_ip
+        self, router_id, network_id, gateway_subnet_id, gateway_ip, transaction
     ):
         port_ip = '{ip}/{netmask}'.format(
             ip=gateway_ip,
@@ -1323,52 +1636,64 @@ class NeutronApi(object):
         lsp_id = self._create_port(
             ovnconst.ROUTER_SWITCH_PORT_NAME,
             network_id,
+            transaction=transaction,
         )
         lrp_name = self._create_router_port_name(lsp_id)
-        mac = ip_utils.random_unique_mac(
-            self.ovn_north.list_lsp(), self.ovn_north.list_lrp()
+        mac = self.ovn_north.allocate_mac()
+        self.ovn_north.add_lrp(
+            router_id,
+            lrp_name,
+            mac=mac,
+            lrp_ip=port_ip,
+            transaction=transaction,
         )
-        self.ovn_north.add_lrp(router_id, lrp_name, mac=mac, lrp_ip=port_ip)
         self._connect_port_to_router(
             lsp_id,
             lrp_name,
             router_id,
+            transaction,
             name=ovnconst.ROUTER_SWITCH_PORT_NAME,
             is_enabled=True,
             is_external_gateway=True,
         )
 
-        self.ovn_north.create_ovn_update_command(
-            ovnconst.TABLE_LR, router_id
-        ).add(
-            ovnconst.ROW_LR_EXTERNAL_IDS,
-            {
-                RouterMapper.OVN_ROUTER_GATEWAY_PORT: str(lsp_id),
-            },
-        ).execute()
+        transaction.add(
+            self.ovn_north.create_ovn_update_command(
+                ovnconst.TABLE_LR, router_id
+            )
+            .add(
+                ovnconst.ROW_LR_EXTERNAL_IDS,
+                {
+                    RouterMapper.OVN_ROUTER_GATEWAY_PORT: str(lsp_id),
+                },
+            )
+            .build_command()
+        )
 
     @AddRouterInterfaceMapper.validate_update
     @AddRouterInterfaceMapper.map_from_rest
     @AddRouterInterfaceMapper.map_to_rest
     def add_router_interface(self, router_id, subnet_id=None, port_id=None):
         self._validate_router_exists(router_id)
-        port_id, lrp_name, lrp_ip, network_id, mac = (
-            self._create_routing_lsp_by_subnet(subnet_id, router_id)
-            if subnet_id
-            else self._update_routing_lsp_by_port(port_id, router_id)
-        )
-        subnet = (
-            self.ovn_north.get_dhcp(dhcp_id=subnet_id)
-            if subnet_id
-            else self.ovn_north.get_dhcp(ls_id=network_id)
-        )
-        self.ovn_north.add_lrp(
-            router_id,
-            lrp_name,
-            mac=mac,
-            lrp_ip=lrp_ip,
-            ipv6_ra_configs=self._get_ra_configs(subnet),
-        )
+        with self.tx_manager.transaction() as tx:
+            port_id, lrp_name, lrp_ip, network_id, mac = (
+                self._create_routing_lsp_by_subnet(subnet_id, router_id, tx)
+                if subnet_id
+                else self._update_routing_lsp_by_port(port_id, router_id, tx)
+            )
+            subnet = (
+                self.ovn_north.get_dhcp(dhcp_id=subnet_id)
+                if subnet_id
+                else self.ovn_north.get_dhcp(ls_id=network_id)
+            )
+            self.ovn_north.add_lrp(
+                router_id,
+                lrp_name,
+                mac=mac,
+                lrp_ip=lrp_ip,
+                ipv6_ra_configs=self._get_ra_configs(subnet),
+                transaction=tx,
+            )
 
         return RouterInterface(
             id=router_id,
@@ -1415,18 +1740,23 @@ class NeutronApi(object):
     @RemoveRouterInterfaceMapper.map_from_rest
     @RemoveRouterInterfaceMapper.map_to_rest
     def delete_router_interface(self, router_id, subnet_id=None, port_id=None):
-        if subnet_id and port_id:
-            return self._delete_router_interface_by_subnet_and_port(
-                router_id, subnet_id, port_id
-            )
-        elif subnet_id:
-            return self._delete_router_interface_by_subnet(
-                router_id, subnet_id
-            )
-        else:
-            return self._delete_router_interface_by_port(router_id, port_id)
+        with self.tx_manager.transaction() as tx:
+            if subnet_id and port_id:
+                return self._delete_router_interface_by_subnet_and_port(
+                    router_id, subnet_id, port_id, tx
+                )
+            elif subnet_id:
+                return self._delete_router_interface_by_subnet(
+                    router_id, subnet_id, tx
+                )
+            else:
+                return self._delete_router_interface_by_port(
+                    router_id, port_id, tx
+                )
 
-    def _delete_router_interface_by_port(self, router_id, port_id):
+    def _delete_router_interface_by_port(
+        self, router_id, port_id, transaction
+    ):
         lsp = self.ovn_north.get_lsp(lsp_name=port_id)
         validate.port_is_connected_to_router(lsp)
 
@@ -1442,13 +1772,13 @@ class NeutronApi(object):
             and self._is_subnet_on_router(router_id, subnet_id)
             and lrp_ip == ip_utils.get_subnet_gateway(subnet)
         )
-        self._delete_router_interface(router_id, port_id, lrp, lr)
+        self._delete_router_interface(router_id, port_id, lrp, lr, transaction)
         if is_subnet_gateway:
-            self._clear_subnet_gateway_router(str(subnet.uuid))
+            self._clear_subnet_gateway_router(str(subnet.uuid), transaction)
 
         lr_gw_port = lr.external_ids.get(RouterMapper.OVN_ROUTER_GATEWAY_PORT)
         if port_id == lr_gw_port:
-            self._remove_lr_gw_port(lr, ls_id, lrp_ip)
+            self._remove_lr_gw_port(lr, ls_id, lrp_ip, transaction)
         return RouterInterface(
             id=router_id,
             ls_id=ls_id,
@@ -1456,16 +1786,21 @@ class NeutronApi(object):
             dhcp_options_id=subnet_id,
         )
 
-    def _remove_lr_gw_port(self, lr, ls_id, lrp_ip):
+    def _remove_lr_gw_port(self, lr, ls_id, lrp_ip, transaction):
         self.ovn_north.remove_key_from_column(
             ovnconst.TABLE_LR,
             str(lr.uuid),
             ovnconst.ROW_LR_EXTERNAL_IDS,
             RouterMapper.OVN_ROUTER_GATEWAY_PORT,
+            transaction=transaction,
+        )
+        self.ovn_north.remove_static_route(
+            lr, ovnconst.DEFAULT_ROUTE4, transaction=transaction
         )
-        self.ovn_north.remove_static_route(lr, ovnconst.DEFAULT_ROUTE4)
-        self.ovn_north.remove_static_route(lr, ovnconst.DEFAULT_ROUTE6)
-        self._release_network_ip(ls_id, lrp_ip)
+        self.ovn_north.remove_static_route(
+            lr, ovnconst.DEFAULT_ROUTE6, transaction=transaction
+        )
+        self._release_network_ip(ls_id, lrp_ip, transaction)
 
     def _is_subnet_on_router(self, router_id, subnet_id):
         lr = self.ovn_north.get_lr(lr_id=router_id)
@@ -1476,27 +1811,33 @@ class NeutronApi(object):
                 return True
         return False
 
-    def _delete_router_interface(self, router_id, port_id, lrp, lr):
+    def _delete_router_interface(
+        self, router_id, port_id, lrp, lr, transaction
+    ):
         if lrp not in lr.ports:
             raise BadRequestError(
                 'Port {port} is not connected to router {router}'.format(
                     port=port_id, router=router_id
                 )
             )
-        self.ovn_north.remove_lrp(lrp.uuid)
-        self.ovn_north.remove_lsp(port_id)
+        self.ovn_north.remove_lrp(lrp.uuid, transaction=transaction)
+        self.ovn_north.remove_lsp(port_id, transaction=transaction)
 
     def _delete_router_interface_by_subnet_and_port(
-        self, router_id, subnet_id, port_id
+        self, router_id, subnet_id, port_id, transaction
     ):
         subnet = self.ovn_north.get_dhcp(dhcp_id=subnet_id)
         network_id = subnet.external_ids[SubnetMapper.OVN_NETWORK_ID]
         network = self.ovn_north.get_ls(ls_id=network_id)
         lsp = self.ovn_north.get_lsp(lsp_id=port_id)
         validate.port_does_not_belong_to_subnet(lsp, network, subnet_id)
-        return self._delete_router_interface_by_port(router_id, port_id)
+        return self._delete_router_interface_by_port(
+            router_id, port_id, transaction
+        )
 
-    def _delete_router_interface_by_subnet(self, router_id, subnet_id):
+    def _delete_router_interface_by_subnet(
+        self, router_id, subnet_id, transaction
+    ):
         lr = self.ovn_north.get_lr(lr_id=router_id)
         subnet = self.ovn_north.get_dhcp(dhcp_id=subnet_id)
         network_id = subnet.external_ids[SubnetMapper.OVN_NETWORK_ID]
@@ -1509,17 +1850,18 @@ class NeutronApi(object):
             if lsp in network.ports:
                 deleted_lsp_id = lsp_id
                 self._delete_router_interface(
-                    router_id, lsp_id, lrp=lrp, lr=lr
+                    router_id, lsp_id, lrp=lrp, lr=lr, transaction=transaction
                 )
                 if lsp_id == lr_gw_port:
                     self._remove_lr_gw_port(
                         lr,
                         network_id,
                         ip_utils.get_ip_from_cidr(lrp.networks[0]),
+                        transaction,
                     )
         subnet_gw_router_id = self._get_subnet_gateway_router_id(subnet)
         if subnet_gw_router_id == router_id:
-            self._clear_subnet_gateway_router(str(subnet.uuid))
+            self._clear_subnet_gateway_router(str(subnet.uuid), transaction)
 
         if not deleted_lsp_id:
             raise BadRequestError(
@@ -1559,17 +1901,42 @@ class NeutronApi(object):
     def _list_security_groups(self, default_group_id=None):
         if not self.are_security_groups_supported():
             return []
-        security_groups = []
-        for group_data in self.ovn_north.list_security_groups():
-            security_group_rules = self._process_acls(
-                default_group_id,
-                group_data,
-                self.ovn_north.list_security_group_rules(group_data),
-            )
-            security_groups.append(
-                SecurityGroup(group_data, security_group_rules)
+        sec_groups = self.ovn_north.list_security_groups()
+        rules_by_group = self.ovn_north.list_security_group_rules_by_group(
+            sec_groups
+        )
+        get_security_group = self._memoized_security_groups(sec_groups)
+        return [
+            SecurityGroup(
+                sec_group,
+                self._process_acls(
+                    default_group_id,
+                    sec_group,
+                    rules_by_group[sec_group.uuid],
+                    get_security_group,
+                ),
             )
-        return security_groups
+            for sec_group in sec_groups
+        ]
+
+    def _memoized_security_groups(self, sec_groups):
+        """
+        :return: a function getting a security group by its id or name, which
+        looks up each of the groups not in sec_groups only once
+        """
+        known_groups = {}
+        for sec_group in sec_groups:
+            known_groups[str(sec_group.uuid)] = sec_group
+            known_groups[str(sec_group.name)] = sec_group
+
+        def get_security_group(sec_group_id):
+            if sec_group_id not in known_groups:
+                known_groups[sec_group_id] = (
+                    self.ovn_north.get_security_group(sec_group_id)
+                )
+            return known_groups[sec_group_id]
+
+        return get_security_group
 
     @SecurityGroupMapper.map_to_rest
     @wrap_default_group_id
@@ -1578,30 +1945,33 @@ class NeutronApi(object):
         security_group = self.ovn_north.get_security_group(sec_group_id)
         all_rules = self.ovn_north.list_security_group_rules(security_group)
         security_group_rules = self._process_acls(
-            default_group_id, security_group, all_rules
+            default_group_id,
+            security_group,
+            all_rules,
+            self._memoized_security_groups([security_group]),
         )
         return SecurityGroup(
             sec_group=security_group, sec_group_rules=security_group_rules
         )
 
-    def _process_acls(self, default_group_id, security_group, acls):
+    def _process_acls(
+        self, default_group_id, security_group, acls, get_security_group
+    ):
         return [
             self._build_security_group_rule_wrapper(
-                default_group_id, acl, security_group
+                default_group_id, acl, security_group, get_security_group
             )
             for acl in acls
         ]
 
     def _build_security_group_rule_wrapper(
-        self, default_group_id, acl, security_group
+        self, default_group_id, acl, security_group, get_security_group
     ):
         remote_group_id = acl.external_ids.get(
             SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_REMOTE_GROUP_ID
         )
         remote_group = (
-            self.ovn_north.get_security_group(remote_group_id)
-            if remote_group_id
-            else None
+            get_security_group(remote_group_id) if remote_group_id else None
         )
         return SecurityGroupRule(
             acl,
@@ -1640,20 +2010,11 @@ class NeutronApi(object):
     @wrap_default_group_id
     @assure_security_groups_support
     def list_security_group_rules(self, default_group_id=None):
-        security_groups = self._list_security_groups(default_group_id)
-        security_group_rules = []
-        for sec_group in security_groups:
-            security_group_rules.extend(
-                self._process_acls(
-                    default_group_id,
-                    sec_group.sec_group,
-                    [
-                        rule_wrapper.rule
-                        for rule_wrapper in sec_group.sec_group_rules
-                    ],
-                )
-            )
-        return security_group_rules
+        return [
+            rule
+            for sec_group in self._list_security_groups(default_group_id)
+            for rule in sec_group.sec_group_rules
+        ]
 
     @SecurityGroupRuleMapper.map_to_rest
     @wrap_default_group_id
@@ -30,10 +30,7 @@ import six
 import constants as ovnconst
 import neutron.constants as neutron_constants
 import neutron.ip as ip_utils
-from ovirt_provider_config_common import dhcp_ipv6_address_mode
-from ovirt_provider_config_common import dhcp_mtu
-from ovirt_provider_config_common import tenant_id
-from ovirt_provider_config_common import max_allowed_mtu
+from ovirt_provider_config_common import config_snapshot
 from handlers.base_handler import MethodNotAllowedError
 from handlers.base_handler import BadRequestError
 
@@ -98,6 +95,22 @@ class Mapper(object):
     REST_TENANT_ID = 'tenant_id'
     REST_PROJECT_ID = 'project_id'
 
+    # REST fields which can be read straight from the db rows, mapped to the
+    # function reading them. Used to filter rows before they are mapped.
+    ROW_FILTERS = {}
+
+    @classmethod
+    def row_matches(cls, filters, *rows):
+        """
+        Checks the filters on the fields in ROW_FILTERS. Filters on any other
+        field are ignored and have to be checked on the mapped rows.
+        """
+        return all(
+            cls.ROW_FILTERS[key](*rows) == value
+            for key, value in filters.items()
+            if key in cls.ROW_FILTERS
+        )
+
     @classmethod
     def map_from_rest(cls, f):
         @wraps(f)
@@ -206,6 +219,14 @@ class NetworkMapper(Mapper):
 
     NETWORK_STATUS_ACTIVE = 'ACTIVE'
 
+    ROW_FILTERS = {
+        REST_NETWORK_ID: lambda ls: str(ls.uuid),
+        REST_NETWORK_NAME: lambda ls: ls.external_ids.get(
+            NetworkMapper.OVN_NETWORK_NAME
+        )
+        or ls.name,
+    }
+
     @staticmethod
     def rest2row(wrapped_self, func, rest_network_data, network_id):
         network_name = rest_network_data.get(NetworkMapper.REST_NETWORK_NAME)
@@ -247,7 +268,7 @@ class NetworkMapper(Mapper):
         result = {
             NetworkMapper.REST_NETWORK_ID: str(ls.uuid),
             NetworkMapper.REST_NETWORK_NAME: network_name or ls.name,
-            NetworkMapper.REST_TENANT_ID: tenant_id(),
+            NetworkMapper.REST_TENANT_ID: config_snapshot().tenant_id,
             NetworkMapper.REST_STATUS: NetworkMapper.NETWORK_STATUS_ACTIVE,
             NetworkMapper.REST_PORT_SECURITY_ENABLED: Mapper._str2bool(
                 str(
@@ -257,8 +278,9 @@ class NetworkMapper(Mapper):
                 )
             ),
         }
-        result[NetworkMapper.REST_MTU] = int(
-            ls.external_ids.get(NetworkMapper.OVN_MTU, dhcp_mtu())
+        mtu = ls.external_ids.get(NetworkMapper.OVN_MTU)
+        result[NetworkMapper.REST_MTU] = (
+            int(mtu) if mtu is not None else config_snapshot().dhcp_mtu
         )
         result.update(NetworkMapper._row2rest_localnet(localnet_lsp))
         return result
@@ -352,7 +374,7 @@ class NetworkMapper(Mapper):
 
     @staticmethod
     def _validate_rest_input_max_mtu(mtu):
-        configured_max_mtu = max_allowed_mtu()
+        configured_max_mtu = config_snapshot().max_allowed_mtu
         if configured_max_mtu != 0 and mtu > configured_max_mtu:
             raise InvalidMtuDataError(
                 'Requested MTU is too big, maximum is {max_mtu}'.format(
@@ -385,6 +407,20 @@ class PortMapper(Mapper):
     DEVICE_OWNER_ROUTER = 'network:router_interface'
     DEVICE_OWNER_ROUTER_GATEWAY = 'network:router_gateway'
 
+    ROW_FILTERS = {
+        REST_PORT_ID: lambda lsp, ls: lsp.name,
+        REST_PORT_NETWORK_ID: lambda lsp, ls: str(ls.uuid),
+        REST_PORT_NAME: lambda lsp, ls: lsp.external_ids.get(
+            PortMapper.OVN_NIC_NAME
+        ),
+        REST_PORT_DEVICE_ID: lambda lsp, ls: lsp.external_ids.get(
+            PortMapper.OVN_DEVICE_ID
+        ),
+        REST_PORT_MAC_ADDRESS: lambda lsp, ls: lsp.addresses[0].split(' ')[0]
+        if lsp.addresses
+        else None,
+    }
+
     @staticmethod
     def rest2row(wrapped_self, func, rest_data, port_id):
         network_id = rest_data.get(PortMapper.REST_PORT_NETWORK_ID)
@@ -456,7 +492,7 @@ class PortMapper(Mapper):
             PortMapper.REST_PORT_SECURITY_ENABLED: PortMapper.is_port_security_enabled(  # noqa: E501
                 lsp
             ),
-            PortMapper.REST_TENANT_ID: tenant_id(),
+            PortMapper.REST_TENANT_ID: config_snapshot().tenant_id,
             PortMapper.REST_PORT_FIXED_IPS: PortMapper.get_fixed_ips(
                 lsp, dhcp_options, lrp
             ),
@@ -610,6 +646,16 @@ class SubnetMapper(Mapper):
     IP_VERSION_6 = 6
     ALLOWED_IP_VERSIONS = [IP_VERSION_4, IP_VERSION_6]
 
+    ROW_FILTERS = {
+        REST_SUBNET_ID: lambda dhcp: str(dhcp.uuid),
+        REST_SUBNET_NAME: lambda dhcp: dhcp.external_ids.get(
+            SubnetMapper.OVN_NAME
+        ),
+        REST_SUBNET_NETWORK_ID: lambda dhcp: dhcp.external_ids.get(
+            SubnetMapper.OVN_NETWORK_ID
+        ),
+    }
+
     IPV6_ADDRESS_MODE_STATEFUL = 'dhcpv6-stateful'
     IPV6_ADDRESS_MODE_STATELESS = 'dhcpv6-stateless'
 
@@ -652,7 +698,11 @@ class SubnetMapper(Mapper):
         ipv6_address_mode = SubnetMapper.ovn_ipv6_address_mode.get(
             rest_data.get(
                 SubnetMapper.REST_SUBNET_IPV6_ADDRESS_MODE,
-                dhcp_ipv6_address_mode() if ip_version == 6 else None,
+                (
+                    config_snapshot().dhcp_ipv6_address_mode
+                    if ip_version == 6
+                    else None
+                ),
             )
         )
 
@@ -692,7 +742,7 @@ class SubnetMapper(Mapper):
             SubnetMapper.REST_SUBNET_IP_VERSION: ip_utils.get_subnet_ip_version(  # noqa: E501
                 row
             ),
-            SubnetMapper.REST_TENANT_ID: tenant_id(),
+            SubnetMapper.REST_TENANT_ID: config_snapshot().tenant_id,
             SubnetMapper.REST_SUBNET_ENABLE_DHCP: True,
             SubnetMapper.REST_SUBNET_ALLOCATION_POOLS: [
                 SubnetMapper.get_allocation_pool(row.cidr),
@@ -761,7 +811,7 @@ class SubnetMapper(Mapper):
             ip_version == SubnetMapper.IP_VERSION_6
             and rest_data.get(
                 SubnetMapper.REST_SUBNET_IPV6_ADDRESS_MODE,
-                dhcp_ipv6_address_mode(),
+                config_snapshot().dhcp_ipv6_address_mode,
             )
             != SubnetMapper.IPV6_ADDRESS_MODE_STATEFUL
         ):
@@ -847,6 +897,11 @@ class RouterMapper(Mapper):
     ROUTER_STATUS_ACTIVE = 'ACTIVE'
     ROUTER_STATUS_INACTIVE = 'INACTIVE'
 
+    ROW_FILTERS = {
+        REST_ROUTER_ID: lambda lr: str(lr.uuid),
+        REST_ROUTER_NAME: lambda lr: lr.name,
+    }
+
     @staticmethod
     def rest2row(wrapped_self, func, rest_data, router_id):
         name = rest_data.get(RouterMapper.REST_ROUTER_NAME)
@@ -907,7 +962,7 @@ class RouterMapper(Mapper):
             RouterMapper.REST_ROUTER_STATUS: RouterMapper.ROUTER_STATUS_ACTIVE
             if row.enabled
             else RouterMapper.ROUTER_STATUS_INACTIVE,
-            RouterMapper.REST_TENANT_ID: tenant_id(),
+            RouterMapper.REST_TENANT_ID: config_snapshot().tenant_id,
             RouterMapper.REST_ROUTER_EXTERNAL_GATEWAY_INFO: RouterMapper._get_external_gateway_from_row(  # noqa: E501
                 router
             ),
@@ -1041,7 +1096,9 @@ class BaseRouterInterfaceMapper(Mapper):
             AddRouterInterfaceMapper.REST_ROUTERINTERFACE_SUBNET_IDS: [
                 row.dhcp_options_id
             ],
-            AddRouterInterfaceMapper.REST_TENANT_ID: tenant_id(),
+            AddRouterInterfaceMapper.REST_TENANT_ID: (
+                config_snapshot().tenant_id
+            ),
         }
 
     @staticmethod
@@ -84,14 +84,32 @@ def fixed_ips_require_stateful_dhcp(subnet, fixed_ips):
         )
 
 
-def ip_available_in_network(network, ip):
-    if not ip_utils.is_ip_available_in_network(network, ip):
+def ip_available_in_network(
+    network, ip, is_available=ip_utils.is_ip_available_in_network
+):
+    if not is_available(network, ip):
         raise RestDataError(
             f'The ip {ip} specified is already in use on '
             f'network {str(network.uuid)}'
         )
 
 
+def fixed_ips_unique(rest_ports):
+    requested_ips = set()
+    for rest_port in rest_ports:
+        network_id = rest_port.get(PortMapper.REST_PORT_NETWORK_ID)
+        for fixed_ip in rest_port.get(PortMapper.REST_PORT_FIXED_IPS) or []:
+            ip = fixed_ip.get(PortMapper.REST_PORT_IP_ADDRESS)
+            if not ip:
+                continue
+            if (network_id, ip) in requested_ips:
+                raise RestDataError(
+                    f'The ip {ip} is requested by more than one port on '
+                    f'network {network_id}'
+                )
+            requested_ips.add((network_id, ip))
+
+
 def port_ip_for_router(port_ip, port, router_id):
     if not port_ip:
         raise ElementNotFoundError(
@@ -184,8 +202,8 @@ def port_is_connected_to_router(lsp):
         )
 
 
-def router_has_no_ports(lr):
-    if lr.ports:
+def router_has_no_ports(lr, gateway_lrp=None):
+    if any(lrp != gateway_lrp for lrp in lr.ports):
         raise ConflictError(
             'Router {router_id} still has ports'.format(router_id=lr.uuid)
         )
@@ -19,7 +19,10 @@
 from __future__ import absolute_import
 
 import glob
+import logging
 import os
+import threading
+
 from six.moves import configparser
 
 
@@ -30,6 +33,20 @@ CONFD_FILES = '*.conf'
 CONFIG_SECTION_OVN_REMOTE = 'OVN REMOTE'
 KEY_OVN_REMOTE = 'ovn-remote'
 DEFAULT_OVN_REMOTE_AT_LOCALHOST = 'tcp:127.0.0.1:6641'
+KEY_OVN_SNAPSHOT_FILE = 'ovn-snapshot-file'
+KEY_OVN_SNAPSHOT_INTERVAL = 'ovn-snapshot-interval'
+# an empty snapshot file disables the snapshot
+DEFAULT_OVN_SNAPSHOT_FILE = '/var/lib/ovirt-provider-ovn/ovn-north.snapshot'
+DEFAULT_OVN_SNAPSHOT_INTERVAL = 60.0
+KEY_OVN_READ_FROM_FOLLOWERS = 'ovn-read-from-followers'
+KEY_OVN_READ_MAX_STALENESS = 'ovn-read-max-staleness'
+DEFAULT_OVN_READ_FROM_FOLLOWERS = False
+DEFAULT_OVN_READ_MAX_STALENESS = 5.0
+KEY_OVN_GROUP_COMMIT_MAX_BATCH = 'ovn-group-commit-max-batch'
+KEY_OVN_GROUP_COMMIT_WAIT = 'ovn-group-commit-wait'
+# a batch of at most one transaction disables the group commit
+DEFAULT_OVN_GROUP_COMMIT_MAX_BATCH = 1
+DEFAULT_OVN_GROUP_COMMIT_WAIT = 0.005
 
 CONFIG_SECTION_PROVIDER = 'PROVIDER'
 KEY_NOVA_PORT = 'nova-port'
@@ -44,6 +61,18 @@ KEY_OPENSTACK_TENANT_NAME = 'openstack-tenant-name'
 KEY_OPENSTACK_TENANT_DESCRIPTION = 'openstack-tenant-description'
 KEY_OVS_VERSION_29 = 'ovs-version-2.9'
 KEY_URL_FILTER_EXCEPTION = 'url_filter_exception'
+KEY_SERVER_WORKER_THREADS = 'server-worker-threads'
+KEY_SERVER_MAX_QUEUED_REQUESTS = 'server-max-queued-requests'
+KEY_KEEP_ALIVE_TIMEOUT = 'keep-alive-timeout'
+KEY_KEEP_ALIVE_MAX_REQUESTS = 'keep-alive-max-requests'
+KEY_RESPONSE_CACHE_SIZE = 'response-cache-size'
+KEY_METRICS_PORT = 'metrics-port'
+KEY_PROFILING_SAMPLE_RATE = 'profiling-sample-rate'
+KEY_PROFILING_SLOW_REQUEST_THRESHOLD = 'profiling-slow-request-threshold'
+KEY_PROFILING_HEADER_ENABLED = 'profiling-header-enabled'
+KEY_PROFILING_DIRECTORY = 'profiling-directory'
+KEY_PROFILING_MAX_PROFILES = 'profiling-max-profiles'
+KEY_CONFIG_RELOAD_INTERVAL = 'config-reload-interval'
 
 DEFAULT_NOVA_PORT = 9696
 DEFAULT_NEUTRON_PORT = 9696
@@ -57,6 +86,23 @@ DEFAULT_OPENSTACK_TENANT_NAME = 'tenant'
 DEFAULT_OPENSTACK_TENANT_DESCRIPTION = 'tenant'
 DEFAULT_OVS_VERSION_29 = False
 DEFAULT_URL_FILTER_EXCEPTION = ''
+# 0 worker threads restores the single threaded server
+DEFAULT_SERVER_WORKER_THREADS = 8
+DEFAULT_SERVER_MAX_QUEUED_REQUESTS = 64
+DEFAULT_KEEP_ALIVE_TIMEOUT = 15.0
+DEFAULT_KEEP_ALIVE_MAX_REQUESTS = 1000
+# in MiB, 0 disables the cache
+DEFAULT_RESPONSE_CACHE_SIZE = 0
+# 0 disables the metrics server
+DEFAULT_METRICS_PORT = 0
+# profiling is disabled unless requests are sampled or the header is enabled
+DEFAULT_PROFILING_SAMPLE_RATE = 0.0
+DEFAULT_PROFILING_SLOW_REQUEST_THRESHOLD = 1.0
+DEFAULT_PROFILING_HEADER_ENABLED = False
+DEFAULT_PROFILING_DIRECTORY = '/var/log/ovirt-provider-ovn-profiles'
+DEFAULT_PROFILING_MAX_PROFILES = 50
+# 0 disables checking the configuration files for changes
+DEFAULT_CONFIG_RELOAD_INTERVAL = 10.0
 
 
 CONFIG_SECTION_SSL = 'SSL'
@@ -97,16 +143,26 @@ KEY_AUTH_PLUGIN = 'auth-plugin'
 DEFAULT_AUTH_PLUGIN = 'auth.plugins.static_token:MagicTokenPlugin'
 KEY_AUTH_TOKEN_TIMEOUT = 'auth-token-timeout'
 DEFAULT_AUTH_TOKEN_TIMEOUT = 360000
+KEY_AUTH_TOKEN_CACHE_SIZE = 'auth-token-cache-size'
+DEFAULT_AUTH_TOKEN_CACHE_SIZE = 1024
+KEY_AUTH_TOKEN_CACHE_TTL = 'auth-token-cache-ttl'
+DEFAULT_AUTH_TOKEN_CACHE_TTL = 60.0
+KEY_AUTH_TOKEN_CACHE_NEGATIVE_TTL = 'auth-token-cache-negative-ttl'
+DEFAULT_AUTH_TOKEN_CACHE_NEGATIVE_TTL = 5.0
 
 CONFIG_SECTION_NETWORK = 'NETWORK'
 KEY_NETWORK_PORT_SECURITY_ENABLED = 'port-security-enabled-default'
 DEFAULT_NETWORK_PORT_SECURITY_ENABLED = False
+KEY_NETWORK_MAC_PREFIX = 'mac-prefix'
+# Leading bytes of the macs allocated to new ports, 02 is locally administered
+DEFAULT_NETWORK_MAC_PREFIX = '02'
 
 CONFIG_SECTION_OVIRT = 'OVIRT'
 KEY_OVIRT_HOST = 'ovirt-host'
 KEY_OVIRT_BASE = 'ovirt-base'
 KEY_OVIRT_CA_FILE = 'ovirt-ca-file'
 KEY_OVIRT_AUTH_TIMEOUT = 'ovirt-auth-timeout'
+KEY_OVIRT_HTTP_POOL_SIZE = 'ovirt-http-pool-size'
 KEY_OVIRT_SSO_CLIENT_ID = 'ovirt-sso-client-id'
 KEY_OVIRT_SSO_CLIENT_SECRET = 'ovirt-sso-client-secret'
 KEY_OVIRT_ADMIN_USER_NAME = 'ovirt-admin-user-name'
@@ -120,6 +176,8 @@ DEFAULT_OVIRT_CA_FILE = '/etc/pki/ovirt-engine/ca.pem'
 DEFAULT_OVIRT_SSO_CLIENT_ID = 'ovirt-engine-core'
 DEFAULT_OVIRT_SSO_CLIENT_SECRET = 'secret'
 DEFAULT_OVIRT_AUTH_TIMEOUT = 110.0
+# Connections kept open to the engine, per engine url
+DEFAULT_OVIRT_HTTP_POOL_SIZE = 10
 DEFAULT_ENGINE_NETWORK_ADMIN_USER_NAME = 'netadmin@internal'
 DEFAULT_ENGINE_NETWORK_ADMIN_ROLE_ID = 'def00005-0000-0000-0000-def000000005'
 DEFAULT_ENGINE_ADMIN_GROUP_ATTRIBUTE_NAME = 'AAA_AUTHZ_GROUP_NAME;java.lang.String;0eebe54f-b429-44f3-aa80-4704cbb16835'  # noqa: E501
@@ -138,42 +196,142 @@ PROTOCOL_SSL = 'ssl'
 
 
 _config = None
+# Called without arguments on each load of the configuration, reading the
+# new one before it is swapped in, to return a function applying it once it
+# is, or None
+_load_listeners = []
+_reload_requested = threading.Event()
+# The configuration being loaded, read by the listeners of the loading thread
+_loading = threading.local()
 
 
 def load():
+    """
+    Reads the configuration files and swaps in the new configuration, along
+    with what the listeners made of it. If reading it or any listener fails,
+    the previous configuration is kept.
+    """
     global _config
-    _config = configparser.ConfigParser()
-    _config.read(CONFIG_FILE)
-    _config.read(sorted(glob.glob(os.path.join(CONFD_DIR, CONFD_FILES))))
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    config.read(_confd_files())
+    _loading.config = config
+    try:
+        appliers = [listener() for listener in list(_load_listeners)]
+    finally:
+        _loading.config = None
+    # The readers see either the previous or the new configuration as a
+    # whole, never a partially read one
+    _config = config
+    for apply in appliers:
+        if apply:
+            apply()
+
+
+def _confd_files():
+    return sorted(glob.glob(os.path.join(CONFD_DIR, CONFD_FILES)))
+
+
+def add_load_listener(listener):
+    _load_listeners.append(listener)
+
+
+def request_reload():
+    """
+    Asks the thread started by watch() to load the configuration again. Safe
+    to be called from a signal handler.
+    """
+    _reload_requested.set()
+
+
+def watch(interval):
+    """
+    Starts a thread loading the configuration again when request_reload() is
+    called, or when the configuration files change, checked every
+    `interval` seconds unless the interval is 0.
+    :return: The started ConfigWatcher
+    """
+    watcher = ConfigWatcher(interval)
+    watcher.start()
+    return watcher
+
+
+class ConfigWatcher(threading.Thread):
+    def __init__(self, interval):
+        super(ConfigWatcher, self).__init__(name='config-watcher')
+        self.daemon = True
+        self._interval = interval
+        self._stopped = False
+        self._state = _files_state()
+
+    def stop(self):
+        self._stopped = True
+        _reload_requested.set()
+        self.join()
+
+    def run(self):
+        while True:
+            requested = _reload_requested.wait(
+                self._interval if self._interval > 0 else None
+            )
+            _reload_requested.clear()
+            if self._stopped:
+                return
+            current_state = _files_state()
+            if not requested and current_state == self._state:
+                continue
+            self._state = current_state
+            try:
+                load()
+                logging.info('Configuration reloaded')
+            except Exception:
+                # The previous configuration is kept, and the watcher goes
+                # on, to load the configuration once it is fixed
+                logging.exception('Failed to reload the configuration')
+
+
+def _files_state():
+    state = []
+    for path in [CONFIG_FILE] + _confd_files():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        state.append((path, stat.st_mtime, stat.st_size))
+    return state
+
+
+def _current():
+    return getattr(_loading, 'config', None) or _config
 
 
 def get(section, key, default=None):
-    global _config
+    config = _current()
     try:
-        return _config.get(section, key) if _config else default
+        return config.get(section, key) if config else default
     except (configparser.NoOptionError, configparser.NoSectionError):
         return default
 
 
 def getboolean(section, key, default=None):
-    global _config
+    config = _current()
     try:
-        return _config.getboolean(section, key) if _config else default
+        return config.getboolean(section, key) if config else default
     except (configparser.NoOptionError, configparser.NoSectionError):
         return default
 
 
 def getfloat(section, key, default=None):
-    global _config
+    config = _current()
     try:
-        return _config.getfloat(section, key) if _config else default
+        return config.getfloat(section, key) if config else default
     except (configparser.NoOptionError, configparser.NoSectionError):
         return default
 
 
 def getint(section, key, default=None):
-    global _config
+    config = _current()
     try:
-        return _config.getint(section, key) if _config else default
+        return config.getint(section, key) if config else default
     except (configparser.NoOptionError, configparser.NoSectionError):
         return default
@@ -17,6 +17,9 @@
 # Refer to the README and COPYING files for full details of the license
 from __future__ import absolute_import
 
+from collections import namedtuple
+import itertools
+
 import ovirt_provider_config
 from ovirt_provider_config import CONFIG_SECTION_AUTH
 from ovirt_provider_config import CONFIG_SECTION_DHCP
@@ -26,13 +29,21 @@ from ovirt_provider_config import CONFIG_SECTION_PROVIDER
 from ovirt_provider_config import CONFIG_SECTION_SSL
 from ovirt_provider_config import CONFIG_SECTION_VALIDATION
 from ovirt_provider_config import DEFAULT_AUTH_PLUGIN
+from ovirt_provider_config import DEFAULT_AUTH_TOKEN_CACHE_NEGATIVE_TTL
+from ovirt_provider_config import DEFAULT_AUTH_TOKEN_CACHE_SIZE
+from ovirt_provider_config import DEFAULT_AUTH_TOKEN_CACHE_TTL
 from ovirt_provider_config import DEFAULT_AUTH_TOKEN_TIMEOUT
+from ovirt_provider_config import DEFAULT_CONFIG_RELOAD_INTERVAL
 from ovirt_provider_config import DEFAULT_DHCP_ENABLE_MTU
 from ovirt_provider_config import DEFAULT_DHCP_LEASE_TIME
 from ovirt_provider_config import DEFAULT_DHCP_MTU
 from ovirt_provider_config import DEFAULT_DHCP_DEFAULT_IPV6_ADDRESS_MODE
 from ovirt_provider_config import DEFAULT_DHCP_SERVER_MAC
+from ovirt_provider_config import DEFAULT_KEEP_ALIVE_MAX_REQUESTS
+from ovirt_provider_config import DEFAULT_KEEP_ALIVE_TIMEOUT
 from ovirt_provider_config import DEFAULT_KEYSTONE_PORT
+from ovirt_provider_config import DEFAULT_METRICS_PORT
+from ovirt_provider_config import DEFAULT_NETWORK_MAC_PREFIX
 from ovirt_provider_config import DEFAULT_NETWORK_PORT_SECURITY_ENABLED
 from ovirt_provider_config import DEFAULT_NEUTRON_PORT
 from ovirt_provider_config import DEFAULT_NOVA_PORT
@@ -42,9 +53,23 @@ from ovirt_provider_config import DEFAULT_OPENSTACK_REGION
 from ovirt_provider_config import DEFAULT_OPENSTACK_TENANT_DESCRIPTION
 from ovirt_provider_config import DEFAULT_OPENSTACK_TENANT_ID
 from ovirt_provider_config import DEFAULT_OPENSTACK_TENANT_NAME
+from ovirt_provider_config import DEFAULT_OVN_GROUP_COMMIT_MAX_BATCH
+from ovirt_provider_config import DEFAULT_OVN_GROUP_COMMIT_WAIT
+from ovirt_provider_config import DEFAULT_OVN_READ_FROM_FOLLOWERS
+from ovirt_provider_config import DEFAULT_OVN_READ_MAX_STALENESS
 from ovirt_provider_config import DEFAULT_OVN_REMOTE_AT_LOCALHOST
+from ovirt_provider_config import DEFAULT_OVN_SNAPSHOT_FILE
+from ovirt_provider_config import DEFAULT_OVN_SNAPSHOT_INTERVAL
 from ovirt_provider_config import DEFAULT_OVS_VERSION_29
+from ovirt_provider_config import DEFAULT_PROFILING_DIRECTORY
+from ovirt_provider_config import DEFAULT_PROFILING_HEADER_ENABLED
+from ovirt_provider_config import DEFAULT_PROFILING_MAX_PROFILES
+from ovirt_provider_config import DEFAULT_PROFILING_SAMPLE_RATE
+from ovirt_provider_config import DEFAULT_PROFILING_SLOW_REQUEST_THRESHOLD
 from ovirt_provider_config import DEFAULT_PROVIDER_HOST
+from ovirt_provider_config import DEFAULT_RESPONSE_CACHE_SIZE
+from ovirt_provider_config import DEFAULT_SERVER_MAX_QUEUED_REQUESTS
+from ovirt_provider_config import DEFAULT_SERVER_WORKER_THREADS
 from ovirt_provider_config import DEFAULT_SSL_CERT_FILE
 from ovirt_provider_config import DEFAULT_SSL_CIPHERS_STRING
 from ovirt_provider_config import DEFAULT_SSL_ENABLED
@@ -52,14 +77,22 @@ from ovirt_provider_config import DEFAULT_SSL_KEY_FILE
 from ovirt_provider_config import DEFAULT_URL_FILTER_EXCEPTION
 from ovirt_provider_config import DEFAULT_VALIDATION_MAX_ALLOWED_MTU
 from ovirt_provider_config import KEY_AUTH_PLUGIN
+from ovirt_provider_config import KEY_AUTH_TOKEN_CACHE_NEGATIVE_TTL
+from ovirt_provider_config import KEY_AUTH_TOKEN_CACHE_SIZE
+from ovirt_provider_config import KEY_AUTH_TOKEN_CACHE_TTL
 from ovirt_provider_config import KEY_AUTH_TOKEN_TIMEOUT
+from ovirt_provider_config import KEY_CONFIG_RELOAD_INTERVAL
 from ovirt_provider_config import KEY_DHCP_DEFAULT_IPV6_ADDRESS_MODE
 from ovirt_provider_config import KEY_DHCP_ENABLE_MTU
 from ovirt_provider_config import KEY_DHCP_LEASE_TIME
 from ovirt_provider_config import KEY_DHCP_MTU
 from ovirt_provider_config import KEY_DHCP_SERVER_MAC
 from ovirt_provider_config import KEY_HTTPS_ENABLED
+from ovirt_provider_config import KEY_KEEP_ALIVE_MAX_REQUESTS
+from ovirt_provider_config import KEY_KEEP_ALIVE_TIMEOUT
 from ovirt_provider_config import KEY_KEYSTONE_PORT
+from ovirt_provider_config import KEY_METRICS_PORT
+from ovirt_provider_config import KEY_NETWORK_MAC_PREFIX
 from ovirt_provider_config import KEY_NETWORK_PORT_SECURITY_ENABLED
 from ovirt_provider_config import KEY_NEUTRON_PORT
 from ovirt_provider_config import KEY_NOVA_PORT
@@ -69,9 +102,23 @@ from ovirt_provider_config import KEY_OPENSTACK_REGION
 from ovirt_provider_config import KEY_OPENSTACK_TENANT_DESCRIPTION
 from ovirt_provider_config import KEY_OPENSTACK_TENANT_ID
 from ovirt_provider_config import KEY_OPENSTACK_TENANT_NAME
+from ovirt_provider_config import KEY_OVN_GROUP_COMMIT_MAX_BATCH
+from ovirt_provider_config import KEY_OVN_GROUP_COMMIT_WAIT
+from ovirt_provider_config import KEY_OVN_READ_FROM_FOLLOWERS
+from ovirt_provider_config import KEY_OVN_READ_MAX_STALENESS
 from ovirt_provider_config import KEY_OVN_REMOTE
+from ovirt_provider_config import KEY_OVN_SNAPSHOT_FILE
+from ovirt_provider_config import KEY_OVN_SNAPSHOT_INTERVAL
 from ovirt_provider_config import KEY_OVS_VERSION_29
+from ovirt_provider_config import KEY_PROFILING_DIRECTORY
+from ovirt_provider_config import KEY_PROFILING_HEADER_ENABLED
+from ovirt_provider_config import KEY_PROFILING_MAX_PROFILES
+from ovirt_provider_config import KEY_PROFILING_SAMPLE_RATE
+from ovirt_provider_config import KEY_PROFILING_SLOW_REQUEST_THRESHOLD
 from ovirt_provider_config import KEY_PROVIDER_HOST
+from ovirt_provider_config import KEY_RESPONSE_CACHE_SIZE
+from ovirt_provider_config import KEY_SERVER_MAX_QUEUED_REQUESTS
+from ovirt_provider_config import KEY_SERVER_WORKER_THREADS
 from ovirt_provider_config import KEY_SSL_CACERT_FILE
 from ovirt_provider_config import KEY_SSL_CERT_FILE
 from ovirt_provider_config import KEY_SSL_CIPHERS_STRING
@@ -235,6 +282,54 @@ def ovn_remote():
     )
 
 
+def ovn_read_from_followers():
+    return ovirt_provider_config.getboolean(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_READ_FROM_FOLLOWERS,
+        DEFAULT_OVN_READ_FROM_FOLLOWERS,
+    )
+
+
+def ovn_read_max_staleness():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_READ_MAX_STALENESS,
+        DEFAULT_OVN_READ_MAX_STALENESS,
+    )
+
+
+def ovn_group_commit_max_batch():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_GROUP_COMMIT_MAX_BATCH,
+        DEFAULT_OVN_GROUP_COMMIT_MAX_BATCH,
+    )
+
+
+def ovn_group_commit_wait():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_GROUP_COMMIT_WAIT,
+        DEFAULT_OVN_GROUP_COMMIT_WAIT,
+    )
+
+
+def ovn_snapshot_file():
+    return ovirt_provider_config.get(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_SNAPSHOT_FILE,
+        DEFAULT_OVN_SNAPSHOT_FILE,
+    )
+
+
+def ovn_snapshot_interval():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_OVN_REMOTE,
+        KEY_OVN_SNAPSHOT_INTERVAL,
+        DEFAULT_OVN_SNAPSHOT_INTERVAL,
+    )
+
+
 def dhcp_lease_time():
     return ovirt_provider_config.get(
         CONFIG_SECTION_DHCP, KEY_DHCP_LEASE_TIME, DEFAULT_DHCP_LEASE_TIME
@@ -279,6 +374,30 @@ def auth_token_timeout():
     )
 
 
+def auth_token_cache_size():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_AUTH,
+        KEY_AUTH_TOKEN_CACHE_SIZE,
+        DEFAULT_AUTH_TOKEN_CACHE_SIZE,
+    )
+
+
+def auth_token_cache_ttl():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_AUTH,
+        KEY_AUTH_TOKEN_CACHE_TTL,
+        DEFAULT_AUTH_TOKEN_CACHE_TTL,
+    )
+
+
+def auth_token_cache_negative_ttl():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_AUTH,
+        KEY_AUTH_TOKEN_CACHE_NEGATIVE_TTL,
+        DEFAULT_AUTH_TOKEN_CACHE_NEGATIVE_TTL,
+    )
+
+
 def is_ovn_remote_ssl():
     protocol = ovn_remote().split(':')[0]
     return protocol == PROTOCOL_SSL
@@ -306,9 +425,156 @@ def default_port_security_enabled():
     )
 
 
+def mac_prefix():
+    return ovirt_provider_config.get(
+        CONFIG_SECTION_NETWORK,
+        KEY_NETWORK_MAC_PREFIX,
+        DEFAULT_NETWORK_MAC_PREFIX,
+    )
+
+
 def url_filter_exception():
     return ovirt_provider_config.get(
         CONFIG_SECTION_PROVIDER,
         KEY_URL_FILTER_EXCEPTION,
         DEFAULT_URL_FILTER_EXCEPTION,
     )
+
+
+def server_worker_threads():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER,
+        KEY_SERVER_WORKER_THREADS,
+        DEFAULT_SERVER_WORKER_THREADS,
+    )
+
+
+def server_max_queued_requests():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER,
+        KEY_SERVER_MAX_QUEUED_REQUESTS,
+        DEFAULT_SERVER_MAX_QUEUED_REQUESTS,
+    )
+
+
+def keep_alive_timeout():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_PROVIDER,
+        KEY_KEEP_ALIVE_TIMEOUT,
+        DEFAULT_KEEP_ALIVE_TIMEOUT,
+    )
+
+
+def keep_alive_max_requests():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER,
+        KEY_KEEP_ALIVE_MAX_REQUESTS,
+        DEFAULT_KEEP_ALIVE_MAX_REQUESTS,
+    )
+
+
+def response_cache_size():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER,
+        KEY_RESPONSE_CACHE_SIZE,
+        DEFAULT_RESPONSE_CACHE_SIZE,
+    )
+
+
+def metrics_port():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER, KEY_METRICS_PORT, DEFAULT_METRICS_PORT
+    )
+
+
+def profiling_sample_rate():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_PROVIDER,
+        KEY_PROFILING_SAMPLE_RATE,
+        DEFAULT_PROFILING_SAMPLE_RATE,
+    )
+
+
+def profiling_slow_request_threshold():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_PROVIDER,
+        KEY_PROFILING_SLOW_REQUEST_THRESHOLD,
+        DEFAULT_PROFILING_SLOW_REQUEST_THRESHOLD,
+    )
+
+
+def profiling_header_enabled():
+    return ovirt_provider_config.getboolean(
+        CONFIG_SECTION_PROVIDER,
+        KEY_PROFILING_HEADER_ENABLED,
+        DEFAULT_PROFILING_HEADER_ENABLED,
+    )
+
+
+def profiling_directory():
+    return ovirt_provider_config.get(
+        CONFIG_SECTION_PROVIDER,
+        KEY_PROFILING_DIRECTORY,
+        DEFAULT_PROFILING_DIRECTORY,
+    )
+
+
+def profiling_max_profiles():
+    return ovirt_provider_config.getint(
+        CONFIG_SECTION_PROVIDER,
+        KEY_PROFILING_MAX_PROFILES,
+        DEFAULT_PROFILING_MAX_PROFILES,
+    )
+
+
+def config_reload_interval():
+    return ovirt_provider_config.getfloat(
+        CONFIG_SECTION_PROVIDER,
+        KEY_CONFIG_RELOAD_INTERVAL,
+        DEFAULT_CONFIG_RELOAD_INTERVAL,
+    )
+
+
+# The values read while serving each request, or each row of a response,
+# parsed once per load of the configuration. The generation tells apart
+# the snapshots of the successive loads.
+ConfigSnapshot = namedtuple(
+    'ConfigSnapshot',
+    (
+        'generation',
+        'tenant_id',
+        'dhcp_mtu',
+        'dhcp_ipv6_address_mode',
+        'max_allowed_mtu',
+        'url_filter_exceptions',
+    ),
+)
+
+_generations = itertools.count()
+_snapshot = None
+
+
+def config_snapshot():
+    return _snapshot
+
+
+def _take_snapshot():
+    # Raises ValueError on a malformed value, before the snapshot is swapped
+    snapshot = ConfigSnapshot(
+        generation=next(_generations),
+        tenant_id=tenant_id(),
+        dhcp_mtu=int(dhcp_mtu()),
+        dhcp_ipv6_address_mode=dhcp_ipv6_address_mode(),
+        max_allowed_mtu=max_allowed_mtu(),
+        url_filter_exceptions=frozenset(url_filter_exception().split(',')),
+    )
+    return lambda: _set_snapshot(snapshot)
+
+
+def _set_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+
+ovirt_provider_config.add_load_listener(_take_snapshot)
+_take_snapshot()()
@@ -23,26 +23,45 @@ import atexit
 import logging
 import logging.config
 import os
-import socket
-import ssl
+import signal
 import sys
 import threading
-from six.moves.BaseHTTPServer import HTTPServer
 
 from ovsdbapp.backend.ovs_idl import vlog
 
 import auth
+import metrics
 import ovirt_provider_config
+import ovn_connection
 import version
 
+from handlers.base_handler import BaseHandler
 from handlers.keystone import TokenHandler
+from handlers.metrics_handler import MetricsHandler
 from handlers.neutron import NeutronHandler
+from handlers.response_cache import ResponseCache
+from http_server import create_server
+from http_server import create_ssl_context
+from http_server import ssl_wrap
+from profiler import RequestProfiler
 from ovirt_provider_config_common import ssl_ciphers_string
 from ovirt_provider_config_common import ssl_enabled
 from ovirt_provider_config_common import ssl_key_file
 from ovirt_provider_config_common import ssl_cert_file
 from ovirt_provider_config_common import neturon_port
+from ovirt_provider_config_common import config_reload_interval
 from ovirt_provider_config_common import keystone_port
+from ovirt_provider_config_common import keep_alive_max_requests
+from ovirt_provider_config_common import keep_alive_timeout
+from ovirt_provider_config_common import metrics_port
+from ovirt_provider_config_common import profiling_directory
+from ovirt_provider_config_common import profiling_header_enabled
+from ovirt_provider_config_common import profiling_max_profiles
+from ovirt_provider_config_common import profiling_sample_rate
+from ovirt_provider_config_common import profiling_slow_request_threshold
+from ovirt_provider_config_common import response_cache_size
+from ovirt_provider_config_common import server_max_queued_requests
+from ovirt_provider_config_common import server_worker_threads
 
 
 LOG_CONFIG_FILE = '/etc/ovirt-provider-ovn/logger.conf'
@@ -117,41 +136,124 @@ def main():
     _init_logging()
 
     ovirt_provider_config.load()
+    _watch_config()
     auth.init()
 
-    server_keystone = HTTPServerIPv6(('', keystone_port()), TokenHandler)
-    _ssl_wrap(server_keystone)
+    ssl_context = _create_ssl_context()
+    BaseHandler.profiler = _create_profiler()
+
+    server_keystone = _create_server(keystone_port(), TokenHandler)
+    _ssl_wrap(server_keystone, ssl_context)
     Thread(target=server_keystone.serve_forever).start()
 
-    server_neutron = HTTPServerIPv6(('', neturon_port()), NeutronHandler)
-    _ssl_wrap(server_neutron)
+    NeutronHandler.response_cache = _create_response_cache()
+    server_neutron = _create_server(neturon_port(), NeutronHandler)
+    _ssl_wrap(server_neutron, ssl_context)
     Thread(target=server_neutron.serve_forever).start()
 
+    servers = [server_keystone, server_neutron]
+    _add_stats(server_keystone, server_neutron)
+    if metrics_port() > 0:
+        server_metrics = create_server(
+            ('', metrics_port()), MetricsHandler, 0, 0
+        )
+        _ssl_wrap(server_metrics, ssl_context)
+        Thread(target=server_metrics.serve_forever).start()
+        servers.append(server_metrics)
+
     def kill_handler(signal, frame):
         logging.info('Shutting down http ...')
-        server_keystone.shutdown()
-        server_neutron.shutdown()
+        for server in servers:
+            server.shutdown()
         logging.info('Http shut down successfully, exiting. Bye.')
+        ovn_connection.close()
         logging.shutdown()
 
     atexit.register(kill_handler)
 
 
-class HTTPServerIPv6(HTTPServer):
-    address_family = socket.AF_INET6
+def _watch_config():
+    # Only the settings read while serving requests take effect on reload,
+    # those read at start, like the ports, need a restart
+    def reload_handler(signum, frame):
+        ovirt_provider_config.request_reload()
+
+    signal.signal(signal.SIGHUP, reload_handler)
+    ovirt_provider_config.watch(config_reload_interval())
+
+
+def _create_server(port, handler_class):
+    return create_server(
+        ('', port),
+        handler_class,
+        server_worker_threads(),
+        server_max_queued_requests(),
+        keep_alive_timeout(),
+        keep_alive_max_requests(),
+    )
 
 
-def _ssl_wrap(server):
+def _add_stats(server_keystone, server_neutron):
+    if hasattr(server_keystone, 'stats'):
+        metrics.add_stats(
+            'keystone_server', 'Keystone requests', server_keystone.stats
+        )
+    if hasattr(server_neutron, 'stats'):
+        metrics.add_stats(
+            'neutron_server', 'Neutron requests', server_neutron.stats
+        )
+    if NeutronHandler.response_cache:
+        metrics.add_stats(
+            'response_cache',
+            'Cached list responses',
+            NeutronHandler.response_cache.stats,
+        )
+    metrics.add_stats('mac_allocator', 'Macs of mac-prefix', _mac_report)
+    metrics.add_stats(
+        'ovsdb_replica',
+        'Northbound db replica',
+        ovn_connection.replica_report,
+    )
+    metrics.add_stats(
+        'ovsdb_cluster',
+        'Northbound db servers of the replicas',
+        ovn_connection.cluster_report,
+    )
+
+
+def _mac_report():
+    allocator = ovn_connection.mac_allocator()
+    return allocator.report() if allocator else {}
+
+
+def _create_response_cache():
+    size = response_cache_size()
+    return ResponseCache(size * 1024 * 1024) if size > 0 else None
+
+
+def _create_profiler():
+    if profiling_sample_rate() <= 0 and not profiling_header_enabled():
+        return None
+    return RequestProfiler(
+        profiling_directory(),
+        sample_rate=profiling_sample_rate(),
+        slow_threshold=profiling_slow_request_threshold(),
+        header_enabled=profiling_header_enabled(),
+        max_profiles=profiling_max_profiles(),
+    )
+
+
+def _create_ssl_context():
     if ssl_enabled():
-        server.socket = ssl.wrap_socket(
-            server.socket,
-            keyfile=ssl_key_file(),
-            certfile=ssl_cert_file(),
-            server_side=True,
-            ssl_version=ssl.PROTOCOL_TLSv1_2,
-            ciphers=ssl_ciphers_string(),
+        return create_ssl_context(
+            ssl_key_file(), ssl_cert_file(), ssl_ciphers_string()
         )
 
 
+def _ssl_wrap(server, ssl_context):
+    if ssl_context:
+        ssl_wrap(server, ssl_context)
+
+
 if __name__ == '__main__':
     main()
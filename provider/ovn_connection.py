@@ -20,45 +20,393 @@
 from __future__ import absolute_import
 
 import contextlib
+import logging
+import threading
+import time
 
+import ovs.db.idl
+from ovs.db.idl import ROW_CREATE
+from ovs.db.idl import ROW_DELETE
 import ovs.stream
 import ovsdbapp.backend.ovs_idl.connection
+from ovsdbapp.backend.ovs_idl import idlutils
 from ovsdbapp.backend.ovs_idl.idlutils import RowNotFound
 from ovsdbapp.backend.ovs_idl.transaction import Transaction
 from ovsdbapp.schema.ovn_northbound.impl_idl import OvnNbApiIdlImpl
 
 import constants as ovnconst
+import metrics
+import profiler
+
+import ovndb.cluster_monitor as cluster_monitor
+import ovndb.group_commit as group_commit
+import ovndb.monitored_columns as monitored_columns
+import ovndb.ovn_snapshot as ovn_snapshot
+from ovndb.mac_allocator import MacAllocator
+from ovndb.ovn_index import OvnNorthIndex
+from ovndb.table_versions import TableVersions
 
 from handlers.base_handler import BadRequestError
 from handlers.base_handler import ElementNotFoundError
 
+from ovirt_provider_config_common import dhcp_server_mac
 from ovirt_provider_config_common import is_ovn_remote_ssl
+from ovirt_provider_config_common import mac_prefix
+from ovirt_provider_config_common import ovn_group_commit_max_batch
+from ovirt_provider_config_common import ovn_group_commit_wait
+from ovirt_provider_config_common import ovn_read_from_followers
+from ovirt_provider_config_common import ovn_read_max_staleness
 from ovirt_provider_config_common import ovn_remote
+from ovirt_provider_config_common import ovn_snapshot_file
+from ovirt_provider_config_common import ovn_snapshot_interval
 from ovirt_provider_config_common import ssl_key_file
 from ovirt_provider_config_common import ssl_cacert_file
 from ovirt_provider_config_common import ssl_cert_file
 
 _api_impl = None
+_api_impl_lock = threading.Lock()
+_index = None
+_mac_allocator = None
+_table_versions = None
+_snapshot_writer = None
+_row_listeners = []
+_cluster_monitor = None
+# The connection to any member of the cluster, serving the reads while it is
+# fresh enough, if enabled
+_follower_api_impl = None
+_follower_index = None
+_follower_table_versions = None
+
+_FOLLOWER_MAX_BACKOFF = 60
+
+# Commits the transactions of concurrent requests together, if enabled
+_group_committer = None
+_write_lock = threading.Lock()
+# The transactions pending when the holder of the write lock got it
+_writer = threading.local()
 
 
 def connect():
     global _api_impl
     if _api_impl:
         return _api_impl
-    _api_impl = _create_new_connection()
+    with _api_impl_lock:
+        if not _api_impl:
+            _api_impl = _create_new_connection()
+            logging.info('Northbound db replica: %s', replica_report())
+            _monitor_cluster(_api_impl)
     return _api_impl
 
 
+def read_api():
+    """
+    :return: The api of the follower replica, if reading from followers is
+    enabled and the replica is fresh enough, see ClusterMonitor.is_fresh, or
+    else the api of the leader replica
+    """
+    api = connect()
+    monitor = _cluster_monitor
+    if (
+        _follower_api_impl
+        and monitor
+        and monitor.is_fresh(cluster_monitor.FOLLOWER)
+    ):
+        metrics.OVSDB_REPLICA_READS.inc((cluster_monitor.FOLLOWER,))
+        return _follower_api_impl
+    metrics.OVSDB_REPLICA_READS.inc((cluster_monitor.LEADER,))
+    return api
+
+
+def index(api=None):
+    """
+    :return: The OvnNorthIndex of the IDL of the api, of the leader replica
+    by default, or None if there is no connection yet
+    """
+    if api is not None and api is _follower_api_impl:
+        return _follower_index
+    return _index
+
+
+def mac_allocator():
+    """
+    :return: The MacAllocator of the connected IDL, or None if there is no
+    connection yet
+    """
+    return _mac_allocator
+
+
+def table_version(api, table_names):
+    """
+    :return: The version of the tables in the IDL replica of the api, see
+    TableVersions.version, or None if there is no connection yet
+    """
+    versions = (
+        _follower_table_versions
+        if api is _follower_api_impl
+        else _table_versions
+    )
+    if not versions:
+        return None
+    # The replica is not updated while its versions are read
+    with api.ovsdb_connection.lock:
+        return versions.version(table_names)
+
+
+def add_row_listener(listener):
+    """
+    Registers a listener for the row changes of the IDL replica.
+    listener.notify(event, row, updates) is called from the connection thread
+    for every row created, updated or deleted, including the rows of the
+    initial dump of the database.
+    """
+    _row_listeners.append(listener)
+
+
+def _notify_row_listeners(event, row, updates=None):
+    for listener in _row_listeners:
+        listener.notify(event, row, updates)
+
+
 def _create_new_connection():
+    global _index
+    global _mac_allocator
+    global _table_versions
     configure_ssl_connection()
-    ovsidl = ovsdbapp.backend.ovs_idl.connection.OvsdbIdl.from_server(
-        ovn_remote(), ovnconst.OVN_NORTHBOUND
+    ovsidl = _create_idl(ovn_remote())
+    if isinstance(ovsidl, ovs.db.idl.Idl):
+        # Must be in place before the connection is started, to see the
+        # initial dump of the database
+        ovsidl.notify = _notify_row_listeners
+        _index = OvnNorthIndex(ovsidl.tables)
+        add_row_listener(_index)
+        _mac_allocator = MacAllocator(
+            mac_prefix(), reserved=[dhcp_server_mac()]
+        )
+        add_row_listener(_mac_allocator)
+        _table_versions = TableVersions(ovsidl.tables)
+        add_row_listener(_table_versions)
+    api = OvnNbApiIdlImpl(
+        ovsdbapp.backend.ovs_idl.connection.Connection(
+            idl=ovsidl, timeout=100
+        ),
+        start=False,
+    )
+    # Loaded once the indices are created, to index the rows of the snapshot
+    snapshot_rows = _load_snapshot(ovsidl)
+    api.start_connection(api.ovsdb_connection)
+    if snapshot_rows:
+        _drop_snapshot_rows(api.ovsdb_connection, snapshot_rows)
+    _start_snapshot_writer(api.ovsdb_connection)
+    _start_group_committer(api.ovsdb_connection)
+    return api
+
+
+def _load_snapshot(ovsidl):
+    if not isinstance(ovsidl, ovs.db.idl.Idl) or not ovn_snapshot_file():
+        return []
+    start = time.monotonic()
+    rows = ovn_snapshot.load(ovsidl, ovn_snapshot_file())
+    if rows:
+        logging.info(
+            'Loaded %d rows from the snapshot %s in %.3f seconds',
+            len(rows),
+            ovn_snapshot_file(),
+            time.monotonic() - start,
+        )
+    for row in rows:
+        _notify_row_listeners(ROW_CREATE, row)
+    return rows
+
+
+def _drop_snapshot_rows(connection, snapshot_rows):
+    # If the server sent the whole database instead of the changes since the
+    # snapshot, the IDL dropped the rows of the snapshot without notifying
+    # the listeners
+    with connection.lock:
+        for row in snapshot_rows:
+            if row.uuid not in row._table.rows:
+                _notify_row_listeners(ROW_DELETE, row)
+
+
+def _start_snapshot_writer(connection):
+    global _snapshot_writer
+    if not isinstance(connection.idl, ovs.db.idl.Idl) or not (
+        ovn_snapshot_file()
+    ):
+        return
+    _snapshot_writer = ovn_snapshot.SnapshotWriter(
+        connection, ovn_snapshot_file(), ovn_snapshot_interval()
+    )
+    _snapshot_writer.start()
+
+
+def _start_group_committer(connection):
+    global _group_committer
+    if not isinstance(connection.idl, ovs.db.idl.Idl) or (
+        ovn_group_commit_max_batch() <= 1
+    ):
+        return
+    _group_committer = group_commit.GroupCommitter(
+        connection,
+        _index,
+        ovn_group_commit_max_batch(),
+        ovn_group_commit_wait(),
+    )
+    _group_committer.start()
+
+
+@contextlib.contextmanager
+def write_lock(exclusive=False):
+    """
+    Serializes the changes to the northbound db: picking free macs and ips is
+    check-then-set. With group commit, the lock is released while the
+    transaction of the holder waits to be committed, and the transaction
+    fails with StaleTransaction if it may have been validated against an
+    outdated replica, see group_commit; the holder should then retry with
+    `exclusive`. The exclusive lock is taken once the pending transactions
+    are committed, and kept while the transaction of the holder is, so that
+    it is not validated against an outdated replica again, at the cost of
+    not being grouped.
+    """
+    with _write_lock:
+        committer = _group_committer
+        if committer and exclusive:
+            committer.wait(committer.pending(), committer.timeout)
+        _writer.pending = committer.pending() if committer else frozenset()
+        _writer.exclusive = exclusive
+        try:
+            yield
+        finally:
+            _writer.pending = None
+
+
+def _commit(tx):
+    committer = _group_committer
+    pending = getattr(_writer, 'pending', None)
+    if pending is None or tx.ovsdb_connection is not committer:
+        return tx.commit()
+    tx.pending_when_validated = pending
+    if _writer.exclusive:
+        return tx.commit()
+    # Pending before the lock is released, for the next holder to see it
+    committer.register(tx)
+    _write_lock.release()
+    try:
+        return tx.commit()
+    finally:
+        _write_lock.acquire()
+        _writer.pending = committer.pending()
+
+
+def close():
+    """
+    Saves the snapshot of the IDL replica a last time, if enabled, and stops
+    monitoring the cluster and grouping the transactions
+    """
+    global _snapshot_writer
+    global _cluster_monitor
+    global _group_committer
+    if _snapshot_writer:
+        _snapshot_writer.stop()
+        _snapshot_writer = None
+    if _cluster_monitor:
+        _cluster_monitor.stop()
+        _cluster_monitor = None
+    if _group_committer:
+        _group_committer.stop()
+        _group_committer = None
+
+
+def _monitor_cluster(api):
+    global _cluster_monitor
+    if not isinstance(api.idl, ovs.db.idl.Idl):
+        return
+    _cluster_monitor = cluster_monitor.ClusterMonitor(ovn_read_max_staleness())
+    _cluster_monitor.add_replica(cluster_monitor.LEADER, api.ovsdb_connection)
+    _cluster_monitor.start()
+    if ovn_read_from_followers():
+        threading.Thread(
+            target=_connect_follower, name='ovn-follower-connect', daemon=True
+        ).start()
+
+
+def _connect_follower():
+    # The leader replica serves the reads until the follower is in sync
+    global _follower_api_impl
+    global _follower_index
+    global _follower_table_versions
+    api = _retry(_create_follower_api)
+    _retry(lambda: api.start_connection(api.ovsdb_connection))
+    _follower_index, _follower_table_versions = api.listeners
+    _follower_api_impl = api
+    monitor = _cluster_monitor
+    if monitor:
+        monitor.add_replica(cluster_monitor.FOLLOWER, api.ovsdb_connection)
+
+
+def _create_follower_api():
+    ovsidl = _create_idl(ovn_remote(), leader_only=False)
+    listeners = (OvnNorthIndex(ovsidl.tables), TableVersions(ovsidl.tables))
+
+    def notify(event, row, updates=None):
+        for listener in listeners:
+            listener.notify(event, row, updates)
+
+    ovsidl.notify = notify
+    api = _FollowerApi(
+        ovsdbapp.backend.ovs_idl.connection.Connection(
+            idl=ovsidl, timeout=100
+        ),
+        start=False,
     )
-    return OvnNbApiIdlImpl(
-        ovsdbapp.backend.ovs_idl.connection.Connection(idl=ovsidl, timeout=100)
+    api.listeners = listeners
+    return api
+
+
+def _retry(action):
+    backoff = 1
+    while True:
+        try:
+            return action()
+        except Exception:
+            logging.exception(
+                'Failed to connect the northbound db follower replica, '
+                'retrying in %d seconds',
+                backoff,
+            )
+            time.sleep(backoff)
+            backoff = min(backoff * 2, _FOLLOWER_MAX_BACKOFF)
+
+
+def cluster_report():
+    """
+    :return: The state of the replicas, see ClusterMonitor.report, or an
+    empty dict if there is no connection yet
+    """
+    return _cluster_monitor.report() if _cluster_monitor else {}
+
+
+def _create_idl(remote, leader_only=True):
+    helper = idlutils.get_schema_helper(remote, ovnconst.OVN_NORTHBOUND)
+    monitored_columns.register(helper)
+    return ovsdbapp.backend.ovs_idl.connection.OvsdbIdl(
+        remote, helper, leader_only=leader_only
     )
 
 
+def replica_report():
+    """
+    :return: The size of the IDL replica, see
+    monitored_columns.replica_report, or an empty dict if there is no
+    connection yet
+    """
+    api = _api_impl
+    if not api or not isinstance(api.idl, ovs.db.idl.Idl):
+        return {}
+    with api.ovsdb_connection.lock:
+        return monitored_columns.replica_report(api.idl.tables)
+
+
 def configure_ssl_connection():
     if is_ovn_remote_ssl():
         ovs.stream.Stream.ssl_set_private_key_file(ssl_key_file())
@@ -67,24 +415,85 @@ def configure_ssl_connection():
 
 
 def execute(command):
-    try:
+    with _translate_errors(), _measure(
+        [command], metrics.OVSDB_COMMAND_DURATION, type(command).__name__
+    ):
         return command.execute(check_error=True)
+
+
+@contextlib.contextmanager
+def _measure(commands, histogram, *labels, transaction=False):
+    start = time.monotonic()
+    result = 'error'
+    try:
+        yield
+        result = 'success'
+    finally:
+        duration = time.monotonic() - start
+        histogram.observe(duration, labels + (result,))
+        profiler.record_commands(commands, duration, transaction)
+
+
+@contextlib.contextmanager
+def _translate_errors():
+    try:
+        yield
     except (ValueError, TypeError) as e:
         raise BadRequestError(e)
     except RowNotFound as e:
         raise ElementNotFoundError(e)
 
 
+def lookup(api, table, record):
+    """
+    Reads a row straight from the IDL replica. The connection lock keeps the
+    replica from being updated by the connection thread while it is read
+    from one of the request handling threads.
+    """
+    with api.ovsdb_connection.lock:
+        return api.lookup(table, record)
+
+
+class _FollowerApi(OvnNbApiIdlImpl):
+    # ovsdbapp keeps the connection per api class, the follower replica has
+    # a connection of its own
+    _ovsdb_connection = None
+
+
 class OvnTransactionManager(OvnNbApiIdlImpl):
+    """
+    The transaction in progress is kept per thread, so a single manager can
+    serve concurrent requests.
+    The commands added to a transaction are committed together when the
+    transaction block ends, or discarded if it raises. Rows created by a
+    command can be referenced by passing the command in place of the row id
+    to the following commands of the same transaction.
+    A transaction block nested in another one joins the enclosing
+    transaction, which is committed only by the outermost block.
+    """
+
     def __init__(self, connection):
         super(OvnTransactionManager, self).__init__(connection)
-        self._tx = None
+        self._local = threading.local()
+
+    @property
+    def _tx(self):
+        return getattr(self._local, 'tx', None)
+
+    @_tx.setter
+    def _tx(self, tx):
+        self._local.tx = tx
 
     def create_transaction(self, check_error=False, log_errors=True, **kwargs):
+        # The group committer stands in for the connection it commits to
+        committer = _group_committer
+        connection = self.ovsdb_connection
+        if committer and committer.connection is connection:
+            connection = committer
         tx = Transaction(
             self,
-            self.ovsdb_connection,
-            self.ovsdb_connection.timeout,
+            connection,
+            connection.timeout,
             check_error,
             log_errors,
         )
@@ -93,10 +502,17 @@ class OvnTransactionManager(OvnNbApiIdlImpl):
 
     @contextlib.contextmanager
     def transaction(self, check_error=True, log_errors=False, **kwargs):
-        if not self._tx:
-            self._tx = self.create_transaction(check_error, log_errors)
+        if self._tx:
+            yield self._tx
+            return
+        self._tx = self.create_transaction(check_error, log_errors)
         try:
             yield self._tx
+            with _translate_errors(), _measure(
+                self._tx.commands,
+                metrics.OVSDB_TRANSACTION_DURATION,
+                transaction=True,
+            ):
+                _commit(self._tx)
         finally:
-            self._tx.commit()
             self._tx = None
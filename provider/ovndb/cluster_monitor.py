@@ -0,0 +1,182 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import threading
+import time
+
+import constants as ovnconst
+import metrics
+
+# The replica of the connection to the leader of the cluster, which all the
+# changes are written through
+LEADER = 'leader'
+# The replica of the connection to any member of the cluster, which may serve
+# the reads
+FOLLOWER = 'follower'
+
+MONITOR_INTERVAL = 1.0
+
+_SERVER_DB_TABLE = 'Database'
+_CLUSTERED = 'clustered'
+
+ServerState = collections.namedtuple(
+    'ServerState', ['remote', 'synced', 'index']
+)
+
+
+def server_state(idl):
+    """
+    :return: The ServerState of the server the IDL is connected to: its
+    remote, whether the replica is in sync with it, and the index of the last
+    entry of the RAFT log the server applied, or None if the database is not
+    clustered
+    """
+    synced = idl.state == idl.IDL_S_MONITORING
+    index = None
+    server_tables = idl.server_tables
+    if synced and server_tables and _SERVER_DB_TABLE in server_tables:
+        for database in server_tables[_SERVER_DB_TABLE].rows.values():
+            if (
+                database.name == ovnconst.OVN_NORTHBOUND
+                and database.model == _CLUSTERED
+                and database.index
+            ):
+                index = database.index[0]
+    return ServerState(idl.session_name(), synced, index)
+
+
+class ClusterMonitor(threading.Thread):
+    """
+    Checks the servers the replicas are connected to every `interval`
+    seconds, logging and counting the connections to new servers.
+
+    The RAFT log index of the leader is sampled at each check, to tell
+    whether the follower replica is at most `max_staleness` seconds behind
+    the leader: that is the case if it applied an index the leader reached
+    no earlier than `max_staleness` seconds ago.
+    """
+
+    def __init__(self, max_staleness, interval=MONITOR_INTERVAL):
+        super(ClusterMonitor, self).__init__(name='ovn-cluster-monitor')
+        self.daemon = True
+        self._max_staleness = max_staleness
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        # replica name -> ovsdbapp Connection
+        self._connections = {}
+        # replica name -> ServerState of the last check
+        self._states = {}
+        # (time, index) of the leader, oldest first
+        self._leader_indexes = collections.deque()
+
+    def add_replica(self, name, connection):
+        with self._lock:
+            self._connections[name] = connection
+        self.check()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.check()
+            except Exception:
+                logging.exception('Failed to check the northbound db servers')
+
+    def check(self):
+        with self._lock:
+            connections = list(self._connections.items())
+        for name, connection in connections:
+            with connection.lock:
+                state = server_state(connection.idl)
+            self._update(name, state, time.monotonic())
+
+    def _update(self, name, state, now):
+        with self._lock:
+            previous = self._states.get(name)
+            self._states[name] = state
+            if name == LEADER and state.index is not None:
+                self._leader_indexes.append((now, state.index))
+            while (
+                self._leader_indexes
+                and self._leader_indexes[0][0] < now - self._max_staleness
+            ):
+                self._leader_indexes.popleft()
+        was_synced = previous is not None and previous.synced
+        reconnected = state.synced and (
+            not was_synced or previous.remote != state.remote
+        )
+        if reconnected:
+            logging.info(
+                'Northbound db %s replica in sync with %s', name, state.remote
+            )
+            metrics.OVSDB_CONNECTIONS.inc((name,))
+        elif was_synced and not state.synced:
+            logging.warning(
+                'Northbound db %s replica lost %s, reconnecting',
+                name,
+                previous.remote,
+            )
+
+    def is_fresh(self, name):
+        """
+        :return: Whether the replica is in sync with a member of the cluster
+        and at most max_staleness seconds behind the leader. This is
+        approximate: the index compared is the one the server of the replica
+        applied, as reported by the _Server database, and the replica itself
+        may not have received the updates up to it yet
+        """
+        with self._lock:
+            state = self._states.get(name)
+            if not state or not state.synced or state.index is None:
+                return False
+            oldest = time.monotonic() - self._max_staleness
+            required = next(
+                (
+                    index
+                    for sampled, index in self._leader_indexes
+                    if sampled >= oldest
+                ),
+                None,
+            )
+            return required is not None and state.index >= required
+
+    def report(self):
+        """
+        :return: Whether each replica is in sync and the RAFT log index of
+        its server, and whether the follower replica is fresh enough to be
+        read
+        """
+        report = {}
+        with self._lock:
+            states = dict(self._states)
+        for name, state in states.items():
+            report[name + '_synced'] = int(state.synced)
+            if state.index is not None:
+                report[name + '_index'] = state.index
+        if FOLLOWER in states:
+            report[FOLLOWER + '_fresh'] = int(self.is_fresh(FOLLOWER))
+        return report
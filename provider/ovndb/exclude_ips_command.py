@@ -0,0 +1,61 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+from ovsdbapp.backend.ovs_idl.command import BaseCommand
+
+import constants as ovnconst
+
+from neutron.ip_ranges import IpRangeSet
+
+
+class UpdateExcludeIpsCommand(BaseCommand):
+    """
+    Adds and removes ips of the exclude_ips option of a logical switch.
+    The option is read when the transaction is committed, so several
+    updates of the same switch in one transaction do not overwrite each
+    other. Removing an ip from a range of the option splits the range.
+    """
+
+    def __init__(self, api, ls_id, add=(), remove=()):
+        super(UpdateExcludeIpsCommand, self).__init__(api)
+        self.ls_id = ls_id
+        self.add = add
+        self.remove = remove
+
+    def run_idl(self, txn):
+        ls = self.api.lookup(ovnconst.TABLE_LS, self.ls_id)
+        ips = IpRangeSet.parse(
+            ls.other_config.get(ovnconst.LS_OPTION_EXCLUDE_IPS, '')
+        )
+        for ip in self.remove:
+            ips.remove(ip)
+        for ip in self.add:
+            ips.add(ip)
+        if ips:
+            ls.setkey(
+                ovnconst.ROW_LS_OTHER_CONFIG,
+                ovnconst.LS_OPTION_EXCLUDE_IPS,
+                str(ips),
+            )
+        else:
+            ls.delkey(
+                ovnconst.ROW_LS_OTHER_CONFIG, ovnconst.LS_OPTION_EXCLUDE_IPS
+            )
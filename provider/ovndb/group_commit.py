@@ -0,0 +1,304 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import logging
+import queue
+import threading
+import time
+import traceback
+
+from ovs.db import idl
+from ovsdbapp.backend.ovs_idl import idlutils
+
+import constants as ovnconst
+import metrics
+
+# The transactions of concurrent requests are queued to the GroupCommitter in
+# place of the ovsdbapp Connection. Those queued within a short window are
+# committed as a single OVSDB transaction, saving a round trip to the server
+# and a RAFT log entry per transaction.
+# The rows each transaction touches are found by running its commands in a
+# transaction which is then aborted. Only transactions touching disjoint rows
+# are grouped, a logical switch port standing for its logical switch too, as
+# the ips of the ports are validated per switch. A transaction touching the
+# rows of a transaction still pending when its request was validated may
+# have been validated against an outdated replica: it is rejected with
+# StaleTransaction once the pending transaction is committed, so that the
+# request can be validated again, see ovn_connection.write_lock.
+# If the grouped transaction fails, its transactions are committed one at a
+# time, so that each request gets the result or the error of its own.
+
+GROUPED = 'grouped'
+ALONE = 'alone'
+STALE = 'stale'
+
+
+class StaleTransaction(Exception):
+    pass
+
+
+class GroupCommitter(threading.Thread):
+    """
+    Commits the transactions queued within `wait` seconds of the first one,
+    up to `max_batch` of them, through the ovsdbapp Connection, grouping the
+    ones touching disjoint rows into a single OVSDB transaction.
+    A transaction is queued by its commit(), as it would be to the
+    Connection, or ahead of it by register(), and its result is put on its
+    own results queue.
+    """
+
+    def __init__(self, connection, index, max_batch, wait):
+        super(GroupCommitter, self).__init__(name='ovn-group-commit')
+        self.daemon = True
+        self.connection = connection
+        self.timeout = connection.timeout
+        self._index = index
+        self._max_batch = max_batch
+        self._wait = wait
+        self._txns = queue.Queue()
+        self._lock = threading.Lock()
+        self._delivered = threading.Condition(self._lock)
+        self._pending = set()
+        # The transactions registered and not queued by their commit() yet
+        self._registered = set()
+        self._stopping = False
+
+    def pending(self):
+        """
+        :return: The transactions queued and not committed yet. A transaction
+        validated while they were pending should be marked with them as its
+        `pending_when_validated` attribute
+        """
+        with self._lock:
+            return frozenset(self._pending)
+
+    def wait(self, txns, timeout=None):
+        """
+        Waits until the transactions are committed, or the timeout expires.
+        :return: Whether they are committed
+        """
+        with self._delivered:
+            return self._delivered.wait_for(
+                lambda: not self._pending.intersection(txns), timeout
+            )
+
+    def register(self, txn):
+        """
+        Queues the transaction ahead of its commit(), which then only waits
+        for its result, so that it is pending for the transactions validated
+        from then on, and queued before them.
+        """
+        with self._lock:
+            self._pending.add(txn)
+            self._registered.add(txn)
+        self._txns.put(txn)
+
+    def queue_txn(self, txn):
+        with self._lock:
+            if txn in self._registered:
+                self._registered.discard(txn)
+                return
+            self._pending.add(txn)
+        self._txns.put(txn)
+
+    def stop(self):
+        self._txns.put(None)
+        self.join()
+
+    def run(self):
+        deferred = []
+        while deferred or not self._stopping:
+            txns = self._collect(deferred)
+            if txns:
+                deferred = self._commit(txns)
+
+    def _collect(self, txns):
+        txns = list(txns)
+        deadline = time.monotonic() + self._wait
+        while not self._stopping and len(txns) < self._max_batch:
+            try:
+                if txns:
+                    txn = self._txns.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                else:
+                    txn = self._txns.get()
+                    deadline = time.monotonic() + self._wait
+            except queue.Empty:
+                break
+            if txn is None:
+                self._stopping = True
+            else:
+                txns.append(txn)
+        return txns
+
+    def _commit(self, txns):
+        batch = _Batch(self, txns)
+        self.connection.queue_txn(batch)
+        result = batch.results.get()
+        if isinstance(result, idlutils.ExceptionResult):
+            logging.error('Failed to group transactions: %s', result.tb)
+            for txn in txns:
+                if txn not in batch.delivered:
+                    self._deliver(txn, result)
+            return []
+        return result
+
+    def _deliver(self, txn, result):
+        with self._lock:
+            self._pending.discard(txn)
+            self._delivered.notify_all()
+        # Only the rows of the transaction are needed once it is committed
+        txn.pending_when_validated = ()
+        txn.results.put(result)
+
+
+class _Batch(object):
+    """
+    Queued to the ovsdbapp Connection like a transaction, to commit the
+    queued transactions from its thread.
+    """
+
+    def __init__(self, committer, txns):
+        self.results = queue.Queue(1)
+        self.commands = [command for txn in txns for command in txn.commands]
+        self.delivered = set()
+        self._committer = committer
+        self._txns = txns
+
+    def do_commit(self):
+        """
+        :return: The transactions deferred to the next batch
+        """
+        for txn in self._txns:
+            txn.touched_rows = self._touched_rows(txn)
+        grouped, alone, stale, deferred = self._group()
+        if len(grouped) == 1:
+            alone.insert(0, grouped.pop())
+        if grouped:
+            results = self._commit_grouped(grouped)
+            if results is None:
+                alone[:0] = grouped
+            else:
+                metrics.OVSDB_GROUP_COMMIT.inc((GROUPED,), len(grouped))
+                for txn, result in zip(grouped, results):
+                    self._deliver(txn, result)
+        for txn in alone:
+            metrics.OVSDB_GROUP_COMMIT.inc((ALONE,))
+            self._deliver(txn, _commit_alone(txn))
+        for txn in stale:
+            metrics.OVSDB_GROUP_COMMIT.inc((STALE,))
+            self._deliver(
+                txn,
+                idlutils.ExceptionResult(
+                    ex=StaleTransaction(str(txn)), tb=None
+                ),
+            )
+        return deferred
+
+    def _deliver(self, txn, result):
+        self.delivered.add(txn)
+        self._committer._deliver(txn, result)
+
+    def _touched_rows(self, txn):
+        # The uuids of the existing rows the transaction changes or verifies
+        ovsidl = txn.api.idl
+        scratch = idl.Transaction(ovsidl)
+        try:
+            for command in txn.commands:
+                command.run_idl(scratch)
+            rows = [
+                row
+                for row in scratch._txn_rows.values()
+                if row._data is not None
+            ]
+        except Exception:
+            # Committed alone, to fail as it would without group commit
+            return None
+        finally:
+            scratch.abort()
+        index = self._committer._index
+        keys = set()
+        for row in rows:
+            keys.add(row.uuid)
+            if row._table.name == ovnconst.TABLE_LSP and index:
+                ls = index.get_ls_by_lsp(row.uuid)
+                if ls:
+                    keys.add(ls.uuid)
+        return keys
+
+    def _group(self):
+        grouped = []
+        alone = []
+        stale = []
+        deferred = []
+        owners = {}
+        for txn in self._txns:
+            keys = txn.touched_rows
+            if keys is None:
+                alone.append(txn)
+                continue
+            pending = getattr(txn, 'pending_when_validated', ())
+            if any(
+                keys & (getattr(other, 'touched_rows', None) or set())
+                for other in pending
+            ):
+                stale.append(txn)
+            elif any(key in owners for key in keys):
+                deferred.append(txn)
+            else:
+                grouped.append(txn)
+                owners.update(dict.fromkeys(keys, txn))
+        return grouped, alone, stale, deferred
+
+    def _commit_grouped(self, txns):
+        ovsidl = txns[0].api.idl
+        txn = idl.Transaction(ovsidl)
+        try:
+            for grouped_txn in txns:
+                for command in grouped_txn.commands:
+                    command.run_idl(txn)
+        except Exception:
+            txn.abort()
+            logging.debug('Grouped transaction aborted', exc_info=True)
+            return None
+        status = txn.commit_block()
+        if status == txn.SUCCESS:
+            for grouped_txn in txns:
+                grouped_txn.post_commit(txn)
+        elif status != txn.UNCHANGED:
+            logging.debug(
+                'Grouped transaction of %d transactions returned %s',
+                len(txns),
+                txn.get_error(),
+            )
+            return None
+        return [
+            [command.result for command in grouped_txn.commands]
+            for grouped_txn in txns
+        ]
+
+
+def _commit_alone(txn):
+    try:
+        return txn.do_commit()
+    except Exception as e:
+        return idlutils.ExceptionResult(ex=e, tb=traceback.format_exc())
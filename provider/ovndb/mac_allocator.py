@@ -0,0 +1,179 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import logging
+import random
+import re
+import threading
+
+import constants as ovnconst
+
+ROW_DELETE = 'delete'
+MAC_BYTES = 6
+DENSITY_WARNINGS = (0.5, 0.75, 0.9)
+
+_MAC = re.compile(r'^([0-9a-f]{2}:){5}[0-9a-f]{2}$', re.IGNORECASE)
+
+
+class MacAllocator(object):
+    """
+    Allocates the macs of new ports from the range of the configured prefix.
+
+    The macs in use are kept up to date by the row notifications of the IDL,
+    see ovn_connection.add_row_listener. Allocation continues after the last
+    allocated mac and skips the macs in use, so it takes the same time no
+    matter how many ports exist, as long as the range is not close to full.
+    A mac allocated for a port that is never committed is not handed out
+    again before the whole range is cycled through.
+    """
+
+    def __init__(self, prefix, reserved=()):
+        prefix_bytes = parse_mac_prefix(prefix)
+        self._prefix = prefix
+        self._suffix_bits = 8 * (MAC_BYTES - len(prefix_bytes))
+        self._base = _bytes_to_int(prefix_bytes) << self._suffix_bits
+        self._capacity = 1 << self._suffix_bits
+        self._lock = threading.Lock()
+        self._next = random.randrange(self._capacity)
+        # offset in the range -> number of rows using the mac
+        self._used = {}
+        self._offsets_by_row = {}
+        self._density_warning = 0
+        for mac in reserved:
+            self._use(self._offset(mac))
+
+    def notify(self, event, row, updates=None):
+        table = row._table.name
+        if table == ovnconst.TABLE_LSP:
+            macs = _lsp_macs(row)
+        elif table == ovnconst.TABLE_LRP:
+            macs = [row.mac]
+        else:
+            return
+        with self._lock:
+            for offset in self._offsets_by_row.pop(row.uuid, ()):
+                self._release(offset)
+            if event == ROW_DELETE:
+                return
+            offsets = [
+                offset
+                for offset in map(self._offset, macs)
+                if offset is not None
+            ]
+            if offsets:
+                self._offsets_by_row[row.uuid] = offsets
+                for offset in offsets:
+                    self._use(offset)
+
+    def allocate(self):
+        with self._lock:
+            if len(self._used) >= self._capacity:
+                raise Exception(
+                    'Unable to allocate a mac, all macs of prefix {prefix} '
+                    'are in use'.format(prefix=self._prefix)
+                )
+            offset = self._next
+            while offset in self._used:
+                offset = (offset + 1) % self._capacity
+            self._next = (offset + 1) % self._capacity
+        return _int_to_mac(self._base + offset)
+
+    def report(self):
+        with self._lock:
+            used = len(self._used)
+        return {
+            'prefix': self._prefix,
+            'capacity': self._capacity,
+            'used': used,
+            'density': float(used) / self._capacity,
+        }
+
+    def _offset(self, mac):
+        if not mac or not _MAC.match(mac):
+            return None
+        value = int(mac.replace(':', ''), 16)
+        if value >> self._suffix_bits != self._base >> self._suffix_bits:
+            return None
+        return value - self._base
+
+    def _use(self, offset):
+        if offset is None:
+            return
+        self._used[offset] = self._used.get(offset, 0) + 1
+        self._warn_density()
+
+    def _release(self, offset):
+        count = self._used.pop(offset, 0) - 1
+        if count > 0:
+            self._used[offset] = count
+
+    def _warn_density(self):
+        density = float(len(self._used)) / self._capacity
+        crossed = [limit for limit in DENSITY_WARNINGS if density >= limit]
+        if crossed and crossed[-1] > self._density_warning:
+            self._density_warning = crossed[-1]
+            logging.warning(
+                '%d%% of the macs of prefix %s are in use',
+                density * 100,
+                self._prefix,
+            )
+
+
+def parse_mac_prefix(prefix):
+    """
+    :param prefix: 1 to 5 leading bytes of a mac, e.g. '02' or '02:1a:4b'
+    :return: the bytes of the prefix
+    :raises ValueError if the prefix is not a valid prefix of unicast macs
+    """
+    try:
+        prefix_bytes = [int(part, 16) for part in prefix.split(':')]
+    except ValueError:
+        prefix_bytes = []
+    if (
+        not 0 < len(prefix_bytes) < MAC_BYTES
+        or any(not 0 <= part <= 0xFF for part in prefix_bytes)
+        or prefix_bytes[0] & 1
+    ):
+        raise ValueError(
+            'Invalid mac prefix {prefix}, expected 1 to 5 bytes of a '
+            'unicast mac'.format(prefix=prefix)
+        )
+    return prefix_bytes
+
+
+def _lsp_macs(lsp):
+    # dynamic_addresses is an optional column, a list of at most one value
+    addresses = list(lsp.addresses) + list(lsp.dynamic_addresses or [])
+    return [address.split()[0] for address in addresses if address.strip()]
+
+
+def _bytes_to_int(values):
+    result = 0
+    for value in values:
+        result = (result << 8) | value
+    return result
+
+
+def _int_to_mac(value):
+    return ':'.join(
+        '{:02x}'.format((value >> shift) & 0xFF)
+        for shift in range(8 * (MAC_BYTES - 1), -1, -8)
+    )
@@ -0,0 +1,161 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import logging
+import random
+import sys
+
+import constants as ovnconst
+
+# The tables and columns of the northbound db read or written by the
+# provider, either directly or by the ovsdbapp commands it uses. Only these
+# are replicated by the IDL. A column added here must not reference a table
+# which is not replicated.
+MONITORED_COLUMNS = {
+    ovnconst.TABLE_LS: ('name', 'ports', 'other_config', 'external_ids'),
+    ovnconst.TABLE_LSP: (
+        'name',
+        'type',
+        'options',
+        'tag',
+        'addresses',
+        'dynamic_addresses',
+        'port_security',
+        'up',
+        'enabled',
+        'dhcpv4_options',
+        'dhcpv6_options',
+        'external_ids',
+    ),
+    ovnconst.TABLE_DHCP_Options: ('cidr', 'options', 'external_ids'),
+    ovnconst.TABLE_LR: (
+        'name',
+        'ports',
+        'static_routes',
+        'enabled',
+        'external_ids',
+    ),
+    ovnconst.TABLE_LRP: (
+        'name',
+        'mac',
+        'networks',
+        'ipv6_ra_configs',
+        'external_ids',
+    ),
+    ovnconst.TABLE_ROUTES: (
+        'ip_prefix',
+        'nexthop',
+        'policy',
+        'route_table',
+        'external_ids',
+    ),
+    ovnconst.TABLE_PORT_GROUP: ('name', 'ports', 'acls', 'external_ids'),
+    ovnconst.TABLE_ACL: (
+        'name',
+        'priority',
+        'direction',
+        'match',
+        'action',
+        'log',
+        'severity',
+        'external_ids',
+    ),
+}
+
+# Security groups are not available on northbound dbs without port groups
+OPTIONAL_TABLES = (ovnconst.TABLE_PORT_GROUP, ovnconst.TABLE_ACL)
+
+# The rows of each table whose size is measured to estimate the size of the
+# whole replica
+REPORT_SAMPLE_ROWS = 100
+
+
+def register(helper):
+    """
+    Registers the monitored columns in the ovs.db.idl.SchemaHelper of the
+    northbound db, checking them against the schema of the server.
+    Missing optional tables are skipped, as are missing columns, which fail
+    only once used. A missing mandatory table fails at once.
+    """
+    schema_tables = helper.schema_json['tables']
+    for table, columns in MONITORED_COLUMNS.items():
+        if table not in schema_tables:
+            if table in OPTIONAL_TABLES:
+                logging.warning(
+                    'Table %s is missing from the northbound db schema', table
+                )
+                continue
+            raise Exception(
+                'Table {table} is missing from the northbound db '
+                'schema'.format(table=table)
+            )
+        schema_columns = schema_tables[table]['columns']
+        missing = [
+            column for column in columns if column not in schema_columns
+        ]
+        if missing:
+            logging.warning(
+                'Columns %s of table %s are missing from the northbound db '
+                'schema',
+                ', '.join(missing),
+                table,
+            )
+        helper.register_columns(
+            table, [column for column in columns if column in schema_columns]
+        )
+
+
+def replica_report(tables):
+    """
+    :return: The number of rows, of replicated columns and the estimated size
+    in bytes of the IDL replica. The size is extrapolated from a sample of
+    the rows of each table.
+    """
+    rows = 0
+    columns = 0
+    size = 0
+    for table in tables.values():
+        table_rows = list(table.rows.values())
+        rows += len(table_rows)
+        columns += len(table.columns)
+        if not table_rows:
+            continue
+        sample = random.sample(
+            table_rows, min(len(table_rows), REPORT_SAMPLE_ROWS)
+        )
+        sample_size = sum(_row_size(row) for row in sample)
+        size += sample_size * len(table_rows) // len(sample)
+    return {'rows': rows, 'columns': columns, 'bytes': size}
+
+
+def _row_size(row):
+    size = sys.getsizeof(row._data)
+    for datum in row._data.values():
+        size += sys.getsizeof(datum) + sys.getsizeof(datum.values)
+        for key, value in datum.values.items():
+            size += _atom_size(key)
+            if value is not None:
+                size += _atom_size(value)
+    return size
+
+
+def _atom_size(atom):
+    return sys.getsizeof(atom) + sys.getsizeof(atom.value)
@@ -0,0 +1,267 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+from collections import defaultdict
+import threading
+import uuid
+
+from netaddr import IPAddress
+from netaddr.core import AddrFormatError
+
+import constants as ovnconst
+
+from neutron.ip_ranges import IpRangeSet
+from neutron.neutron_api_mappers import RouterMapper
+from neutron.neutron_api_mappers import SecurityGroupRuleMapper
+from neutron.neutron_api_mappers import SubnetMapper
+
+ROW_DELETE = 'delete'
+
+
+class OvnNorthIndex(object):
+    """
+    Secondary indexes over the IDL replica of the northbound db:
+    - logical switch port -> logical switch
+    - logical switch -> ips of its ports and excluded ips
+    - logical switch -> dhcp options
+    - logical router port name -> logical router port
+    - logical router -> gateway logical switch port
+    - security group (port group name or uuid) -> ACLs
+
+    The indexes are kept up to date by the row notifications of the IDL, see
+    ovn_connection.add_row_listener. They store uuids only, rows are always
+    resolved from the replica, so a row deleted while the connection was
+    down is never returned.
+    """
+
+    def __init__(self, tables):
+        self._tables = tables
+        self._lock = threading.Lock()
+        self._ls_by_lsp = {}
+        self._lsps_by_ls = {}
+        self._ips_by_lsp = {}
+        # (ip version, ip as int) -> number of ports of the switch using it
+        self._port_ips_by_ls = defaultdict(dict)
+        self._excluded_ips_by_ls = {}
+        self._dhcps_by_ls = defaultdict(set)
+        self._ls_by_dhcp = {}
+        self._lrp_by_name = {}
+        self._name_by_lrp = {}
+        self._gateway_lsp_by_lr = {}
+        self._acls_by_sec_group = defaultdict(set)
+        self._sec_group_by_acl = {}
+        self._updaters = {
+            ovnconst.TABLE_LS: self._update_ls,
+            ovnconst.TABLE_LSP: self._update_lsp,
+            ovnconst.TABLE_DHCP_Options: self._update_dhcp,
+            ovnconst.TABLE_LRP: self._update_lrp,
+            ovnconst.TABLE_LR: self._update_lr,
+            ovnconst.TABLE_ACL: self._update_acl,
+        }
+
+    def notify(self, event, row, updates=None):
+        updater = self._updaters.get(row._table.name)
+        if updater:
+            with self._lock:
+                updater(row, event == ROW_DELETE)
+
+    def _update_ls(self, ls, deleted):
+        old_lsp_uuids = self._lsps_by_ls.pop(ls.uuid, set())
+        lsp_uuids = set() if deleted else {lsp.uuid for lsp in ls.ports}
+        for lsp_uuid in old_lsp_uuids - lsp_uuids:
+            if self._ls_by_lsp.get(lsp_uuid) == ls.uuid:
+                self._move_lsp(lsp_uuid, None)
+        for lsp_uuid in lsp_uuids - old_lsp_uuids:
+            self._move_lsp(lsp_uuid, ls.uuid)
+        if deleted:
+            self._port_ips_by_ls.pop(ls.uuid, None)
+            self._excluded_ips_by_ls.pop(ls.uuid, None)
+            return
+        self._lsps_by_ls[ls.uuid] = lsp_uuids
+        self._excluded_ips_by_ls[ls.uuid] = IpRangeSet.parse(
+            ls.other_config.get(ovnconst.LS_OPTION_EXCLUDE_IPS)
+        )
+
+    def _update_lsp(self, lsp, deleted):
+        ls_uuid = self._ls_by_lsp.get(lsp.uuid)
+        if ls_uuid:
+            self._count_port_ips(ls_uuid, lsp.uuid, -1)
+        if deleted:
+            self._ips_by_lsp.pop(lsp.uuid, None)
+            return
+        self._ips_by_lsp[lsp.uuid] = _lsp_ips(lsp)
+        if ls_uuid:
+            self._count_port_ips(ls_uuid, lsp.uuid, 1)
+
+    def _move_lsp(self, lsp_uuid, ls_uuid):
+        old_ls_uuid = self._ls_by_lsp.pop(lsp_uuid, None)
+        if old_ls_uuid:
+            self._count_port_ips(old_ls_uuid, lsp_uuid, -1)
+        if ls_uuid:
+            self._ls_by_lsp[lsp_uuid] = ls_uuid
+            self._count_port_ips(ls_uuid, lsp_uuid, 1)
+
+    def _count_port_ips(self, ls_uuid, lsp_uuid, delta):
+        port_ips = self._port_ips_by_ls[ls_uuid]
+        for ip in self._ips_by_lsp.get(lsp_uuid, ()):
+            count = port_ips.get(ip, 0) + delta
+            if count > 0:
+                port_ips[ip] = count
+            else:
+                port_ips.pop(ip, None)
+
+    def _update_dhcp(self, dhcp, deleted):
+        ls_id = self._ls_by_dhcp.pop(dhcp.uuid, None)
+        if ls_id:
+            _discard(self._dhcps_by_ls, ls_id, dhcp.uuid)
+        ls_id = dhcp.external_ids.get(SubnetMapper.OVN_NETWORK_ID)
+        if deleted or not ls_id:
+            return
+        ls_id = _to_uuid(ls_id)
+        self._ls_by_dhcp[dhcp.uuid] = ls_id
+        self._dhcps_by_ls[ls_id].add(dhcp.uuid)
+
+    def _update_lrp(self, lrp, deleted):
+        name = self._name_by_lrp.pop(lrp.uuid, None)
+        if self._lrp_by_name.get(name) == lrp.uuid:
+            del self._lrp_by_name[name]
+        if deleted:
+            return
+        self._name_by_lrp[lrp.uuid] = lrp.name
+        self._lrp_by_name[lrp.name] = lrp.uuid
+
+    def _update_lr(self, lr, deleted):
+        gateway_lsp_id = lr.external_ids.get(
+            RouterMapper.OVN_ROUTER_GATEWAY_PORT
+        )
+        if deleted or not gateway_lsp_id:
+            self._gateway_lsp_by_lr.pop(lr.uuid, None)
+        else:
+            self._gateway_lsp_by_lr[lr.uuid] = _to_uuid(gateway_lsp_id)
+
+    def _update_acl(self, acl, deleted):
+        sec_group_id = self._sec_group_by_acl.pop(acl.uuid, None)
+        if sec_group_id:
+            _discard(self._acls_by_sec_group, sec_group_id, acl.uuid)
+        sec_group_id = acl.external_ids.get(
+            SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_SEC_GROUP_ID
+        )
+        if deleted or not sec_group_id:
+            return
+        self._sec_group_by_acl[acl.uuid] = sec_group_id
+        self._acls_by_sec_group[sec_group_id].add(acl.uuid)
+
+    def get_ls_by_lsp(self, lsp_uuid):
+        with self._lock:
+            ls_uuid = self._ls_by_lsp.get(_to_uuid(lsp_uuid))
+        return self._get_row(ovnconst.TABLE_LS, ls_uuid)
+
+    def get_ls_by_dhcp(self, dhcp):
+        return self._get_row(
+            ovnconst.TABLE_LS,
+            _to_uuid(dhcp.external_ids.get(SubnetMapper.OVN_NETWORK_ID)),
+        )
+
+    def is_ip_available(self, ls_id, ip):
+        ip = IPAddress(ip)
+        ls_uuid = _to_uuid(ls_id)
+        with self._lock:
+            if (ip.version, int(ip)) in self._port_ips_by_ls.get(ls_uuid, ()):
+                return False
+            excluded_ips = self._excluded_ips_by_ls.get(ls_uuid)
+            return excluded_ips is None or ip not in excluded_ips
+
+    def get_dhcp_by_ls(self, ls_id):
+        with self._lock:
+            dhcp_uuids = sorted(self._dhcps_by_ls.get(_to_uuid(ls_id), ()))
+        return next(
+            (
+                dhcp
+                for dhcp in (
+                    self._get_row(ovnconst.TABLE_DHCP_Options, dhcp_uuid)
+                    for dhcp_uuid in dhcp_uuids
+                )
+                if dhcp
+            ),
+            None,
+        )
+
+    def get_dhcp_by_lsp(self, lsp_uuid):
+        ls = self.get_ls_by_lsp(lsp_uuid)
+        return self.get_dhcp_by_ls(ls.uuid) if ls else None
+
+    def get_lrp_by_name(self, lrp_name):
+        with self._lock:
+            lrp_uuid = self._lrp_by_name.get(lrp_name)
+        return self._get_row(ovnconst.TABLE_LRP, lrp_uuid)
+
+    def get_gateway_lsp_by_lr(self, lr_uuid):
+        with self._lock:
+            lsp_uuid = self._gateway_lsp_by_lr.get(_to_uuid(lr_uuid))
+        return self._get_row(ovnconst.TABLE_LSP, lsp_uuid)
+
+    def get_acls_by_sec_group(self, sec_group):
+        with self._lock:
+            acl_uuids = self._acls_by_sec_group.get(
+                str(sec_group.name), set()
+            ) | self._acls_by_sec_group.get(str(sec_group.uuid), set())
+        acls = (
+            self._get_row(ovnconst.TABLE_ACL, acl_uuid)
+            for acl_uuid in acl_uuids
+        )
+        return [acl for acl in acls if acl]
+
+    def _get_row(self, table, row_uuid):
+        if row_uuid is None:
+            return None
+        return self._tables[table].rows.get(row_uuid)
+
+
+def _discard(index, key, value):
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
+
+
+def _lsp_ips(lsp):
+    # dynamic_addresses is an optional column, a list of at most one value
+    addresses = list(lsp.addresses) + list(lsp.dynamic_addresses or [])
+    ips = set()
+    for address in addresses:
+        # 'mac ip...', the ip can be replaced by 'dynamic'
+        for value in address.split()[1:]:
+            try:
+                ip = IPAddress(value)
+            except (AddrFormatError, ValueError):
+                continue
+            ips.add((ip.version, int(ip)))
+    return ips
+
+
+def _to_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
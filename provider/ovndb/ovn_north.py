@@ -20,6 +20,7 @@
 from __future__ import absolute_import
 
 from ovsdbapp.backend.ovs_idl.idlutils import RowNotFound
+from ovsdbapp.schema.ovn_northbound.commands import PgAddCommand
 
 import ovn_connection
 import constants as ovnconst
@@ -29,12 +30,17 @@ from handlers.base_handler import ElementNotFoundError
 
 import neutron.validation as validate
 from neutron.ip import get_mask_from_subnet
+from neutron.ip import is_ip_available_in_network
+from neutron.ip import random_unique_mac
+from neutron.ip import random_unique_macs
 from neutron.neutron_api_mappers import PortMapper
+from neutron.neutron_api_mappers import RouterMapper
 from neutron.neutron_api_mappers import SecurityGroupMapper
 from neutron.neutron_api_mappers import SecurityGroupRuleMapper
 from neutron.neutron_api_mappers import SubnetMapper
 
 from ovndb.db_set_command import DbSetCommand
+from ovndb.exclude_ips_command import UpdateExcludeIpsCommand
 from ovndb.ovn_security_groups import OvnSecurityGroupApi
 from ovndb.ovn_security_groups import SecurityGroupException
 from ovndb.ovn_security_groups import only_rules_with_allowed_actions
@@ -65,6 +71,9 @@ def optionally_use_transactions(f):
 class OvnNorth(object):
     def __init__(self, idl):
         self.idl = idl
+        # None when not connected to a real IDL, lookups fall back to scans
+        self._index = ovn_connection.index(idl)
+        self._mac_allocator = ovn_connection.mac_allocator()
         self._ovn_sec_group_api = OvnSecurityGroupApi(self.idl)
 
     def create_ovn_update_command(self, table_name, entity_uuid):
@@ -84,34 +93,65 @@ class OvnNorth(object):
             external_ids={PortMapper.OVN_NIC_NAME: name},
         )
 
-    def add_lr(self, name, enabled):
-        return ovn_connection.execute(
-            self.idl.lr_add(router=name, may_exist=False, enabled=enabled)
-        )
+    @optionally_use_transactions
+    def add_lr(self, name, enabled, transaction=None):
+        return self.idl.lr_add(router=name, may_exist=False, enabled=enabled)
 
-    def add_lrp(self, lr_id, lrp_name, mac, lrp_ip, ipv6_ra_configs=None):
-        ovn_connection.execute(
-            self.idl.lrp_add(
-                router=lr_id,
-                port=lrp_name,
-                mac=mac,
-                networks=[lrp_ip],
-                ipv6_ra_configs=ipv6_ra_configs or {},
-            )
+    @optionally_use_transactions
+    def add_lrp(
+        self,
+        lr_id,
+        lrp_name,
+        mac,
+        lrp_ip,
+        ipv6_ra_configs=None,
+        transaction=None,
+    ):
+        return self.idl.lrp_add(
+            router=lr_id,
+            port=lrp_name,
+            mac=mac,
+            networks=[lrp_ip],
+            ipv6_ra_configs=ipv6_ra_configs or {},
         )
 
-    def add_route(self, lrp_id, prefix, nexthop):
-        ovn_connection.execute(self.idl.lr_route_add(lrp_id, prefix, nexthop))
+    @optionally_use_transactions
+    def add_route(self, lrp_id, prefix, nexthop, transaction=None):
+        return self.idl.lr_route_add(lrp_id, prefix, nexthop)
+
+    def is_ip_available_in_network(self, ls, ip):
+        if self._index:
+            return self._index.is_ip_available(ls.uuid, ip)
+        return is_ip_available_in_network(ls, ip)
+
+    def allocate_mac(self):
+        if self._mac_allocator:
+            return self._mac_allocator.allocate()
+        return random_unique_mac(self.list_lsp(), self.list_lrp())
+
+    def allocate_macs(self, count):
+        if self._mac_allocator:
+            return [self._mac_allocator.allocate() for _ in range(count)]
+        if not count:
+            return []
+        return random_unique_macs(self.list_lsp(), self.list_lrp(), count)
 
-    def add_dhcp_options(self, cidr, external_ids):
-        return ovn_connection.execute(
-            self.idl.dhcp_options_add(cidr, **external_ids)
-        )
+    @optionally_use_transactions
+    def add_dhcp_options(self, cidr, external_ids, transaction=None):
+        return self.idl.dhcp_options_add(cidr, **external_ids)
 
     @accepts_single_arg
-    def get_ls(self, ls_id=None, dhcp=None):
+    def get_ls(self, ls_id=None, dhcp=None, lsp=None):
         if ls_id:
             return ovn_connection.execute(self.idl.ls_get(ls_id))
+        if lsp and self._index:
+            return self._index.get_ls_by_lsp(lsp.uuid)
+        if lsp:
+            return next(
+                (ls for ls in self.list_ls() if lsp in ls.ports), None
+            )
+        if dhcp and self._index:
+            return self._index.get_ls_by_dhcp(dhcp)
         if dhcp:
             dhcp_ls_id = str(
                 dhcp.external_ids.get(SubnetMapper.OVN_NETWORK_ID)
@@ -122,6 +162,8 @@ class OvnNorth(object):
 
     @accepts_single_arg
     def get_dhcp(self, ls_id=None, dhcp_id=None, lsp_id=None):
+        if ls_id and self._index:
+            return self._index.get_dhcp_by_ls(ls_id)
         if ls_id:
             return next(
                 (
@@ -146,6 +188,8 @@ class OvnNorth(object):
             validate.subnet_is_ovirt_managed(dhcp)
             return dhcp
 
+        if lsp_id and self._index:
+            return self._index.get_dhcp_by_lsp(lsp_id)
         if lsp_id:
             for dhcp in self.list_dhcp():
                 network_id = dhcp.external_ids[SubnetMapper.OVN_NETWORK_ID]
@@ -158,7 +202,14 @@ class OvnNorth(object):
             return None
 
     @accepts_single_arg
-    def get_lsp(self, lsp_id=None, ovirt_lsp_id=None, lrp=None, lsp_name=None):
+    def get_lsp(
+        self,
+        lsp_id=None,
+        ovirt_lsp_id=None,
+        lrp=None,
+        lsp_name=None,
+        gateway_of_lr=None,
+    ):
         if lsp_id or lsp_name:
             return ovn_connection.execute(self.idl.lsp_get(lsp_id or lsp_name))
         if ovirt_lsp_id:
@@ -169,11 +220,30 @@ class OvnNorth(object):
         if lrp:
             lsp_id = lrp.name[len(ovnconst.ROUTER_PORT_NAME_PREFIX) :]
             return ovn_connection.execute(self.idl.lsp_get(lsp_id))
+        if gateway_of_lr and self._index:
+            lsp = self._index.get_gateway_lsp_by_lr(gateway_of_lr.uuid)
+            if lsp:
+                return lsp
+        if gateway_of_lr:
+            lsp_id = gateway_of_lr.external_ids.get(
+                RouterMapper.OVN_ROUTER_GATEWAY_PORT
+            )
+            return (
+                ovn_connection.execute(self.idl.lsp_get(lsp_id))
+                if lsp_id
+                else None
+            )
 
     @accepts_single_arg
     def get_lrp(self, lrp_name=None, lsp_id=None):
+        if lrp_name and self._index:
+            lrp = self._index.get_lrp_by_name(lrp_name)
+            if lrp:
+                return lrp
         if lrp_name:
-            return self.idl.lookup(ovnconst.TABLE_LRP, lrp_name)
+            return ovn_connection.lookup(
+                self.idl, ovnconst.TABLE_LRP, lrp_name
+            )
         if lsp_id:
             lsp = self.get_lsp(lsp_id=lsp_id)
             lrp_name = lsp.options.get(ovnconst.LSP_OPTION_ROUTER_PORT)
@@ -184,7 +254,9 @@ class OvnNorth(object):
         if lr_id:
             try:
                 # TODO: replace by command after moving to newer ovsdbapp ver
-                return self.idl.lookup(ovnconst.TABLE_LR, lr_id)
+                return ovn_connection.lookup(
+                    self.idl, ovnconst.TABLE_LR, lr_id
+                )
             except RowNotFound:
                 raise ElementNotFoundError(
                     'Router {router} does not exist'.format(router=lr_id)
@@ -207,6 +279,11 @@ class OvnNorth(object):
         else:
             return all_lrps
 
+    def list_lrp_rows(self):
+        return ovn_connection.execute(
+            self.idl.db_list_rows(ovnconst.TABLE_LRP)
+        )
+
     @staticmethod
     def get_lrp_id(lrp):
         return lrp['_uuid']
@@ -228,17 +305,20 @@ class OvnNorth(object):
     def remove_ls(self, ls_id):
         return self.idl.ls_del(ls_id)
 
-    def remove_static_route(self, lr, ip_prefix):
-        for route in lr.static_routes:
-            if route.ip_prefix == ip_prefix:
-                ovn_connection.execute(
-                    self.idl.db_remove(
-                        ovnconst.TABLE_LR,
-                        str(lr.uuid),
-                        ovnconst.ROW_LR_STATIC_ROUTES,
-                        route,
-                    )
-                )
+    @optionally_use_transactions
+    def remove_static_route(self, lr, ip_prefix, transaction=None):
+        routes = [
+            route
+            for route in lr.static_routes
+            if route.ip_prefix == ip_prefix
+        ]
+        if routes:
+            return self.idl.db_remove(
+                ovnconst.TABLE_LR,
+                str(lr.uuid),
+                ovnconst.ROW_LR_STATIC_ROUTES,
+                *routes,
+            )
 
     @optionally_use_transactions
     def remove_dhcp_options(self, id, transacion=None):
@@ -248,30 +328,40 @@ class OvnNorth(object):
     def remove_lsp(self, lsp_id, transaction=None):
         return self.idl.lsp_del(lsp_id)
 
-    def remove_router(self, router_id):
-        ovn_connection.execute(self.idl.lr_del(router_id))
+    @optionally_use_transactions
+    def remove_router(self, router_id, transaction=None):
+        return self.idl.lr_del(router_id)
 
-    def remove_lrp(self, lrp_id):
-        ovn_connection.execute(self.idl.lrp_del(str(lrp_id)))
+    @optionally_use_transactions
+    def remove_lrp(self, lrp_id, transaction=None):
+        return self.idl.lrp_del(str(lrp_id))
 
-    def db_set(self, table, id, values):
-        ovn_connection.execute(self.idl.db_set(table, id, values))
+    @optionally_use_transactions
+    def db_set(self, table, id, values, transaction=None):
+        return self.idl.db_set(table, id, values)
 
     def _is_port_ovirt_controlled(self, port_row):
         return PortMapper.OVN_NIC_NAME in port_row.external_ids
 
-    def clear_row_column(self, table, row_id, column):
-        ovn_connection.execute(self.idl.db_clear(table, row_id, column))
+    @optionally_use_transactions
+    def clear_row_column(self, table, row_id, column, transaction=None):
+        return self.idl.db_clear(table, row_id, column)
 
-    def remove_key_from_column(self, table, row_id, column_name, key):
-        ovn_connection.execute(
-            self.idl.db_remove(table, row_id, column_name, key)
-        )
+    @optionally_use_transactions
+    def remove_key_from_column(
+        self, table, row_id, column_name, key, transaction=None
+    ):
+        return self.idl.db_remove(table, row_id, column_name, key)
 
-    def set_dhcp_options_options_column(self, subnet_uuid, options):
-        ovn_connection.execute(
-            self.idl.dhcp_options_set_options(subnet_uuid, **options)
-        )
+    @optionally_use_transactions
+    def update_exclude_ips(self, ls_id, add=(), remove=(), transaction=None):
+        return UpdateExcludeIpsCommand(self.idl, ls_id, add, remove)
+
+    @optionally_use_transactions
+    def set_dhcp_options_options_column(
+        self, subnet_uuid, options, transaction=None
+    ):
+        return self.idl.dhcp_options_set_options(subnet_uuid, **options)
 
     def list_security_groups(self):
         return list(
@@ -285,8 +375,8 @@ class OvnNorth(object):
 
     def get_security_group(self, security_group_id):
         try:
-            return self.idl.lookup(
-                ovnconst.TABLE_PORT_GROUP, security_group_id
+            return ovn_connection.lookup(
+                self.idl, ovnconst.TABLE_PORT_GROUP, security_group_id
             )
         except RowNotFound:
             raise ElementNotFoundError(
@@ -331,6 +421,8 @@ class OvnNorth(object):
 
     @only_rules_with_allowed_actions
     def list_security_group_rules(self, sec_group=None):
+        if sec_group is not None and self._index:
+            return self._index.get_acls_by_sec_group(sec_group)
         all_rules = ovn_connection.execute(
             self.idl.db_list_rows(ovnconst.TABLE_ACL)
         )
@@ -349,9 +441,36 @@ class OvnNorth(object):
             )
         )
 
+    def list_security_group_rules_by_group(self, sec_groups):
+        """
+        :return: the rules of each of the security groups by group uuid, read
+        in a single pass over the ACLs
+        """
+        if self._index:
+            return {
+                sec_group.uuid: self.list_security_group_rules(sec_group)
+                for sec_group in sec_groups
+            }
+        group_uuids = {}
+        for sec_group in sec_groups:
+            group_uuids[str(sec_group.name)] = sec_group.uuid
+            group_uuids[str(sec_group.uuid)] = sec_group.uuid
+        rules_by_group = {sec_group.uuid: [] for sec_group in sec_groups}
+        for rule in self.list_security_group_rules():
+            group_uuid = group_uuids.get(
+                rule.external_ids.get(
+                    SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_SEC_GROUP_ID
+                )
+            )
+            if group_uuid is not None:
+                rules_by_group[group_uuid].append(rule)
+        return rules_by_group
+
     def get_security_group_rule(self, security_group_rule_id):
         try:
-            return self.idl.lookup(ovnconst.TABLE_ACL, security_group_rule_id)
+            return ovn_connection.lookup(
+                self.idl, ovnconst.TABLE_ACL, security_group_rule_id
+            )
         except RowNotFound:
             raise ElementNotFoundError(
                 'Security Group Rule {rule_id} does not exist'.format(
@@ -464,6 +583,9 @@ class OvnNorth(object):
         transaction,
         provision_acl_function=None,
     ):
+        sec_group = self._get_group_added_by(transaction, sec_group_name)
+        if sec_group:
+            return sec_group
         try:
             sec_group = self.get_security_group(sec_group_name)
         except ElementNotFoundError:
@@ -473,6 +595,23 @@ class OvnNorth(object):
                     transaction.add(acl)
         return sec_group
 
+    @staticmethod
+    def _get_group_added_by(transaction, sec_group_name):
+        """
+        :return: the command adding the group, if an earlier operation of the
+        transaction added it, so operations joined in a single transaction do
+        not add the group twice
+        """
+        return next(
+            (
+                command
+                for command in transaction.commands
+                if isinstance(command, PgAddCommand)
+                and command.name == sec_group_name
+            ),
+            None,
+        )
+
     def activate_drop_all_security_group(self, port_id, transaction):
         drop_all_port_group = self.assure_group_exists(
             SecurityGroupMapper.DROP_ALL_IP_PG_NAME,
@@ -26,6 +26,7 @@ from functools import wraps
 from ovsdbapp.backend.ovs_idl.idlutils import RowNotFound
 
 import constants as ovnconst
+import ovn_connection
 
 from handlers.base_handler import ElementNotFoundError
 
@@ -87,8 +88,8 @@ class OvnSecurityGroupApi(object):
 
     def update_security_group(self, sec_group_id, name, description=None):
         try:
-            sec_group = self._idl.lookup(
-                ovnconst.TABLE_PORT_GROUP, sec_group_id
+            sec_group = ovn_connection.lookup(
+                self._idl, ovnconst.TABLE_PORT_GROUP, sec_group_id
             )
         except RowNotFound as e:
             raise ElementNotFoundError(e)
@@ -0,0 +1,186 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import threading
+import uuid
+
+import ovs.db.error
+import ovs.db.idl
+from ovs.db import data
+
+# A snapshot of the IDL replica, written to a local file, holds the rows of
+# the monitored tables and the id of the last transaction of the northbound
+# db they reflect. Loaded into a new IDL before it connects, the IDL asks the
+# server by monitor_cond_since only for the changes after that transaction.
+# If the server does not know the transaction any more, or does not support
+# monitor_cond_since, the IDL drops the loaded rows and receives the whole
+# database as usual.
+
+SNAPSHOT_FORMAT = 1
+
+_NO_TRANSACTION = str(uuid.UUID(int=0))
+
+
+def load(idl, path):
+    """
+    Loads the snapshot at path into the replica of an IDL which has not
+    connected yet. The snapshot is ignored if it does not match the schema
+    and the monitored columns of the IDL.
+    :return: The loaded rows
+    """
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError):
+        logging.warning('Failed to read the snapshot %s', path, exc_info=True)
+        return []
+    if not _matches(idl, snapshot):
+        logging.info('Ignoring the snapshot %s of another schema', path)
+        return []
+    try:
+        rows = _parse_rows(idl, snapshot['rows'])
+    except (ovs.db.error.Error, KeyError, TypeError, ValueError):
+        logging.warning('Failed to parse the snapshot %s', path, exc_info=True)
+        return []
+    for row in rows:
+        row._table.rows[row.uuid] = row
+    idl.last_id = snapshot['last_id']
+    return rows
+
+
+def save(connection, path):
+    """
+    Writes the snapshot of the replica of the IDL of an ovsdbapp Connection
+    to path, replacing the previous one.
+    :return: The id of the last transaction of the snapshot, or None if the
+    IDL does not know it
+    """
+    with connection.lock:
+        idl = connection.idl
+        last_id = idl.last_id
+        if last_id == _NO_TRANSACTION:
+            return None
+        # The IDL replaces the datums of a row on update, the copy of the
+        # references is enough to serialize them outside of the lock
+        rows = {
+            table.name: [
+                (str(row.uuid), dict(row._data)) for row in table.rows.values()
+            ]
+            for table in idl.tables.values()
+        }
+    snapshot = _header(idl)
+    snapshot['last_id'] = last_id
+    snapshot['rows'] = {
+        table: {
+            row_uuid: {
+                column: datum.to_json()
+                for column, datum in row_data.items()
+                if not datum.is_default()
+            }
+            for row_uuid, row_data in table_rows
+        }
+        for table, table_rows in rows.items()
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = '{path}.tmp'.format(path=path)
+    with open(tmp_path, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file, separators=(',', ':'))
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
+    return last_id
+
+
+def _header(idl):
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'name': idl._db.name,
+        'version': idl._db.version,
+        'columns': {
+            table.name: sorted(table.columns) for table in idl.tables.values()
+        },
+    }
+
+
+def _matches(idl, snapshot):
+    return isinstance(snapshot, dict) and all(
+        snapshot.get(key) == value for key, value in _header(idl).items()
+    )
+
+
+def _parse_rows(idl, snapshot_rows):
+    rows = []
+    for table_name, table_rows in snapshot_rows.items():
+        table = idl.tables[table_name]
+        for row_uuid, row_json in table_rows.items():
+            row_data = {
+                column_name: (
+                    data.Datum.from_json(column.type, row_json[column_name])
+                    if column_name in row_json
+                    else data.Datum.default(column.type)
+                )
+                for column_name, column in table.columns.items()
+            }
+            rows.append(
+                ovs.db.idl.Row(idl, table, uuid.UUID(row_uuid), row_data)
+            )
+    return rows
+
+
+class SnapshotWriter(threading.Thread):
+    """
+    Saves the snapshot of the replica of the IDL of an ovsdbapp Connection
+    every `interval` seconds, if the database changed, and once more when
+    stopped.
+    """
+
+    def __init__(self, connection, path, interval):
+        super(SnapshotWriter, self).__init__(name='ovn-snapshot-writer')
+        self.daemon = True
+        self._connection = connection
+        self._path = path
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._saved_id = connection.idl.last_id
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            self._save()
+        self._save()
+
+    def _save(self):
+        if self._connection.idl.last_id == self._saved_id:
+            return
+        try:
+            self._saved_id = save(self._connection, self._path)
+        except OSError:
+            logging.exception('Failed to save the snapshot %s', self._path)
@@ -0,0 +1,111 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+
+
+from __future__ import absolute_import
+
+import functools
+import operator
+import uuid
+
+from ovs.db import data
+from ovs.db.idl import ROW_DELETE
+
+# The versions start over with every process, so they are qualified by a
+# token picked at start, the same for all the replicas
+_TOKEN = uuid.uuid4().hex[:8]
+
+
+class TableVersions(object):
+    """
+    Digests the rows of each table of the IDL replica, to tell whether
+    anything read from the tables may have changed since it was read.
+
+    The digest of a table is the xor of the hashes of the contents of its
+    rows, kept up to date by the row notifications of the IDL, see
+    ovn_connection.add_row_listener. It depends only on the contents of the
+    table, so that replicas holding the same rows have the same versions,
+    whenever they connected.
+
+    The versions are read under the lock of the ovsdbapp connection, see
+    ovn_connection.table_version, which its thread holds while it updates
+    the replica and notifies the changes, so they never see an update half
+    notified. Every row of the replica is notified when it is created, but
+    rows dropped while the IDL reconnects are not notified: a table with
+    fewer rows than hashes is digested again from its rows.
+    """
+
+    def __init__(self, tables):
+        self._tables = tables
+        # table name -> {row uuid -> hash of the row}
+        self._hashes = {}
+        # table name -> xor of the hashes of its rows
+        self._digests = {}
+
+    def notify(self, event, row, updates=None):
+        table = row._table.name
+        hashes = self._hashes.setdefault(table, {})
+        digest = self._digests.get(table, 0) ^ hashes.pop(row.uuid, 0)
+        if event != ROW_DELETE:
+            hashes[row.uuid] = _row_hash(row)
+            digest ^= hashes[row.uuid]
+        self._digests[table] = digest
+
+    def version(self, table_names):
+        """
+        :return: A string which is different after any row of the tables
+        is created, updated or deleted
+        """
+        return '-'.join(
+            [_TOKEN]
+            + ['{:x}'.format(self._digest(table)) for table in table_names]
+        )
+
+    def _digest(self, table_name):
+        table = self._tables.get(table_name)
+        rows = table.rows if table else {}
+        if len(self._hashes.get(table_name, ())) != len(rows):
+            hashes = {row.uuid: _row_hash(row) for row in rows.values()}
+            self._hashes[table_name] = hashes
+            self._digests[table_name] = functools.reduce(
+                operator.xor, hashes.values(), 0
+            )
+        return self._digests.get(table_name, 0) & _HASH_MASK
+
+
+_HASH_MASK = (1 << 64) - 1
+
+
+def _row_hash(row):
+    return hash(
+        (
+            row.uuid,
+            frozenset(
+                (column, _value_key(value))
+                for column, value in row._data.items()
+            ),
+        )
+    )
+
+
+def _value_key(value):
+    # A Datum is not hashable, but its atoms are. Other values, like those
+    # of rows built by hand, are told apart by their representation.
+    if isinstance(value, data.Datum):
+        return frozenset(value.values.items())
+    return repr(value)
@@ -0,0 +1,167 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+# Authenticated requests carrying this header are profiled, if enabled by
+# profiling-header-enabled
+PROFILE_HEADER = 'X-Profile-Request'
+
+PROFILE_SUFFIX = '.profile.txt'
+
+# The profile of the request being served by the current thread
+_local = threading.local()
+
+
+def record_commands(commands, duration, transaction=False):
+    """
+    Adds the OVSDB commands executed, or committed in a transaction, to the
+    profile of the request being served by the current thread, if the
+    request is profiled.
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.commands.append((list(commands), duration, transaction))
+
+
+class RequestProfiler(object):
+    """
+    Runs a fraction of the requests, and the requests asking for it by
+    PROFILE_HEADER, under cProfile. The profiled requests taking at least
+    `slow_threshold` seconds, and all those asking for it, are written to
+    `directory` with the top frames of the profile and the OVSDB commands
+    the request issued. Only the latest `max_profiles` files are kept.
+    """
+
+    def __init__(
+        self,
+        directory,
+        sample_rate=0.0,
+        slow_threshold=0.0,
+        header_enabled=False,
+        max_profiles=50,
+        top_frames=40,
+    ):
+        self._directory = directory
+        self._sample_rate = sample_rate
+        self._slow_threshold = slow_threshold
+        self._header_enabled = header_enabled
+        self._max_profiles = max_profiles
+        self._top_frames = top_frames
+        self._lock = threading.Lock()
+
+    def start(self, headers):
+        """
+        :return: The started _Profile of the request, or None if the request
+        is not profiled
+        """
+        requested = self._header_enabled and bool(headers.get(PROFILE_HEADER))
+        sampled = random.random() < self._sample_rate
+        if not requested and not sampled:
+            return None
+        profile = _Profile(requested, sampled)
+        try:
+            profile.profiler.enable()
+        except ValueError:
+            # Another profiler is active
+            return None
+        _local.profile = profile
+        return profile
+
+    def finish(self, profile, duration, description, authenticated=False):
+        """
+        Writes the profile if the request was slow, or if it asked for it
+        and was authenticated: the header of anonymous requests is not
+        honoured, not to let them write to the disk.
+        """
+        profile.profiler.disable()
+        _local.profile = None
+        if (profile.requested and authenticated) or (
+            profile.sampled and duration >= self._slow_threshold
+        ):
+            try:
+                self._dump(profile, duration, description)
+            except (IOError, OSError):
+                logging.exception('Failed to write the request profile')
+
+    def _dump(self, profile, duration, description):
+        stats_text = io.StringIO()
+        stats = pstats.Stats(profile.profiler, stream=stats_text)
+        stats.sort_stats('cumulative').print_stats(self._top_frames)
+        lines = [
+            description,
+            'Duration: {:.3f}s'.format(duration),
+            'OVSDB commands:',
+        ]
+        for commands, commands_duration, transaction in profile.commands:
+            if transaction:
+                lines.append(
+                    '  {:.3f}s transaction of {} commands'.format(
+                        commands_duration, len(commands)
+                    )
+                )
+                lines.extend('    {}'.format(command) for command in commands)
+            else:
+                lines.extend(
+                    '  {:.3f}s {}'.format(commands_duration, command)
+                    for command in commands
+                )
+        lines.append(stats_text.getvalue())
+        name = '{timestamp}-{thread}-{ms}ms{suffix}'.format(
+            timestamp=time.strftime('%Y%m%d%H%M%S'),
+            thread=threading.get_ident(),
+            ms=int(duration * 1000),
+            suffix=PROFILE_SUFFIX,
+        )
+        path = os.path.join(self._directory, name)
+        with self._lock:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                f.write('\n'.join(lines))
+            os.rename(path + '.tmp', path)
+            self._rotate()
+
+    def _rotate(self):
+        profiles = sorted(
+            (
+                os.path.join(self._directory, name)
+                for name in os.listdir(self._directory)
+                if name.endswith(PROFILE_SUFFIX)
+            ),
+            key=os.path.getmtime,
+        )
+        for path in profiles[: max(len(profiles) - self._max_profiles, 0)]:
+            os.remove(path)
+
+
+class _Profile(object):
+    def __init__(self, requested, sampled):
+        self.profiler = cProfile.Profile()
+        self.requested = requested
+        self.sampled = sampled
+        # (commands, duration, transaction) of the OVSDB commands issued
+        self.commands = []
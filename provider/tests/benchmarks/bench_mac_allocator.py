@@ -0,0 +1,84 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+"""
+Compares the cost of picking the mac of a new port by scanning all the
+ports with the cost of the MacAllocator, for a growing number of ports.
+
+Run from the provider directory:
+    PYTHONPATH=. python tests/benchmarks/bench_mac_allocator.py
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+import uuid
+
+import constants as ovnconst
+from neutron.ip import random_unique_mac
+from ovndb.mac_allocator import MacAllocator
+
+PORT_COUNTS = (100, 10000, 100000)
+
+
+class Table(object):
+    name = ovnconst.TABLE_LSP
+
+
+class Port(object):
+    _table = Table()
+    dynamic_addresses = []
+
+    def __init__(self, mac):
+        self.uuid = uuid.uuid4()
+        self.addresses = ['{} 10.0.0.1'.format(mac)]
+
+
+def _ports(count):
+    allocator = MacAllocator('02')
+    return [Port(allocator.allocate()) for _ in range(count)]
+
+
+def main():
+    for count in PORT_COUNTS:
+        ports = _ports(count)
+        allocator = MacAllocator('02')
+        for port in ports:
+            allocator.notify('create', port)
+
+        number = 10 if count > 1000 else 100
+        scan = min(
+            timeit.repeat(
+                lambda: random_unique_mac(ports, []), number=number, repeat=3
+            )
+        )
+        allocate = min(
+            timeit.repeat(allocator.allocate, number=number, repeat=3)
+        )
+        print(
+            '{:>7} ports: scan {:>10.2f} us, allocator {:>6.2f} us, '
+            'density {:.2e}'.format(
+                count,
+                scan / number * 1e6,
+                allocate / number * 1e6,
+                allocator.report()['density'],
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+"""
+Compares the cost of building a NeutronApi for every request with the cost
+of reusing the shared instance. The northbound db connection is mocked, so
+the numbers show the overhead of the provider code only.
+
+Run from the provider directory:
+    PYTHONPATH=. python tests/benchmarks/bench_neutron_api.py
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+
+import mock
+
+import constants as ovnconst
+from neutron.neutron_api import NeutronApi
+
+REQUESTS = 10000
+
+
+def _per_request():
+    return NeutronApi().security_group_support
+
+
+def _shared():
+    return NeutronApi.shared().security_group_support
+
+
+def main():
+    with mock.patch(
+        'ovsdbapp.backend.ovs_idl.connection', autospec=False
+    ) as connection, mock.patch('ovn_connection._create_idl'):
+        connection.Connection.return_value.idl.tables = {
+            ovnconst.TABLE_PORT_GROUP: mock.Mock()
+        }
+        benches = (('per request', _per_request), ('shared', _shared))
+        for name, bench in benches:
+            seconds = min(timeit.repeat(bench, number=REQUESTS, repeat=3))
+            print(
+                '{:<12} {:>8.2f} us/request'.format(
+                    name, seconds / REQUESTS * 1e6
+                )
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+"""
+Times the NeutronApi operations against an in-memory northbound db, see
+fake_northbound.py, holding a growing number of networks, ports, subnets,
+routers and security groups. The ovsdbapp commands run unchanged but without
+any I/O, so the numbers show the cost of the provider code and of ovsdbapp
+only. The results are printed as JSON, to be compared across versions.
+
+Run from the provider directory:
+    PYTHONPATH=. python tests/benchmarks/bench_operations.py [SCALE ...]
+
+A scale is the number of networks, each with a subnet and PORTS_PER_NETWORK
+ports.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_northbound  # noqa: E402
+from neutron.neutron_api import NeutronApi  # noqa: E402
+
+SCALES = (10, 100, 500)
+PORTS_PER_NETWORK = 10
+# One router and one security group for every NETWORKS_PER_GROUP networks
+NETWORKS_PER_GROUP = 10
+RULES_PER_GROUP = 4
+# The times of the reads are the best of REPEAT runs
+REPEAT = 3
+# The number of entities created and deleted to time the writes
+WRITES = 20
+
+
+class Scenario(object):
+    def __init__(self, api, networks):
+        self.api = api
+        self.networks = []
+        self.subnets = []
+        self.ports = []
+        self.routers = []
+        self.security_groups = []
+        self.rules = []
+        self._populate(networks)
+
+    def sizes(self):
+        return {
+            'networks': len(self.api.list_networks()),
+            'ports': len(self.api.list_ports()),
+            'subnets': len(self.api.list_subnets()),
+            'routers': len(self.api.list_routers()),
+            'security_groups': len(self.api.list_security_groups()),
+            'security_group_rules': len(self.api.list_security_group_rules()),
+        }
+
+    def _populate(self, networks):
+        for _ in range(max(networks // NETWORKS_PER_GROUP, 1)):
+            group = self.add_security_group()
+            self.security_groups.append(group)
+            for port in range(RULES_PER_GROUP):
+                self.rules.append(
+                    self.add_security_group_rule(group['id'], 1000 + port)
+                )
+        self.networks, self.subnets = self.add_networks(networks)
+        for index, network in enumerate(self.networks):
+            group = self.security_groups[index % len(self.security_groups)]
+            self.ports.extend(
+                self.api.add_ports(
+                    [
+                        self._rest_port(network, group)
+                        for _ in range(PORTS_PER_NETWORK)
+                    ]
+                )
+            )
+            if index % NETWORKS_PER_GROUP == 0:
+                router = self.api.add_router({'name': 'router'})
+                self.routers.append(router)
+                self.add_router_interface(
+                    router['id'], self.subnets[index]['id']
+                )
+
+    def add_networks(self, count):
+        networks = self.api.add_networks(
+            [{'name': 'network'} for _ in range(count)]
+        )
+        subnets = self.api.add_subnets(
+            [
+                {
+                    'name': 'subnet',
+                    'network_id': network['id'],
+                    'cidr': '10.{}.{}.0/24'.format(index // 256, index % 256),
+                    'ip_version': 4,
+                    'gateway_ip': '10.{}.{}.1'.format(
+                        index // 256, index % 256
+                    ),
+                }
+                for index, network in enumerate(networks)
+            ]
+        )
+        return networks, subnets
+
+    def add_port(self):
+        return self.api.add_port(
+            self._rest_port(self.networks[0], self.security_groups[0])
+        )
+
+    @staticmethod
+    def _rest_port(network, group):
+        return {
+            'name': 'port',
+            'network_id': network['id'],
+            'device_id': 'device',
+            'port_security_enabled': True,
+            'security_groups': [group['id']],
+        }
+
+    def add_router_interface(self, router_id, subnet_id):
+        return self.api.add_router_interface(
+            {'subnet_id': subnet_id}, router_id
+        )
+
+    def delete_router_interface(self, router_id, subnet_id):
+        return self.api.delete_router_interface(
+            {'subnet_id': subnet_id}, router_id
+        )
+
+    def add_security_group(self):
+        return self.api.add_security_group({'name': 'group'})
+
+    def add_security_group_rule(self, group_id, port):
+        return self.api.add_security_group_rule(
+            {
+                'security_group_id': group_id,
+                'direction': 'ingress',
+                'protocol': 'tcp',
+                'port_range_min': port,
+                'port_range_max': port,
+            }
+        )
+
+
+def _time_read(func):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def _time_writes(func, args_list):
+    results = []
+    start = time.perf_counter()
+    for args in args_list:
+        results.append(func(*args))
+    return (time.perf_counter() - start) / len(args_list), results
+
+
+def _bench(scenario):
+    api = scenario.api
+    network_id = scenario.networks[-1]['id']
+    port_id = scenario.ports[-1]['id']
+    subnet_id = scenario.subnets[-1]['id']
+    router_id = scenario.routers[-1]['id']
+    group_id = scenario.security_groups[-1]['id']
+    rule_id = scenario.rules[-1]['id']
+    times = {
+        'list_networks': _time_read(api.list_networks),
+        'list_ports': _time_read(api.list_ports),
+        'list_subnets': _time_read(api.list_subnets),
+        'list_routers': _time_read(api.list_routers),
+        'list_security_groups': _time_read(api.list_security_groups),
+        'list_security_group_rules': _time_read(api.list_security_group_rules),
+        'get_network': _time_read(lambda: api.get_network(network_id)),
+        'get_port': _time_read(lambda: api.get_port(port_id)),
+        'get_subnet': _time_read(lambda: api.get_subnet(subnet_id)),
+        'get_router': _time_read(lambda: api.get_router(router_id)),
+        'get_security_group': _time_read(
+            lambda: api.get_security_group(group_id)
+        ),
+        'get_security_group_rule': _time_read(
+            lambda: api.get_security_group_rule(rule_id)
+        ),
+    }
+
+    times['add_port'], ports = _time_writes(scenario.add_port, [()] * WRITES)
+    times['delete_port'], _ = _time_writes(
+        api.delete_port, [(port['id'],) for port in ports]
+    )
+
+    networks, subnets = scenario.add_networks(WRITES)
+    interfaces = [(router_id, subnet['id']) for subnet in subnets]
+    times['add_router_interface'], _ = _time_writes(
+        scenario.add_router_interface, interfaces
+    )
+    times['delete_router_interface'], _ = _time_writes(
+        scenario.delete_router_interface, interfaces
+    )
+    times['delete_subnet'], _ = _time_writes(
+        api.delete_subnet, [(subnet['id'],) for subnet in subnets]
+    )
+    times['delete_network'], _ = _time_writes(
+        api.delete_network, [(network['id'],) for network in networks]
+    )
+
+    routers = [api.add_router({'name': 'router'}) for _ in range(WRITES)]
+    times['delete_router'], _ = _time_writes(
+        api.delete_router, [(router['id'],) for router in routers]
+    )
+
+    times['add_security_group'], groups = _time_writes(
+        scenario.add_security_group, [()] * WRITES
+    )
+    times['add_security_group_rule'], rules = _time_writes(
+        scenario.add_security_group_rule,
+        [(group['id'], 22) for group in groups],
+    )
+    times['delete_security_group_rule'], _ = _time_writes(
+        api.delete_security_group_rule, [(rule['id'],) for rule in rules]
+    )
+    times['delete_security_group'], _ = _time_writes(
+        api.delete_security_group, [(group['id'],) for group in groups]
+    )
+    return times
+
+
+def _git_hash():
+    try:
+        return (
+            subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(scales):
+    # The commands failing by design, like deleting a group in use, are
+    # not expected, but would flood the output
+    logging.disable(logging.ERROR)
+    results = []
+    for networks in scales:
+        with fake_northbound.connected():
+            scenario = Scenario(NeutronApi(), networks)
+            sizes = scenario.sizes()
+            times = _bench(scenario)
+        results.append(
+            {
+                'sizes': sizes,
+                'us_per_call': {
+                    operation: round(seconds * 1e6, 1)
+                    for operation, seconds in sorted(times.items())
+                },
+            }
+        )
+    print(
+        json.dumps(
+            {
+                'githash': _git_hash(),
+                'python': platform.python_version(),
+                'results': results,
+            },
+            indent=2,
+            sort_keys=True,
+        )
+    )
+
+
+if __name__ == '__main__':
+    main([int(scale) for scale in sys.argv[1:]] or SCALES)
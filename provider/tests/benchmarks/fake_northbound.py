@@ -0,0 +1,625 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import contextlib
+import itertools
+import operator
+import threading
+import traceback
+import types
+import uuid
+
+import mock
+from ovs.db import data
+from ovs.db import idl
+from ovs.db import schema
+from ovsdbapp.backend.ovs_idl import idlutils
+from ovsdbapp.backend.ovs_idl import rowview
+from ovsdbapp.schema.ovn_northbound.impl_idl import OvnNbApiIdlImpl
+
+import constants as ovnconst
+import ovn_connection
+
+# An in-memory Northbound database holding the tables used by the provider.
+# The ovsdbapp commands run on it unchanged: its rows behave like the rows of
+# the IDL replica, and a transaction is applied the way ovsdb-server and the
+# IDL would apply it, including the removal of the unreferenced child rows,
+# the cleanup of weak references and the row notifications, but without any
+# I/O.
+
+_STRING = {'type': 'string'}
+_INTEGER = {'type': 'integer'}
+_BOOLEAN = {'type': 'boolean'}
+_MAP = {
+    'type': {'key': 'string', 'value': 'string', 'min': 0, 'max': 'unlimited'}
+}
+
+
+def _optional(key):
+    return {'type': {'key': key, 'min': 0, 'max': 1}}
+
+
+def _set(key, min_size=0):
+    return {'type': {'key': key, 'min': min_size, 'max': 'unlimited'}}
+
+
+def _ref(table, ref_type='strong'):
+    return {'type': 'uuid', 'refTable': table, 'refType': ref_type}
+
+
+SCHEMA = {
+    'name': ovnconst.OVN_NORTHBOUND,
+    'version': '5.23.0',
+    'tables': {
+        ovnconst.TABLE_LS: {
+            'columns': {
+                'name': _STRING,
+                'ports': _set(_ref(ovnconst.TABLE_LSP)),
+                'other_config': _MAP,
+                'external_ids': _MAP,
+            },
+            'isRoot': True,
+        },
+        ovnconst.TABLE_LSP: {
+            'columns': {
+                'name': _STRING,
+                'type': _STRING,
+                'options': _MAP,
+                'parent_name': _optional('string'),
+                'tag_request': _optional('integer'),
+                'tag': _optional('integer'),
+                'addresses': _set('string'),
+                'dynamic_addresses': _optional('string'),
+                'port_security': _set('string'),
+                'up': _optional('boolean'),
+                'enabled': _optional('boolean'),
+                'dhcpv4_options': _optional(
+                    _ref(ovnconst.TABLE_DHCP_Options, 'weak')
+                ),
+                'dhcpv6_options': _optional(
+                    _ref(ovnconst.TABLE_DHCP_Options, 'weak')
+                ),
+                'external_ids': _MAP,
+            },
+            'indexes': [['name']],
+            'isRoot': False,
+        },
+        ovnconst.TABLE_DHCP_Options: {
+            'columns': {
+                'cidr': _STRING,
+                'options': _MAP,
+                'external_ids': _MAP,
+            },
+            'isRoot': True,
+        },
+        ovnconst.TABLE_LR: {
+            'columns': {
+                'name': _STRING,
+                'ports': _set(_ref(ovnconst.TABLE_LRP)),
+                'static_routes': _set(_ref(ovnconst.TABLE_ROUTES)),
+                'enabled': _optional('boolean'),
+                'options': _MAP,
+                'external_ids': _MAP,
+            },
+            'isRoot': True,
+        },
+        ovnconst.TABLE_LRP: {
+            'columns': {
+                'name': _STRING,
+                'mac': _STRING,
+                'networks': _set('string', min_size=1),
+                'peer': _optional('string'),
+                'enabled': _optional('boolean'),
+                'ipv6_ra_configs': _MAP,
+                'options': _MAP,
+                'external_ids': _MAP,
+            },
+            'indexes': [['name']],
+            'isRoot': False,
+        },
+        ovnconst.TABLE_ROUTES: {
+            'columns': {
+                'ip_prefix': _STRING,
+                'nexthop': _STRING,
+                'output_port': _optional('string'),
+                'policy': _optional('string'),
+                'route_table': _STRING,
+                'options': _MAP,
+                'external_ids': _MAP,
+            },
+            'isRoot': False,
+        },
+        ovnconst.TABLE_PORT_GROUP: {
+            'columns': {
+                'name': _STRING,
+                'ports': _set(_ref(ovnconst.TABLE_LSP, 'weak')),
+                'acls': _set(_ref(ovnconst.TABLE_ACL)),
+                'external_ids': _MAP,
+            },
+            'indexes': [['name']],
+            'isRoot': True,
+        },
+        ovnconst.TABLE_ACL: {
+            'columns': {
+                'name': _optional('string'),
+                'priority': _INTEGER,
+                'direction': _STRING,
+                'match': _STRING,
+                'action': _STRING,
+                'log': _BOOLEAN,
+                'severity': _optional('string'),
+                'meter': _optional('string'),
+                'external_ids': _MAP,
+            },
+            'isRoot': False,
+        },
+    },
+}
+
+
+class Northbound(idl.Idl):
+    """
+    Stands in for the IDL replica of the Northbound database. The replica is
+    the database itself: the transactions are applied right away by
+    Connection.queue_txn.
+    """
+
+    def __init__(self, db_schema=None):
+        db_schema = db_schema or schema.DbSchema.from_json(SCHEMA)
+        self.tables = db_schema.tables
+        for table in self.tables.values():
+            table.rows = _Rows()
+        self.change_seqno = 0
+        self.txn = None
+        # A standalone server, always in sync
+        self.state = self.IDL_S_MONITORING
+        self.server_tables = None
+        # target uuid -> {referring row: number of references}
+        self._strong_refs = {}
+        self._weak_refs = {}
+
+    def notify(self, event, row, updates=None):
+        pass
+
+    def session_name(self):
+        return 'memory'
+
+    def run_transaction(self, transaction):
+        """
+        Does what ovsdbapp's Transaction.do_commit does against a server.
+        """
+        if not transaction.commands:
+            return []
+        txn = _Transaction(self)
+        self.txn = txn
+        try:
+            for command in transaction.commands:
+                command.run_idl(txn)
+        except Exception:
+            txn.abort()
+            raise
+        finally:
+            self.txn = None
+        if txn.changed:
+            self._commit(txn)
+            transaction.post_commit(txn)
+        return [command.result for command in transaction.commands]
+
+    def _commit(self, txn):
+        inserted = txn.inserted
+        deleted = txn.deleted
+        old_data = txn.old_data
+        for row_uuid, row in deleted.items():
+            if row_uuid not in inserted:
+                old_data.setdefault(row_uuid, (row, row._data))
+
+        orphans = []
+        for row_uuid, (row, old) in old_data.items():
+            new = None if row_uuid in deleted else row._data
+            self._link(row, old, new, orphans)
+        for row_uuid, row in inserted.items():
+            if row_uuid not in deleted:
+                self._link(row, None, row._data, orphans)
+                orphans.append(row)
+
+        while orphans:
+            row = orphans.pop()
+            if (
+                not row._table.is_root
+                and row.uuid not in deleted
+                and row.uuid in row._table.rows
+                and not self._strong_refs.get(row.uuid)
+            ):
+                deleted[row.uuid] = row
+                if row.uuid not in inserted:
+                    old_data.setdefault(row.uuid, (row, row._data))
+                self._link(row, row._data, None, orphans)
+
+        for row_uuid, row in deleted.items():
+            self._strong_refs.pop(row_uuid, None)
+            for referrer in self._weak_refs.pop(row_uuid, {}):
+                if referrer.uuid not in deleted:
+                    self._drop_weak_ref(txn, referrer, row)
+
+        self.change_seqno += 1
+        for row_uuid, row in inserted.items():
+            if row_uuid not in deleted:
+                self.notify(idl.ROW_CREATE, row)
+        for row_uuid, (row, old) in old_data.items():
+            if row_uuid in deleted:
+                continue
+            changes = {
+                column: value
+                for column, value in old.items()
+                if row._data.get(column, _MISSING) is not value
+                and row._data.get(column, _MISSING) != value
+            }
+            for column in row._data:
+                if column not in old:
+                    changes[column] = _default(row._table.columns[column])
+            if changes:
+                updates = Row(self, row._table, row.uuid, changes)
+                self.notify(idl.ROW_UPDATE, row, updates)
+        for row_uuid, row in deleted.items():
+            _unindex(row)
+            del row._table.rows[row_uuid]
+            if row_uuid not in inserted:
+                self.notify(idl.ROW_DELETE, row)
+
+    def _link(self, row, old, new, orphans):
+        """
+        Counts the references added and removed by a change of the row from
+        the old to the new data, either of them None if the row is created or
+        deleted. The rows no longer referenced by a strong reference are
+        added to orphans.
+        """
+        for name, column in row._table.columns.items():
+            key = column.type.key
+            old_value = old.get(name) if old else None
+            new_value = new.get(name) if new else None
+            # The columns not written in a transaction keep their values
+            if not key.is_ref() or old_value is new_value:
+                continue
+            strong = key.is_strong_ref()
+            refs = self._strong_refs if strong else self._weak_refs
+            old_targets = {id(target): target for target in old_value or []}
+            new_targets = {id(target): target for target in new_value or []}
+            for target_id in new_targets.keys() - old_targets.keys():
+                target = new_targets[target_id]
+                referrers = refs.setdefault(target.uuid, {})
+                referrers[row] = referrers.get(row, 0) + 1
+            for target_id in old_targets.keys() - new_targets.keys():
+                target = old_targets[target_id]
+                referrers = refs.get(target.uuid, {})
+                count = referrers.pop(row, 0) - 1
+                if count > 0:
+                    referrers[row] = count
+                elif not referrers:
+                    refs.pop(target.uuid, None)
+                    if strong:
+                        orphans.append(target)
+
+    def _drop_weak_ref(self, txn, referrer, target):
+        txn.save(referrer)
+        for name, column in referrer._table.columns.items():
+            if column.type.key.is_weak_ref() and name in referrer._data:
+                referrer._data[name] = [
+                    value
+                    for value in referrer._data[name]
+                    if value.uuid != target.uuid
+                ]
+
+
+class Connection(object):
+    """
+    Stands in for ovsdbapp's Connection. The transactions are run by the
+    thread committing them, one at a time.
+    """
+
+    def __init__(self, idl, timeout):
+        self.idl = idl
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        self.is_running = False
+
+    def start(self):
+        self.is_running = True
+
+    def queue_txn(self, txn):
+        with self.lock:
+            try:
+                result = self.idl.run_transaction(txn)
+            except Exception as e:
+                result = idlutils.ExceptionResult(
+                    ex=e, tb=traceback.format_exc()
+                )
+        txn.results.put(result)
+
+
+@contextlib.contextmanager
+def connected():
+    """
+    Makes ovn_connection connect to a new, empty in-memory Northbound for the
+    duration of the block. The connection, its index and its row listeners
+    are set up by ovn_connection as for a real IDL, which replicates only the
+    columns it registers.
+    """
+    created = []
+
+    def create_idl(remote, helper, leader_only=True):
+        created.append(Northbound(helper.get_idl_schema()))
+        return created[0]
+
+    # ovsdbapp keeps the first connection of an api class for all of its
+    # instances
+    with mock.patch.object(
+        OvnNbApiIdlImpl, '_ovsdb_connection', None
+    ), mock.patch.object(
+        ovn_connection.OvnTransactionManager, '_ovsdb_connection', None
+    ), mock.patch.multiple(
+        ovn_connection,
+        _api_impl=None,
+        _index=None,
+        _mac_allocator=None,
+        _table_versions=None,
+        _snapshot_writer=None,
+        _cluster_monitor=None,
+        _row_listeners=[],
+        ovn_snapshot_file=lambda: '',
+    ), mock.patch.object(
+        idlutils,
+        'get_schema_helper',
+        side_effect=lambda *args: idl.SchemaHelper(schema_json=SCHEMA),
+    ), mock.patch(
+        'ovsdbapp.backend.ovs_idl.connection.OvsdbIdl', side_effect=create_idl
+    ), mock.patch(
+        'ovsdbapp.backend.ovs_idl.connection.Connection', Connection
+    ):
+        ovn_connection.connect()
+        try:
+            yield created[0]
+        finally:
+            ovn_connection.close()
+
+
+class Row(idl.Row):
+    """
+    A row of the Northbound, read and written like a row of the IDL replica:
+    optional columns are lists, references are rows, and the values read are
+    copies, to be written back to change the row.
+    """
+
+    def __init__(self, northbound, table, row_uuid, row_data=None):
+        self.__dict__['uuid'] = row_uuid
+        self.__dict__['_northbound'] = northbound
+        self.__dict__['_table'] = table
+        self.__dict__['_data'] = row_data if row_data is not None else {}
+
+    def __getattr__(self, column_name):
+        try:
+            column = self._table.columns[column_name]
+        except KeyError:
+            raise AttributeError(column_name)
+        value = self._data.get(column_name, _MISSING)
+        if value is _MISSING:
+            return _default(column)
+        if isinstance(value, (list, dict)):
+            return type(value)(value)
+        return value
+
+    def __setattr__(self, column_name, value):
+        column = self._table.columns[column_name]
+        self._txn().write(self, column_name, self._to_datum(column, value))
+
+    def __str__(self):
+        return '{table}({uuid})'.format(table=self._table.name, uuid=self.uuid)
+
+    def addvalue(self, column_name, key):
+        values = getattr(self, column_name)
+        key = self._to_atom(self._table.columns[column_name].type.key, key)
+        if not _contains(values, key):
+            self._txn().write(self, column_name, values + [key])
+
+    def delvalue(self, column_name, key):
+        key = self._to_atom(self._table.columns[column_name].type.key, key)
+        values = getattr(self, column_name)
+        if _contains(values, key):
+            self._txn().write(
+                self, column_name, [v for v in values if not _same(v, key)]
+            )
+
+    def setkey(self, column_name, key, value):
+        values = getattr(self, column_name)
+        values[key] = value
+        self._txn().write(self, column_name, values)
+
+    def delkey(self, column_name, key, value=None):
+        values = getattr(self, column_name)
+        if key in values and (value is None or values[key] == value):
+            del values[key]
+            self._txn().write(self, column_name, values)
+
+    def verify(self, column_name):
+        pass
+
+    def delete(self):
+        self._txn().delete(self)
+
+    def _txn(self):
+        txn = self._northbound.txn
+        assert txn, 'Rows can only be changed in a transaction'
+        return txn
+
+    def _to_datum(self, column, value):
+        column_type = column.type
+        if column_type.is_map():
+            return dict(value)
+        if column_type.is_scalar():
+            return self._to_atom(column_type.key, value)
+        if value is None:
+            value = []
+        elif not isinstance(value, (list, tuple, set)):
+            value = [value]
+        return [self._to_atom(column_type.key, atom) for atom in value]
+
+    def _to_atom(self, base_type, value):
+        if not base_type.is_ref():
+            return value
+        if isinstance(value, rowview.RowView):
+            return value._row
+        if isinstance(value, idl.Row):
+            return value
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return self._northbound.tables[base_type.ref_table_name].rows[value]
+
+
+class _Transaction(object):
+    """
+    The changes of a transaction are applied to the rows and their indexes
+    right away, so the following commands of the transaction see them like
+    they do in the IDL, and are undone if the transaction is aborted.
+    """
+
+    def __init__(self, northbound):
+        self._northbound = northbound
+        # uuid -> row
+        self.inserted = {}
+        self.deleted = {}
+        # uuid -> (row, data of the row before the transaction)
+        self.old_data = {}
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.deleted or self.old_data)
+
+    def insert(self, table):
+        row = Row(self._northbound, table, uuid.uuid4())
+        table.rows[row.uuid] = row
+        self.inserted[row.uuid] = row
+        return row
+
+    def get_insert_uuid(self, row_uuid):
+        return row_uuid if row_uuid in self.inserted else None
+
+    def save(self, row):
+        if row.uuid not in self.inserted and row.uuid not in self.old_data:
+            self.old_data[row.uuid] = (row, row._data)
+            row.__dict__['_data'] = dict(row._data)
+
+    def write(self, row, column_name, value):
+        self.save(row)
+        index = row._table.rows.indexes.get(column_name)
+        if index:
+            index.discard(row._data.get(column_name), row)
+            index.add(value, row)
+        row._data[column_name] = value
+
+    def delete(self, row):
+        self.deleted[row.uuid] = row
+
+    def abort(self):
+        for row, old in self.old_data.values():
+            _unindex(row)
+            row.__dict__['_data'] = old
+            _index(row)
+        for row_uuid, row in self.inserted.items():
+            _unindex(row)
+            del row._table.rows[row_uuid]
+
+
+class _Rows(dict):
+    """
+    The rows of a table by uuid, with the single column indexes ovsdbapp
+    creates and looks rows up by.
+    """
+
+    IndexEntry = types.SimpleNamespace
+
+    def __init__(self):
+        super(_Rows, self).__init__()
+        self.indexes = {}
+
+    def index_create(self, name):
+        if name in self.indexes:
+            raise ValueError('Index {} already exists'.format(name))
+        return _IndexBuilder(self.indexes)
+
+
+class _IndexBuilder(object):
+    def __init__(self, indexes):
+        self._indexes = indexes
+
+    def add_column(self, column):
+        self._indexes[column] = _Index(column)
+
+
+class _Index(object):
+    def __init__(self, column):
+        self._column = column
+        # value -> {uuid: row}
+        self._rows = {}
+
+    def add(self, value, row):
+        self._rows.setdefault(value, {})[row.uuid] = row
+
+    def discard(self, value, row):
+        rows = self._rows.get(value, {})
+        rows.pop(row.uuid, None)
+        if not rows:
+            self._rows.pop(value, None)
+
+    def irange(self, minimum, maximum):
+        return iter(
+            list(self._rows.get(getattr(minimum, self._column), {}).values())
+        )
+
+
+_MISSING = object()
+
+
+def _default(column):
+    column_type = column.type
+    if column_type.is_map():
+        return {}
+    if column_type.is_scalar():
+        return data.Atom.default(column_type.key.type).value
+    return []
+
+
+def _contains(values, value):
+    if isinstance(value, Row):
+        return any(map(operator.is_, values, itertools.repeat(value)))
+    return value in values
+
+
+def _same(value, other):
+    # There is a single Row for every row, so the rows can be compared by
+    # identity, which is much cheaper than by uuid
+    return value is other if isinstance(other, Row) else value == other
+
+
+def _index(row):
+    for column, index in row._table.rows.indexes.items():
+        index.add(row._data.get(column), row)
+
+
+def _unindex(row):
+    for column, index in row._table.rows.indexes.items():
+        index.discard(row._data.get(column), row)
@@ -0,0 +1,90 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+from auth.plugins.ovirt import engine_session
+
+ENGINE_URL = 'http://test.com/ovirt-engine'
+TOKEN_URL = 'http://test.com/ovirt-engine/sso/oauth/token'
+API_URL = 'http://test.com/ovirt-engine/api/users'
+OTHER_ENGINE_URL = 'http://other.com/ovirt-engine/api/users'
+HTTPS_URL = 'https://test.com/ovirt-engine/api/users'
+CA_FILE = '/etc/pki/ovirt-engine/ca.pem'
+
+
+@pytest.fixture(autouse=True)
+def sessions():
+    engine_session.close()
+    yield
+    engine_session.close()
+
+
+class TestEngineSession(object):
+    def test_session_shared_by_engine_url(self):
+        session = engine_session._session(TOKEN_URL, CA_FILE)
+        assert engine_session._session(API_URL, CA_FILE) is session
+        assert engine_session._session(OTHER_ENGINE_URL, CA_FILE) is not (
+            session
+        )
+        assert engine_session._session(API_URL, None) is not session
+
+    def test_requests_sent_by_session(self, requests_mock):
+        requests_mock.register_uri('POST', TOKEN_URL, text='token')
+        requests_mock.register_uri('GET', API_URL, text='users')
+
+        assert engine_session.post(TOKEN_URL, None).text == 'token'
+        assert engine_session.get(API_URL, None).text == 'users'
+
+    def test_cookies_not_kept(self, requests_mock):
+        requests_mock.register_uri(
+            'GET', API_URL, text='users', cookies={'JSESSIONID': 'user'}
+        )
+
+        engine_session.get(API_URL, None)
+        engine_session.get(API_URL, None)
+
+        assert 'Cookie' not in requests_mock.last_request.headers
+        assert not engine_session._session(API_URL, None).cookies
+
+    @mock.patch(
+        'auth.plugins.ovirt.engine_session._pool_size', return_value=3
+    )
+    def test_pool_size(self, mock_pool_size):
+        adapter = engine_session._session(API_URL, None).get_adapter(API_URL)
+        assert adapter._pool_maxsize == 3
+
+    @mock.patch('auth.plugins.ovirt.engine_session.os.path.isfile')
+    @mock.patch('auth.plugins.ovirt.engine_session.ssl.create_default_context')
+    def test_ca_file_loaded_once(self, mock_create_context, mock_isfile):
+        mock_isfile.return_value = True
+        session = engine_session._session(HTTPS_URL, CA_FILE)
+        engine_session._session(HTTPS_URL, CA_FILE)
+
+        mock_create_context.assert_called_once_with(cafile=CA_FILE)
+        adapter = session.get_adapter(HTTPS_URL)
+        assert adapter.poolmanager.connection_pool_kw['ssl_context'] is (
+            mock_create_context.return_value
+        )
+        request = mock.Mock(url=HTTPS_URL)
+        _, pool_kwargs = adapter.build_connection_pool_key_attributes(
+            request, CA_FILE
+        )
+        assert 'ca_certs' not in pool_kwargs
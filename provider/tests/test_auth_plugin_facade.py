@@ -0,0 +1,172 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import pytest
+
+import auth.core
+from auth import Timeout
+from auth import Unauthorized
+from auth.plugin_facade import CachingPlugin
+
+TOKEN = 'the_token'
+OTHER_TOKEN = 'other_token'
+TTL = 60
+NEGATIVE_TTL = 5
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def plugin():
+    return mock.Mock()
+
+
+@pytest.fixture
+def caching_plugin(plugin, clock):
+    return CachingPlugin(
+        plugin, max_size=2, ttl=TTL, negative_ttl=NEGATIVE_TTL, clock=clock
+    )
+
+
+def test_valid_token_is_cached(caching_plugin, plugin, clock):
+    plugin.validate_token.return_value = True
+    assert caching_plugin.validate_token(TOKEN)
+    clock.now += TTL - 1
+    assert caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 1
+
+    clock.now += 1
+    assert caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 2
+    assert caching_plugin.stats() == {
+        'size': 1,
+        'hits': 1,
+        'misses': 2,
+        'collapsed': 0,
+    }
+
+
+def test_rejected_token_is_cached_shorter(caching_plugin, plugin, clock):
+    plugin.validate_token.return_value = False
+    assert not caching_plugin.validate_token(TOKEN)
+    assert not caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 1
+
+    clock.now += NEGATIVE_TTL
+    plugin.validate_token.return_value = True
+    assert caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 2
+
+
+def test_unauthorized_is_cached(caching_plugin, plugin):
+    plugin.validate_token.side_effect = Unauthorized('expired')
+    errors = []
+    for _ in range(2):
+        with pytest.raises(Unauthorized, match='expired') as error:
+            caching_plugin.validate_token(TOKEN)
+        errors.append(error.value)
+    assert plugin.validate_token.call_count == 1
+    assert errors[0] is not errors[1]
+
+
+def test_engine_errors_are_not_cached(caching_plugin, plugin):
+    plugin.validate_token.side_effect = [Timeout(), True]
+    with pytest.raises(Timeout):
+        caching_plugin.validate_token(TOKEN)
+    assert caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 2
+
+
+def test_least_recently_used_token_is_dropped(caching_plugin, plugin):
+    plugin.validate_token.return_value = True
+    caching_plugin.validate_token(TOKEN)
+    caching_plugin.validate_token(OTHER_TOKEN)
+    caching_plugin.validate_token(TOKEN)
+    caching_plugin.validate_token('third_token')
+    assert caching_plugin.stats()['size'] == 2
+
+    caching_plugin.validate_token(TOKEN)
+    assert plugin.validate_token.call_count == 3
+    caching_plugin.validate_token(OTHER_TOKEN)
+    assert plugin.validate_token.call_count == 4
+
+
+def test_concurrent_validations_are_collapsed(caching_plugin, plugin):
+    started = threading.Event()
+    release = threading.Event()
+
+    def validate_token(token):
+        started.set()
+        release.wait(5)
+        return True
+
+    plugin.validate_token.side_effect = validate_token
+    results = []
+
+    def validate():
+        results.append(caching_plugin.validate_token(TOKEN))
+
+    threads = [threading.Thread(target=validate) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while caching_plugin.stats()['collapsed'] < 3:
+        release.wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True] * 4
+    assert plugin.validate_token.call_count == 1
+
+
+def test_tokens_are_not_kept_in_clear(caching_plugin, plugin):
+    plugin.validate_token.return_value = True
+    caching_plugin.validate_token(TOKEN)
+    assert TOKEN not in caching_plugin._outcomes
+
+
+@mock.patch('auth.core.auth_token_cache_size', return_value=10)
+@mock.patch('auth.core._load_plugin')
+def test_init_caches_validations(mock_load_plugin, mock_cache_size):
+    auth.core.init()
+    assert isinstance(auth.core.plugin, CachingPlugin)
+    assert auth.core.plugin.plugin == mock_load_plugin.return_value
+
+
+@mock.patch('auth.core.auth_token_cache_size', return_value=0)
+@mock.patch('auth.core._load_plugin')
+def test_init_without_cache(mock_load_plugin, mock_cache_size):
+    auth.core.init()
+    assert auth.core.plugin == mock_load_plugin.return_value
@@ -0,0 +1,161 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import threading
+
+import mock
+from ovs.db.idl import Idl
+import pytest
+
+import constants as ovnconst
+import metrics
+from ovndb.cluster_monitor import ClusterMonitor
+from ovndb.cluster_monitor import FOLLOWER
+from ovndb.cluster_monitor import LEADER
+from ovndb.cluster_monitor import server_state
+
+MAX_STALENESS = 5
+REMOTE = 'tcp:192.168.0.1:6641'
+OTHER_REMOTE = 'tcp:192.168.0.2:6641'
+
+
+class FakeIdl(object):
+    IDL_S_MONITORING = Idl.IDL_S_MONITORING
+
+    def __init__(self, remote=REMOTE, index=None, model='clustered'):
+        self.remote = remote
+        self.state = self.IDL_S_MONITORING
+        database = mock.Mock(
+            model=model, index=[index] if index is not None else []
+        )
+        database.name = ovnconst.OVN_NORTHBOUND
+        self.server_tables = {'Database': mock.Mock(rows={1: database})}
+
+    @property
+    def index(self):
+        return self.server_tables['Database'].rows[1].index[0]
+
+    @index.setter
+    def index(self, index):
+        self.server_tables['Database'].rows[1].index = [index]
+
+    def session_name(self):
+        return self.remote
+
+
+def _connection(idl):
+    return mock.Mock(idl=idl, lock=threading.RLock())
+
+
+@pytest.fixture
+def clock():
+    with mock.patch('ovndb.cluster_monitor.time.monotonic') as monotonic:
+        monotonic.return_value = 100.0
+        yield monotonic
+
+
+@pytest.fixture
+def replicas(clock):
+    leader = FakeIdl(index=10)
+    follower = FakeIdl(OTHER_REMOTE, index=10)
+    monitor = ClusterMonitor(MAX_STALENESS)
+    monitor.add_replica(LEADER, _connection(leader))
+    monitor.add_replica(FOLLOWER, _connection(follower))
+    return monitor, leader, follower
+
+
+class TestServerState(object):
+    def test_clustered(self):
+        assert server_state(FakeIdl(index=7)) == (REMOTE, True, 7)
+
+    def test_standalone(self):
+        assert server_state(FakeIdl(model='standalone')) == (
+            REMOTE,
+            True,
+            None,
+        )
+
+    def test_not_synced(self):
+        idl = FakeIdl(index=7)
+        idl.state = Idl.IDL_S_SERVER_SCHEMA_REQUESTED
+        assert server_state(idl) == (REMOTE, False, None)
+
+
+class TestClusterMonitor(object):
+    def test_follower_in_sync_is_fresh(self, replicas):
+        monitor, leader, follower = replicas
+        assert monitor.is_fresh(FOLLOWER)
+
+    def test_follower_fresh_within_max_staleness(self, replicas, clock):
+        monitor, leader, follower = replicas
+        clock.return_value += MAX_STALENESS - 1
+        leader.index = 20
+        monitor.check()
+
+        assert monitor.is_fresh(FOLLOWER)
+
+        clock.return_value += 2
+        monitor.check()
+
+        assert not monitor.is_fresh(FOLLOWER)
+
+        follower.index = 20
+        monitor.check()
+
+        assert monitor.is_fresh(FOLLOWER)
+
+    def test_follower_not_fresh_without_leader(self, replicas, clock):
+        monitor, leader, follower = replicas
+        leader.state = Idl.IDL_S_SERVER_SCHEMA_REQUESTED
+        clock.return_value += MAX_STALENESS + 1
+        monitor.check()
+
+        assert not monitor.is_fresh(FOLLOWER)
+
+    def test_follower_of_standalone_db_not_fresh(self, clock):
+        monitor = ClusterMonitor(MAX_STALENESS)
+        monitor.add_replica(LEADER, _connection(FakeIdl(model='standalone')))
+        monitor.add_replica(FOLLOWER, _connection(FakeIdl(model='standalone')))
+
+        assert not monitor.is_fresh(FOLLOWER)
+
+    @mock.patch('ovndb.cluster_monitor.metrics.OVSDB_CONNECTIONS')
+    def test_failover_counted(self, mock_connections, replicas):
+        monitor, leader, follower = replicas
+        mock_connections.reset_mock()
+        leader.state = Idl.IDL_S_SERVER_SCHEMA_REQUESTED
+        monitor.check()
+        leader.state = Idl.IDL_S_MONITORING
+        leader.remote = OTHER_REMOTE
+        monitor.check()
+
+        mock_connections.inc.assert_called_once_with((LEADER,))
+        assert monitor.report() == {
+            'leader_synced': 1,
+            'leader_index': 10,
+            'follower_synced': 1,
+            'follower_index': 10,
+            'follower_fresh': 1,
+        }
+
+    def test_metrics_rendered(self, replicas):
+        assert any(
+            line.startswith('ovirt_provider_ovn_ovsdb_connections_total{')
+            for line in metrics.render().splitlines()
+        )
@@ -0,0 +1,404 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import threading
+
+import mock
+from ovs.db import idl
+from ovsdbapp.backend.ovs_idl.transaction import Transaction
+import pytest
+
+import constants as ovnconst
+import ovn_connection
+from handlers.base_handler import Response
+from handlers.neutron import NeutronHandler
+from handlers.selecting_handler import rest
+from ovndb.group_commit import GroupCommitter
+from ovndb.group_commit import StaleTransaction
+
+TIMEOUT = 10
+
+
+class FakeIdl(object):
+    change_seqno = 0
+
+    def __init__(self):
+        self.commits = []
+
+
+class FakeIdlTransaction(object):
+    SUCCESS = idl.Transaction.SUCCESS
+    UNCHANGED = idl.Transaction.UNCHANGED
+    ERROR = idl.Transaction.ERROR
+    TRY_AGAIN = idl.Transaction.TRY_AGAIN
+    NOT_LOCKED = idl.Transaction.NOT_LOCKED
+    ABORTED = idl.Transaction.ABORTED
+
+    def __init__(self, ovsidl):
+        self._idl = ovsidl
+        self._txn_rows = {}
+
+    def abort(self):
+        pass
+
+    def commit_block(self):
+        self._idl.commits.append(set(self._txn_rows))
+        if any(row.invalid for row in self._txn_rows.values()):
+            return self.ERROR
+        return self.SUCCESS
+
+    def get_error(self):
+        return 'constraint violation'
+
+
+class FakeConnection(object):
+    timeout = TIMEOUT
+
+    def queue_txn(self, txn):
+        txn.results.put(txn.do_commit())
+
+
+class Command(object):
+    def __init__(self, *rows):
+        self.rows = rows
+        self.result = None
+
+    def run_idl(self, txn):
+        for row in self.rows:
+            if isinstance(row, Exception):
+                raise row
+            txn._txn_rows[row.uuid] = row
+        self.result = [row.uuid for row in self.rows]
+
+    def post_commit(self, txn):
+        pass
+
+
+def _row(row_uuid, table=ovnconst.TABLE_LS, invalid=False):
+    row = mock.Mock(uuid=row_uuid, _data={}, invalid=invalid)
+    row._table.name = table
+    return row
+
+
+@pytest.fixture
+def ovsidl():
+    with mock.patch('ovs.db.idl.Transaction', FakeIdlTransaction):
+        yield FakeIdl()
+
+
+@pytest.fixture
+def committer():
+    index = mock.Mock()
+    index.get_ls_by_lsp.return_value = None
+    return GroupCommitter(FakeConnection(), index, 10, 0.01)
+
+
+def _transaction(ovsidl, committer, *rows):
+    tx = Transaction(
+        mock.Mock(idl=ovsidl), committer, check_error=True, log_errors=False
+    )
+    tx.add(Command(*rows))
+    return tx
+
+
+def _result(tx):
+    result = tx.results.get_nowait()
+    if hasattr(result, 'ex'):
+        raise result.ex
+    return result
+
+
+class TestGroupCommitter(object):
+    def test_disjoint_transactions_grouped(self, ovsidl, committer):
+        txns = [
+            _transaction(ovsidl, committer, _row(row_uuid))
+            for row_uuid in range(3)
+        ]
+
+        assert committer._commit(txns) == []
+
+        assert ovsidl.commits == [{0, 1, 2}]
+        assert [_result(tx) for tx in txns] == [[[0]], [[1]], [[2]]]
+        assert not committer.pending()
+
+    def test_conflicting_transaction_deferred(self, ovsidl, committer):
+        first = _transaction(ovsidl, committer, _row(1))
+        second = _transaction(ovsidl, committer, _row(1), _row(2))
+
+        assert committer._commit([first, second]) == [second]
+        assert committer._commit([second]) == []
+
+        assert ovsidl.commits == [{1}, {1, 2}]
+        assert _result(first) == [[1]]
+        assert _result(second) == [[1, 2]]
+
+    def test_ports_of_same_switch_conflict(self, ovsidl, committer):
+        committer._index.get_ls_by_lsp.return_value = _row('network')
+        first = _transaction(
+            ovsidl, committer, _row(1, table=ovnconst.TABLE_LSP)
+        )
+        second = _transaction(
+            ovsidl, committer, _row(2, table=ovnconst.TABLE_LSP)
+        )
+
+        assert committer._commit([first, second]) == [second]
+
+    def test_new_rows_do_not_conflict(self, ovsidl, committer):
+        new_row = _row(1)
+        new_row._data = None
+        txns = [_transaction(ovsidl, committer, new_row) for _ in range(2)]
+
+        assert committer._commit(txns) == []
+        assert len(ovsidl.commits) == 1
+
+    def test_stale_transaction_rejected(self, ovsidl, committer):
+        first = _transaction(ovsidl, committer, _row(1))
+        stale = _transaction(ovsidl, committer, _row(1))
+        stale.pending_when_validated = frozenset([first])
+        other = _transaction(ovsidl, committer, _row(2))
+        other.pending_when_validated = frozenset([first])
+
+        assert committer._commit([first, stale, other]) == []
+
+        assert ovsidl.commits == [{1, 2}]
+        with pytest.raises(StaleTransaction):
+            _result(stale)
+        assert _result(other) == [[2]]
+
+    def test_stale_after_previous_batch(self, ovsidl, committer):
+        first = _transaction(ovsidl, committer, _row(1))
+        committer._commit([first])
+        stale = _transaction(ovsidl, committer, _row(1))
+        stale.pending_when_validated = frozenset([first])
+
+        committer._commit([stale])
+
+        with pytest.raises(StaleTransaction):
+            _result(stale)
+
+    def test_failed_group_committed_one_at_a_time(self, ovsidl, committer):
+        valid = _transaction(ovsidl, committer, _row(1))
+        invalid = _transaction(ovsidl, committer, _row(2, invalid=True))
+
+        committer._commit([valid, invalid])
+
+        assert ovsidl.commits == [{1, 2}, {1}, {2}]
+        assert _result(valid) == [[1]]
+        with pytest.raises(RuntimeError, match='constraint violation'):
+            _result(invalid)
+
+    def test_failing_command_committed_alone(self, ovsidl, committer):
+        valid = _transaction(ovsidl, committer, _row(1))
+        failing = _transaction(ovsidl, committer, ValueError('bad value'))
+
+        committer._commit([valid, failing])
+
+        assert _result(valid) == [[1]]
+        with pytest.raises(ValueError, match='bad value'):
+            _result(failing)
+
+    def test_wait_for_pending_transactions(self, ovsidl, committer):
+        pending = _transaction(ovsidl, committer, _row(1))
+        committer.queue_txn(pending)
+
+        assert not committer.wait(committer.pending(), timeout=0.01)
+        committer._commit([pending])
+        assert committer.wait([pending], timeout=0.01)
+
+    def test_concurrent_commits_grouped(self, ovsidl, committer):
+        committer._wait = TIMEOUT
+        committer._max_batch = 3
+        committer.start()
+        txns = [
+            _transaction(ovsidl, committer, _row(row_uuid))
+            for row_uuid in range(3)
+        ]
+        results = {}
+
+        def commit(tx):
+            results[tx] = tx.commit()
+
+        threads = [threading.Thread(target=commit, args=(tx,)) for tx in txns]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        committer.stop()
+
+        assert ovsidl.commits == [{0, 1, 2}]
+        assert [results[tx] for tx in txns] == [[[0]], [[1]], [[2]]]
+
+
+class TestWriteLock(object):
+    def test_released_while_committing(self, ovsidl, committer):
+        pending = _transaction(ovsidl, committer, _row(1))
+        committer.queue_txn(pending)
+        tx = _transaction(ovsidl, committer, _row(2))
+        committer.connection = mock.Mock(
+            queue_txn=lambda batch: batch.results.put(
+                ovn_connection._write_lock.locked() or batch.do_commit()
+            )
+        )
+        committer.queue_txn = lambda txn: committer._commit([txn])
+
+        with mock.patch('ovn_connection._group_committer', committer):
+            with ovn_connection.write_lock():
+                result = ovn_connection._commit(tx)
+                assert ovn_connection._write_lock.locked()
+
+        assert result == [[2]]
+        assert tx.pending_when_validated == ()
+        assert not ovn_connection._write_lock.locked()
+
+
+class AddIpCommand(Command):
+    """
+    Adds the ip to the network of the replica once committed, like the ports
+    of a network show up in the replica once added
+    """
+
+    def __init__(self, network, ip):
+        super(AddIpCommand, self).__init__(network, _new_row(ip))
+        self.network = network
+        self.ip = ip
+
+    def post_commit(self, txn):
+        self.network.ips.append(self.ip)
+
+
+def _new_row(row_uuid):
+    row = _row(row_uuid, table=ovnconst.TABLE_LSP)
+    row._data = None
+    return row
+
+
+def _add_ports(ovsidl, committer, requests, start=None):
+    """
+    Serves a request adding a port to the same network for each of the
+    requests, from concurrent threads started by start(), and returns the
+    ips the network got, the requests of the validations and the ip of the
+    port of each request
+    """
+    network = _row('network')
+    network.ips = []
+    validations = []
+    responses = {}
+    results = {}
+
+    @rest('POST', 'ports', responses)
+    def add_port(nb_db, content, parameters):
+        # Picking the next free ip is check-then-set
+        ip = len(network.ips)
+        validations.append(content)
+        tx = Transaction(
+            mock.Mock(idl=ovsidl),
+            committer,
+            check_error=True,
+            log_errors=False,
+        )
+        tx.request = content
+        tx.add(AddIpCommand(network, ip))
+        ovn_connection._commit(tx)
+        return Response({'ip': ip})
+
+    def add(request):
+        handler = NeutronHandler(None, None, None)
+        handler.headers = {}
+        handler.path = '/v2.0/ports'
+        results[request] = handler.handle_request('POST', ['ports'], request)
+
+    def start_all(threads):
+        for thread in threads:
+            thread.start()
+
+    committer.start()
+    with mock.patch(
+        'handlers.neutron.NeutronHandler._run_server', lambda *args: None
+    ), mock.patch(
+        'handlers.neutron_responses._responses', responses
+    ), mock.patch(
+        'handlers.neutron.validate_token', return_value=True
+    ), mock.patch(
+        'handlers.neutron.NeutronApi'
+    ), mock.patch(
+        'ovn_connection._group_committer', committer
+    ):
+        threads = [
+            threading.Thread(target=add, args=(request,))
+            for request in requests
+        ]
+        (start or start_all)(threads)
+        for thread in threads:
+            thread.join()
+    committer.stop()
+    return (
+        network.ips,
+        validations,
+        {request: result.body['ip'] for request, result in results.items()},
+    )
+
+
+class TestConcurrentRequests(object):
+    def test_same_network_adds_validated_at_most_twice(
+        self, ovsidl, committer
+    ):
+        requests = list(range(8))
+
+        ips, validations, results = _add_ports(ovsidl, committer, requests)
+
+        assert sorted(ips) == requests
+        assert sorted(results.values()) == requests
+        assert all(validations.count(request) <= 2 for request in requests)
+
+    def test_add_validated_before_previous_one_is_queued(
+        self, ovsidl, committer
+    ):
+        # The write lock is released by the first request before its
+        # transaction is queued by commit(), and the second request is
+        # validated in between
+        first_released = threading.Event()
+        second_validated = threading.Event()
+        queue_txn = committer.queue_txn
+
+        def delayed_queue_txn(txn):
+            if txn.request == 0:
+                first_released.set()
+                second_validated.wait(1)
+            queue_txn(txn)
+
+        committer.queue_txn = delayed_queue_txn
+        original_commit = ovn_connection._commit
+
+        def commit(tx):
+            if tx.request == 1:
+                second_validated.set()
+            return original_commit(tx)
+
+        def start(threads):
+            threads[0].start()
+            first_released.wait(TIMEOUT)
+            threads[1].start()
+
+        with mock.patch('ovn_connection._commit', commit):
+            ips, validations, results = _add_ports(
+                ovsidl, committer, [0, 1], start
+            )
+
+        assert sorted(ips) == [0, 1]
+        assert sorted(results.values()) == [0, 1]
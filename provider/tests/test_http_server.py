@@ -0,0 +1,568 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import json
+import os
+import socket
+import ssl
+import subprocess
+import threading
+import time
+
+import mock
+import pytest
+
+from six.moves import http_client
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler
+
+import metrics
+
+from handlers.base_handler import Response
+from handlers.response_cache import ResponseCache
+from handlers.selecting_handler import SelectingHandler
+from handlers.selecting_handler import cached
+from handlers.selecting_handler import rest
+from handlers.selecting_handler import versioned_by
+from http_server import HTTPServerIPv6
+from http_server import PooledHTTPServerIPv6
+from http_server import create_server
+from http_server import create_ssl_context
+from http_server import ssl_wrap
+from profiler import PROFILE_HEADER
+from profiler import RequestProfiler
+
+
+response_handlers = {}
+
+
+@rest('GET', 'items', response_handlers)
+def get_items(content, parameters):
+    return Response({'items': [{'id': 1}]})
+
+
+STREAMED_ITEMS = [{'id': i, 'name': 'item{}'.format(i)} for i in range(100)]
+
+
+@rest('GET', 'streamed', response_handlers)
+def get_streamed_items(content, parameters):
+    return Response({'items': iter(STREAMED_ITEMS), 'count': 100})
+
+
+versioned_calls = []
+
+
+@rest('GET', 'versioned', response_handlers)
+@versioned_by('items')
+def get_versioned_items(content, parameters):
+    versioned_calls.append(1)
+    return Response({'items': [{'id': 1}]})
+
+
+@rest('GET', 'cached', response_handlers)
+@versioned_by('items')
+@cached
+def get_cached_items(content, parameters):
+    versioned_calls.append(1)
+    return Response({'items': iter(STREAMED_ITEMS)})
+
+
+class PooledHTTPServerIPv4(PooledHTTPServerIPv6):
+    address_family = socket.AF_INET
+
+
+class ItemsHandler(SelectingHandler):
+
+    version = '1'
+
+    def call_response_handler(self, response_handler, content, parameters):
+        return response_handler(content, parameters)
+
+    def get_version(self, sources):
+        assert sources == ('items',)
+        return ItemsHandler.version
+
+    @staticmethod
+    def get_responses():
+        return response_handlers
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BlockingHandler(BaseHTTPRequestHandler):
+
+    started = None
+    release = None
+
+    def do_GET(self):
+        BlockingHandler.started.release()
+        BlockingHandler.release.wait(5)
+        self.send_response(http_client.OK)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def blocking_handler():
+    BlockingHandler.started = threading.Semaphore(0)
+    BlockingHandler.release = threading.Event()
+    yield BlockingHandler
+    BlockingHandler.release.set()
+
+
+def _serve(workers, max_queued):
+    server = PooledHTTPServerIPv4(
+        ('127.0.0.1', 0), BlockingHandler, workers, max_queued
+    )
+    threading.Thread(target=server.serve_forever).start()
+    return server
+
+
+def _request_in_background(server, responses):
+    def request():
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', server.server_address[1], timeout=5
+        )
+        connection.request('GET', '/')
+        responses.append(connection.getresponse().status)
+        connection.close()
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    return thread
+
+
+def _stop(server, threads):
+    BlockingHandler.release.set()
+    for thread in threads:
+        thread.join(5)
+    server.shutdown()
+    server.server_close()
+
+
+class TestPooledHTTPServer(object):
+    def test_requests_are_served_concurrently(self, blocking_handler):
+        server = _serve(workers=2, max_queued=0)
+        responses = []
+        threads = [_request_in_background(server, responses) for _ in (1, 2)]
+
+        assert blocking_handler.started.acquire(timeout=5)
+        assert blocking_handler.started.acquire(timeout=5)
+        assert server.stats()['active'] == 2
+
+        _stop(server, threads)
+        assert responses == [http_client.OK, http_client.OK]
+        stats = server.stats()
+        assert stats['served'] == 2
+        assert stats['active'] == 0
+        assert stats['rejected'] == 0
+
+    def test_requests_above_limit_are_rejected(self, blocking_handler):
+        server = _serve(workers=1, max_queued=0)
+        responses = []
+        threads = [_request_in_background(server, responses)]
+        assert blocking_handler.started.acquire(timeout=5)
+
+        rejected = _request_in_background(server, responses)
+        rejected.join(5)
+
+        assert responses == [http_client.SERVICE_UNAVAILABLE]
+        assert server.stats()['rejected'] == 1
+        _stop(server, threads)
+        assert responses[1] == http_client.OK
+
+    def test_queued_requests_wait_for_a_worker(self, blocking_handler):
+        server = _serve(workers=1, max_queued=1)
+        responses = []
+        threads = [_request_in_background(server, responses)]
+        assert blocking_handler.started.acquire(timeout=5)
+        threads.append(_request_in_background(server, responses))
+
+        def queued():
+            return server.stats()['queued'] == 1
+
+        assert _wait_for(queued)
+        _stop(server, threads)
+        assert responses == [http_client.OK, http_client.OK]
+        assert server.stats()['rejected'] == 0
+
+
+def _wait_for(condition, attempts=500):
+    event = threading.Event()
+    for _ in range(attempts):
+        if condition():
+            return True
+        event.wait(0.01)
+    return False
+
+
+@pytest.mark.parametrize(
+    'workers,server_class',
+    [(0, HTTPServerIPv6), (4, PooledHTTPServerIPv6)],
+)
+def test_create_server(workers, server_class):
+    try:
+        server = create_server(('', 0), BlockingHandler, workers, 2)
+    except socket.error:
+        pytest.skip('IPv6 is not available')
+    try:
+        assert type(server) is server_class
+    finally:
+        server.server_close()
+
+
+@pytest.fixture
+def items_server():
+    server = PooledHTTPServerIPv4(
+        ('127.0.0.1', 0),
+        ItemsHandler,
+        workers=2,
+        max_queued=2,
+        keep_alive_timeout=5,
+        keep_alive_max_requests=3,
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+class TestKeepAlive(object):
+    def test_connection_is_reused(self, items_server):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', items_server.server_address[1], timeout=5
+        )
+        for _ in range(2):
+            connection.request('GET', '/v2.0/items')
+            response = connection.getresponse()
+            body = response.read()
+            assert response.status == http_client.OK
+            assert int(response.getheader('Content-Length')) == len(body)
+            assert response.getheader('Connection') is None
+        connection.close()
+        assert items_server.stats()['rejected'] == 0
+
+    def test_errors_keep_connection_open(self, items_server):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', items_server.server_address[1], timeout=5
+        )
+        connection.request('GET', '/v2.0/unknown')
+        response = connection.getresponse()
+        body = response.read()
+        assert response.status == http_client.NOT_FOUND
+        assert int(response.getheader('Content-Length')) == len(body)
+        assert response.getheader('Connection') is None
+
+        connection.request('GET', '/v2.0/items')
+        assert connection.getresponse().status == http_client.OK
+        connection.close()
+
+    def test_connection_closed_after_max_requests(self, items_server):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', items_server.server_address[1], timeout=5
+        )
+        headers = []
+        for _ in range(3):
+            connection.request('GET', '/v2.0/items')
+            response = connection.getresponse()
+            response.read()
+            headers.append(response.getheader('Connection'))
+        assert headers == [None, None, 'close']
+        connection.close()
+
+    def test_idle_connection_frees_worker_for_queued_one(self):
+        server = PooledHTTPServerIPv4(
+            ('127.0.0.1', 0),
+            ItemsHandler,
+            workers=1,
+            max_queued=1,
+            keep_alive_timeout=5,
+        )
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            idle = http_client.HTTPConnection(
+                '127.0.0.1', server.server_address[1], timeout=5
+            )
+            idle.request('GET', '/v2.0/items')
+            idle.getresponse().read()
+            other = http_client.HTTPConnection(
+                '127.0.0.1', server.server_address[1], timeout=5
+            )
+            start = time.monotonic()
+            other.request('GET', '/v2.0/items')
+
+            assert other.getresponse().status == http_client.OK
+            assert time.monotonic() - start < 1
+            other.close()
+            idle.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join(5)
+
+
+@pytest.fixture
+def ssl_certificate(tmpdir):
+    key_file = os.path.join(str(tmpdir), 'key.pem')
+    cert_file = os.path.join(str(tmpdir), 'cert.pem')
+    try:
+        subprocess.check_call(
+            [
+                'openssl',
+                'req',
+                '-x509',
+                '-newkey',
+                'rsa:2048',
+                '-nodes',
+                '-subj',
+                '/CN=localhost',
+                '-days',
+                '1',
+                '-keyout',
+                key_file,
+                '-out',
+                cert_file,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip('openssl is not available')
+    return key_file, cert_file
+
+
+def test_tls_sessions_are_resumed(items_server, ssl_certificate):
+    key_file, cert_file = ssl_certificate
+    ssl_wrap(
+        items_server,
+        create_ssl_context(key_file, cert_file, 'HIGH:!aNULL'),
+    )
+    client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+
+    sessions = []
+    for _ in range(2):
+        sock = socket.create_connection(
+            ('127.0.0.1', items_server.server_address[1]), timeout=5
+        )
+        tls_sock = client_context.wrap_socket(
+            sock, session=sessions[-1] if sessions else None
+        )
+        tls_sock.sendall(b'GET /v2.0/items HTTP/1.1\r\nHost: x\r\n\r\n')
+        assert tls_sock.recv(1024).startswith(b'HTTP/1.1 200')
+        sessions.append(tls_sock.session)
+        reused = tls_sock.session_reused
+        tls_sock.close()
+    assert reused
+
+
+class TestStreamedResponse(object):
+    EXPECTED = json.dumps({'items': STREAMED_ITEMS, 'count': 100})
+
+    def _get(self, server, version='HTTP/1.1'):
+        http_client.HTTPConnection._http_vsn_str = version
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', server.server_address[1], timeout=5
+        )
+        try:
+            connection.request('GET', '/v2.0/streamed')
+            response = connection.getresponse()
+            return response, response.read().decode()
+        finally:
+            http_client.HTTPConnection._http_vsn_str = 'HTTP/1.1'
+            connection.close()
+
+    def test_small_response_is_sent_with_length(self, items_server):
+        response, body = self._get(items_server)
+        assert response.status == http_client.OK
+        assert int(response.getheader('Content-Length')) == len(body)
+        assert body == self.EXPECTED
+
+    @mock.patch('handlers.base_handler.STREAM_CHUNK_SIZE', 512)
+    def test_large_response_is_chunked(self, items_server):
+        response, body = self._get(items_server)
+        assert response.status == http_client.OK
+        assert response.getheader('Transfer-Encoding') == 'chunked'
+        assert response.getheader('Content-Length') is None
+        assert body == self.EXPECTED
+
+    @mock.patch('handlers.base_handler.STREAM_CHUNK_SIZE', 512)
+    def test_http_1_0_response_ends_by_closing(self, items_server):
+        response, body = self._get(items_server, 'HTTP/1.0')
+        assert response.getheader('Transfer-Encoding') is None
+        assert response.getheader('Connection') == 'close'
+        assert body == self.EXPECTED
+
+
+class TestConditionalGet(object):
+    def _get(self, server, path, etag=None):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', server.server_address[1], timeout=5
+        )
+        try:
+            connection.request(
+                'GET', path, headers={'If-None-Match': etag} if etag else {}
+            )
+            response = connection.getresponse()
+            response.read()
+            return response
+        finally:
+            connection.close()
+
+    def test_unchanged_response_is_not_built(self, items_server):
+        del versioned_calls[:]
+        response = self._get(items_server, '/v2.0/versioned')
+        etag = response.getheader('ETag')
+        assert response.status == http_client.OK
+        assert etag == '"1"'
+
+        response = self._get(items_server, '/v2.0/versioned', etag)
+        assert response.status == http_client.NOT_MODIFIED
+        assert response.getheader('ETag') == etag
+        assert len(versioned_calls) == 1
+
+    def test_changed_response_is_sent(self, items_server):
+        del versioned_calls[:]
+        with mock.patch.object(ItemsHandler, 'version', '2'):
+            response = self._get(items_server, '/v2.0/versioned', '"1"')
+        assert response.status == http_client.OK
+        assert response.getheader('ETag') == '"2"'
+        assert len(versioned_calls) == 1
+
+    def test_unversioned_response_has_no_etag(self, items_server):
+        response = self._get(items_server, '/v2.0/items', '"1"')
+        assert response.status == http_client.OK
+        assert response.getheader('ETag') is None
+
+
+class TestCachedResponse(object):
+    EXPECTED = json.dumps({'items': STREAMED_ITEMS})
+
+    def _get(self, server, path):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', server.server_address[1], timeout=5
+        )
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            return response, response.read().decode()
+        finally:
+            connection.close()
+
+    @pytest.fixture
+    def cache(self):
+        del versioned_calls[:]
+        cache = ResponseCache(1024 * 1024)
+        with mock.patch.object(ItemsHandler, 'response_cache', cache):
+            yield cache
+
+    def test_response_is_built_once(self, items_server, cache):
+        for _ in range(2):
+            response, body = self._get(items_server, '/v2.0/cached')
+            assert response.status == http_client.OK
+            assert response.getheader('ETag') == '"1"'
+            assert body == self.EXPECTED
+        assert len(versioned_calls) == 1
+        assert cache.stats()['hits'] == 1
+
+    @mock.patch('handlers.base_handler.STREAM_CHUNK_SIZE', 512)
+    def test_streamed_response_is_cached(self, items_server, cache):
+        for _ in range(2):
+            response, body = self._get(items_server, '/v2.0/cached')
+            assert body == self.EXPECTED
+        assert len(versioned_calls) == 1
+
+    def test_response_is_built_again_when_changed(self, items_server, cache):
+        self._get(items_server, '/v2.0/cached')
+        with mock.patch.object(ItemsHandler, 'version', '2'):
+            response, body = self._get(items_server, '/v2.0/cached')
+        assert response.getheader('ETag') == '"2"'
+        assert body == self.EXPECTED
+        assert len(versioned_calls) == 2
+
+    def test_queries_are_cached_apart(self, items_server, cache):
+        self._get(items_server, '/v2.0/cached')
+        self._get(items_server, '/v2.0/cached?name=item1')
+        assert len(versioned_calls) == 2
+        assert cache.stats()['entries'] == 2
+
+    def test_uncached_response_is_built_again(self, items_server, cache):
+        for _ in range(2):
+            self._get(items_server, '/v2.0/versioned')
+        assert len(versioned_calls) == 2
+        assert cache.stats()['entries'] == 0
+
+
+class TestRequestMetrics(object):
+    def _count(self, labels):
+        prefix = '{}_count{{handler="ItemsHandler",method="GET",'.format(
+            metrics.REQUEST_DURATION.name
+        )
+        for line in metrics.REQUEST_DURATION.render():
+            if line.startswith(prefix + labels + '}'):
+                return int(line.rsplit(' ', 1)[1])
+        return 0
+
+    def _get(self, server, path):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', server.server_address[1], timeout=5
+        )
+        connection.request('GET', path)
+        connection.getresponse().read()
+        connection.close()
+
+    def test_requests_are_measured_by_route_and_code(self, items_server):
+        found = self._count('route="get_items",code="200"')
+        not_found = self._count('route="unknown",code="404"')
+
+        self._get(items_server, '/v2.0/items')
+        self._get(items_server, '/v2.0/unknown')
+
+        # The request is measured once its response has been sent
+        assert _wait_for(
+            lambda: self._count('route="get_items",code="200"') == found + 1
+        )
+        assert _wait_for(
+            lambda: self._count('route="unknown",code="404"')
+            == not_found + 1
+        )
+
+
+def test_requested_profile_is_written(items_server, tmpdir):
+    request_profiler = RequestProfiler(str(tmpdir), header_enabled=True)
+    with mock.patch.object(
+        ItemsHandler, 'profiler', request_profiler
+    ), mock.patch.object(ItemsHandler, '_is_authenticated', return_value=True):
+        connection = http_client.HTTPConnection(
+            '127.0.0.1', items_server.server_address[1], timeout=5
+        )
+        connection.request('GET', '/v2.0/items', headers={PROFILE_HEADER: '1'})
+        assert connection.getresponse().status == http_client.OK
+        connection.close()
+        # The profile is written once the response has been sent
+        assert _wait_for(lambda: os.listdir(str(tmpdir)))
+    with open(os.path.join(str(tmpdir), os.listdir(str(tmpdir))[0])) as f:
+        assert f.read().startswith('GET /v2.0/items get_items 200')
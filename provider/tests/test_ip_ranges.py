@@ -0,0 +1,87 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+import pytest
+
+import neutron.ip as ip_utils
+from neutron.ip_ranges import IpRangeSet
+
+Ls = namedtuple('Ls', ['ports', 'other_config'])
+
+
+def test_parse_and_format():
+    value = '10.0.0.1 10.0.0.5..10.0.0.10 fd00::1 not-an-ip'
+    ranges = IpRangeSet.parse(value)
+    assert str(ranges) == value
+    assert not IpRangeSet.parse('')
+    assert not IpRangeSet.parse(None)
+
+
+@pytest.mark.parametrize(
+    'ip,contained',
+    [
+        ('10.0.0.1', True),
+        ('10.0.0.2', False),
+        ('10.0.0.4', False),
+        ('10.0.0.5', True),
+        ('10.0.0.7', True),
+        ('10.0.0.10', True),
+        ('10.0.0.11', False),
+        ('fd00::1', True),
+        ('::10.0.0.1', False),
+    ],
+)
+def test_contains(ip, contained):
+    ranges = IpRangeSet.parse('10.0.0.1 10.0.0.5..10.0.0.10 fd00::1')
+    assert (ip in ranges) == contained
+
+
+def test_add_merges_ranges():
+    ranges = IpRangeSet.parse('10.0.0.1 10.0.0.5..10.0.0.10')
+    ranges.add('10.0.0.2')
+    assert str(ranges) == '10.0.0.1..10.0.0.2 10.0.0.5..10.0.0.10'
+    ranges.add('10.0.0.3', '10.0.0.4')
+    assert str(ranges) == '10.0.0.1..10.0.0.10'
+    ranges.add('10.0.0.7')
+    assert str(ranges) == '10.0.0.1..10.0.0.10'
+
+
+def test_remove_splits_ranges():
+    ranges = IpRangeSet.parse('10.0.0.1..10.0.0.10 10.0.0.20')
+    ranges.remove('10.0.0.5')
+    assert str(ranges) == '10.0.0.1..10.0.0.4 10.0.0.6..10.0.0.10 10.0.0.20'
+    ranges.remove('10.0.0.4', '10.0.0.20')
+    assert str(ranges) == '10.0.0.1..10.0.0.3'
+    ranges.remove('10.0.0.30')
+    assert str(ranges) == '10.0.0.1..10.0.0.3'
+
+
+def test_invalid_range():
+    with pytest.raises(ValueError):
+        IpRangeSet().add('10.0.0.2', '10.0.0.1')
+    with pytest.raises(ValueError):
+        IpRangeSet().add('10.0.0.1', 'fd00::1')
+
+
+def test_ip_in_excluded_range_is_not_available():
+    network = Ls(ports=[], other_config={'exclude_ips': '10.0.0.1..10.0.0.9'})
+    assert not ip_utils.is_ip_available_in_network(network, '10.0.0.5')
+    assert ip_utils.is_ip_available_in_network(network, '10.0.0.10')
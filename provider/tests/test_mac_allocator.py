@@ -0,0 +1,122 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import uuid
+
+import pytest
+
+import constants as ovnconst
+
+from ovndb.mac_allocator import MacAllocator
+from ovndb.mac_allocator import parse_mac_prefix
+
+PREFIX = '02:00:00:00:00'
+
+
+class Table(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class Row(object):
+    def __init__(self, table_name, **columns):
+        self._table = Table(table_name)
+        self.uuid = uuid.uuid4()
+        self.__dict__.update(columns)
+
+
+def _lsp(*addresses, **columns):
+    columns.setdefault('dynamic_addresses', [])
+    return Row(ovnconst.TABLE_LSP, addresses=list(addresses), **columns)
+
+
+def _lrp(mac):
+    return Row(ovnconst.TABLE_LRP, mac=mac)
+
+
+@pytest.fixture
+def allocator():
+    allocator = MacAllocator(PREFIX)
+    allocator._next = 0
+    return allocator
+
+
+class TestMacAllocator(object):
+    def test_allocation_is_incremental(self, allocator):
+        assert allocator.allocate() == '02:00:00:00:00:00'
+        assert allocator.allocate() == '02:00:00:00:00:01'
+
+    def test_macs_in_use_are_skipped(self, allocator):
+        allocator.notify('create', _lsp('02:00:00:00:00:00 10.0.0.1'))
+        allocator.notify('create', _lsp('router'))
+        dynamic_lsp = _lsp(
+            'dynamic', dynamic_addresses=['02:00:00:00:00:01 10.0.0.2']
+        )
+        allocator.notify('create', dynamic_lsp)
+        allocator.notify('create', _lrp('02:00:00:00:00:02'))
+        allocator.notify('create', _lrp('0a:00:00:00:00:03'))
+        assert allocator.allocate() == '02:00:00:00:00:03'
+        assert allocator.report()['used'] == 3
+
+    def test_deleted_and_updated_macs_are_released(self, allocator):
+        lsp = _lsp('02:00:00:00:00:00')
+        lrp = _lrp('02:00:00:00:00:01')
+        allocator.notify('create', lsp)
+        allocator.notify('create', lrp)
+
+        lsp.addresses = ['02:00:00:00:00:05']
+        allocator.notify('update', lsp)
+        allocator.notify('delete', lrp)
+
+        assert allocator.allocate() == '02:00:00:00:00:00'
+        assert allocator.allocate() == '02:00:00:00:00:01'
+        assert allocator.report()['used'] == 1
+
+    def test_allocation_wraps_around(self, allocator):
+        allocator._next = 0xFF
+        assert allocator.allocate() == '02:00:00:00:00:ff'
+        assert allocator.allocate() == '02:00:00:00:00:00'
+
+    def test_full_range(self):
+        allocator = MacAllocator(
+            PREFIX, reserved=['02:00:00:00:00:00', '02:00:00:00:00:01']
+        )
+        for offset in range(2, 0x100):
+            allocator.notify('create', _lrp('02:00:00:00:00:%02x' % offset))
+        assert allocator.report() == {
+            'prefix': PREFIX,
+            'capacity': 0x100,
+            'used': 0x100,
+            'density': 1.0,
+        }
+        with pytest.raises(Exception):
+            allocator.allocate()
+
+
+@pytest.mark.parametrize('prefix', ['02', '02:1a:4b', '0a:00:00:00:00'])
+def test_valid_prefix(prefix):
+    assert MacAllocator(prefix).allocate().startswith(prefix)
+
+
+@pytest.mark.parametrize(
+    'prefix', ['', '01', '02:00:00:00:00:00', '02:xx', '02:100']
+)
+def test_invalid_prefix(prefix):
+    with pytest.raises(ValueError):
+        parse_mac_prefix(prefix)
@@ -0,0 +1,171 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import pytest
+
+from six.moves import http_client
+from six.moves.BaseHTTPServer import HTTPServer
+
+import metrics
+import ovn_connection
+
+from auth import Unauthorized
+from auth.plugin_facade import validate_token
+from handlers.metrics_handler import MetricsHandler
+
+
+def _samples(text):
+    return dict(
+        line.rsplit(' ', 1)
+        for line in text.splitlines()
+        if not line.startswith('#')
+    )
+
+
+class TestHistogram(object):
+    def test_values_are_counted_in_cumulative_buckets(self):
+        histogram = metrics.Histogram(
+            'test_seconds', 'Test.', ('route',), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, ('r"1',))
+
+        samples = _samples('\n'.join(histogram.render()))
+        name = 'ovirt_provider_ovn_test_seconds'
+        assert samples[name + '_bucket{route="r\\"1",le="0.1"}'] == '2'
+        assert samples[name + '_bucket{route="r\\"1",le="1.0"}'] == '3'
+        assert samples[name + '_bucket{route="r\\"1",le="+Inf"}'] == '4'
+        assert samples[name + '_count{route="r\\"1"}'] == '4'
+        assert float(samples[name + '_sum{route="r\\"1"}']) == 5.65
+
+
+class TestCounter(object):
+    def test_count_is_rendered_with_total_suffix(self):
+        counter = metrics.Counter('test_events', 'Test.', ('outcome',))
+        counter.inc(('a',))
+        counter.inc(('a',), 2)
+
+        text = '\n'.join(counter.render())
+        name = 'ovirt_provider_ovn_test_events_total'
+        assert '# TYPE {} counter'.format(name) in text
+        assert _samples(text)[name + '{outcome="a"}'] == '3'
+
+    def test_count_cannot_decrease(self):
+        counter = metrics.Counter('test_events', 'Test.')
+        with pytest.raises(ValueError):
+            counter.inc(amount=-1)
+
+
+class TestRender(object):
+    def test_numeric_stats_are_rendered_as_gauges(self):
+        stats = {'hits': 3, 'prefix': '02', 'enabled': True}
+        with mock.patch.object(metrics, '_stats', []):
+            metrics.add_stats('test_cache', 'Test cache', lambda: stats)
+            text = metrics.render()
+
+        assert '# TYPE ovirt_provider_ovn_test_cache_hits gauge' in text
+        samples = _samples(text)
+        assert samples['ovirt_provider_ovn_test_cache_hits'] == '3'
+        assert 'ovirt_provider_ovn_test_cache_prefix' not in samples
+        assert 'ovirt_provider_ovn_test_cache_enabled' not in samples
+
+
+def _count(histogram, labels):
+    samples = _samples('\n'.join(histogram.render()))
+    key = '{}_count{{{}}}'.format(
+        histogram.name,
+        ','.join(
+            '{}="{}"'.format(name, label)
+            for name, label in zip(histogram.label_names, labels)
+        ),
+    )
+    return int(samples.get(key, 0))
+
+
+class TestInstrumentation(object):
+    def test_commands_are_measured(self):
+        command = mock.Mock()
+        labels = (type(command).__name__, 'success')
+        before = _count(metrics.OVSDB_COMMAND_DURATION, labels)
+        ovn_connection.execute(command)
+        assert _count(metrics.OVSDB_COMMAND_DURATION, labels) == before + 1
+
+    def test_failed_commands_are_measured(self):
+        command = mock.Mock()
+        command.execute.side_effect = ValueError
+        labels = (type(command).__name__, 'error')
+        before = _count(metrics.OVSDB_COMMAND_DURATION, labels)
+        with pytest.raises(Exception):
+            ovn_connection.execute(command)
+        assert _count(metrics.OVSDB_COMMAND_DURATION, labels) == before + 1
+
+    @mock.patch('auth.core.plugin')
+    def test_token_validations_are_measured(self, plugin):
+        plugin.validate_token.side_effect = [True, Unauthorized()]
+        histogram = metrics.AUTH_VALIDATION_DURATION
+        valid = _count(histogram, ('valid',))
+        invalid = _count(histogram, ('invalid',))
+
+        validate_token('token')
+        with pytest.raises(Unauthorized):
+            validate_token('token')
+
+        assert _count(histogram, ('valid',)) == valid + 1
+        assert _count(histogram, ('invalid',)) == invalid + 1
+
+
+@pytest.fixture
+def metrics_server():
+    server = HTTPServer(('127.0.0.1', 0), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def _get(server, path):
+    connection = http_client.HTTPConnection(
+        '127.0.0.1', server.server_address[1], timeout=5
+    )
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response, response.read().decode()
+    finally:
+        connection.close()
+
+
+class TestMetricsHandler(object):
+    def test_metrics_are_served(self, metrics_server):
+        response, body = _get(metrics_server, '/metrics')
+        assert response.status == http_client.OK
+        assert response.getheader('Content-Type') == metrics.CONTENT_TYPE
+        assert (
+            '# TYPE ovirt_provider_ovn_request_duration_seconds histogram'
+            in body
+        )
+
+    def test_other_paths_are_not_found(self, metrics_server):
+        response, _ = _get(metrics_server, '/')
+        assert response.status == http_client.NOT_FOUND
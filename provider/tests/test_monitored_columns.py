@@ -0,0 +1,126 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import copy
+
+from ovs.db import data
+from ovs.db.idl import SchemaHelper
+import pytest
+
+import constants as ovnconst
+from ovndb.monitored_columns import MONITORED_COLUMNS
+from ovndb.monitored_columns import register
+from ovndb.monitored_columns import replica_report
+
+UNUSED_COLUMN = 'unused'
+UNUSED_TABLE = 'NAT'
+
+
+def _schema_json(tables=MONITORED_COLUMNS):
+    return {
+        'name': ovnconst.OVN_NORTHBOUND,
+        'version': '5.23.0',
+        'tables': dict(
+            {
+                table: {
+                    'columns': {
+                        column: {'type': 'string'}
+                        for column in columns + (UNUSED_COLUMN,)
+                    }
+                }
+                for table, columns in tables.items()
+            },
+            **{UNUSED_TABLE: {'columns': {UNUSED_COLUMN: {'type': 'string'}}}}
+        ),
+    }
+
+
+class TestRegister(object):
+    def test_only_monitored_columns_registered(self):
+        helper = SchemaHelper(schema_json=_schema_json())
+
+        register(helper)
+
+        tables = helper.get_idl_schema().tables
+        assert set(tables) == set(MONITORED_COLUMNS)
+        for table, columns in MONITORED_COLUMNS.items():
+            assert set(tables[table].columns) == set(columns)
+
+    def test_missing_optional_table_skipped(self):
+        tables = dict(MONITORED_COLUMNS)
+        del tables[ovnconst.TABLE_PORT_GROUP]
+        del tables[ovnconst.TABLE_ACL]
+        helper = SchemaHelper(schema_json=_schema_json(tables))
+
+        register(helper)
+
+        assert set(helper.get_idl_schema().tables) == set(tables)
+
+    def test_missing_mandatory_table_fails(self):
+        tables = dict(MONITORED_COLUMNS)
+        del tables[ovnconst.TABLE_LS]
+        helper = SchemaHelper(schema_json=_schema_json(tables))
+
+        with pytest.raises(Exception, match=ovnconst.TABLE_LS):
+            register(helper)
+
+    def test_missing_column_skipped(self):
+        schema_json = _schema_json()
+        del schema_json['tables'][ovnconst.TABLE_ROUTES]['columns'][
+            'route_table'
+        ]
+        helper = SchemaHelper(schema_json=copy.deepcopy(schema_json))
+
+        register(helper)
+
+        columns = helper.get_idl_schema().tables[ovnconst.TABLE_ROUTES].columns
+        assert 'route_table' not in columns
+        assert 'ip_prefix' in columns
+
+
+class _Row(object):
+    def __init__(self, table, **values):
+        self._data = {
+            column: data.Datum.from_python(
+                table.columns[column].type, value, lambda row: row
+            )
+            for column, value in values.items()
+        }
+
+
+class TestReplicaReport(object):
+    def test_report(self):
+        helper = SchemaHelper(schema_json=_schema_json())
+        register(helper)
+        tables = helper.get_idl_schema().tables
+        for table in tables.values():
+            table.rows = {}
+        ls_table = tables[ovnconst.TABLE_LS]
+        ls_table.rows = {
+            index: _Row(ls_table, name='network{}'.format(index))
+            for index in range(3)
+        }
+
+        report = replica_report(tables)
+
+        assert report['rows'] == 3
+        assert report['columns'] == sum(
+            len(columns) for columns in MONITORED_COLUMNS.values()
+        )
+        assert report['bytes'] > 0
@@ -22,10 +22,14 @@ import json
 import mock
 
 from six.moves import http_client
+
+import ovn_connection
 from handlers.base_handler import Response
 from handlers.neutron import NeutronHandler
 
 from handlers.selecting_handler import rest
+from handlers.selecting_handler import versioned_by
+from ovndb.group_commit import StaleTransaction
 
 
 REST_RESPONSE_GET = 'REST_RESPONSE_GET'
@@ -41,6 +45,12 @@ def get_handler(nb_db, content, path_parts):
     return Response({'method:': REST_RESPONSE_GET})
 
 
+@rest('GET', 'versioned', response_handlers)
+@versioned_by('ports')
+def versioned_handler(nb_db, content, path_parts):
+    return Response({'method:': REST_RESPONSE_GET})
+
+
 @rest('GET', 'testports/*', response_handlers)
 def show_handler(nb_db, content, path_parts):
     return Response({'method:': REST_RESPONSE_SHOW})
@@ -56,6 +66,11 @@ def post_handler(nb_db, content, path_parts):
     return Response({'method:': REST_RESPONSE_POST, 'value:': content})
 
 
+@rest('POST', 'stale', response_handlers)
+def stale_handler(nb_db, content, path_parts):
+    raise StaleTransaction()
+
+
 @rest('POST', 'response_code_201', response_handlers)
 def response_code_201(nb_db, content, path_parts):
     return Response(
@@ -95,6 +110,36 @@ class TestNeutronHandler(object):
         assert mock_send_response.call_count == 1
         assert mock_validate_token.call_count == 1
 
+    @mock.patch(
+        'handlers.neutron.ovn_connection.table_version', return_value='1'
+    )
+    @mock.patch('handlers.neutron.NeutronApi', autospec=True)
+    @mock.patch('handlers.neutron.NeutronHandler.end_headers')
+    @mock.patch('handlers.neutron.NeutronHandler.send_header')
+    @mock.patch('handlers.neutron.NeutronHandler.send_response', autospec=True)
+    @mock.patch('handlers.neutron.validate_token', return_value=True)
+    def test_versioned_get_request_validates_token_once(
+        self,
+        mock_validate_token,
+        mock_send_response,
+        mock_send_header,
+        mock_end_headers,
+        mock_ndb_api,
+        mock_table_version,
+    ):
+        handler = NeutronHandler(None, None, None)
+        handler.wfile = MagicMock()
+        handler.headers = {}
+        handler.client_address = CLIENT_ADDRESS
+        handler.path = '/v2.0/versioned'
+
+        handler.do_GET()
+        handler.do_GET()
+
+        assert mock_send_response.call_args[0][1] == 200
+        mock_send_header.assert_any_call('ETag', mock.ANY)
+        assert mock_validate_token.call_count == 2
+
     @mock.patch('handlers.neutron.validate_token', return_value=False)
     @mock.patch('handlers.neutron.NeutronHandler.log_error')
     @mock.patch('handlers.neutron.NeutronHandler.send_error')
@@ -259,3 +304,64 @@ class TestNeutronHandler(object):
         assert handler.wfile.write.call_args[0][0] == expected_response
         assert mock_send_response.call_count == 1
         assert mock_validate_token.call_count == 1
+
+    @mock.patch('handlers.neutron.NeutronApi', autospec=True)
+    @mock.patch('handlers.neutron.NeutronHandler.end_headers')
+    @mock.patch('handlers.neutron.NeutronHandler.send_header')
+    @mock.patch('handlers.neutron.NeutronHandler.send_response', autospec=True)
+    @mock.patch('handlers.neutron.validate_token')
+    def test_token_validated_outside_of_write_lock(
+        self,
+        mock_validate_token,
+        mock_send_response,
+        mock_send_header,
+        mock_end_headers,
+        mock_ovn_north,
+    ):
+        mock_validate_token.side_effect = (
+            lambda token: not ovn_connection._write_lock.locked()
+        )
+        handler = NeutronHandler(None, None, None)
+        handler.wfile = MagicMock()
+        handler.rfile = MagicMock()
+        handler.rfile.read.return_value = 'content'
+        handler.client_address = CLIENT_ADDRESS
+        handler.headers = {'Content-Length': 7}
+        handler.path = '/v2.0/testports'
+
+        handler.do_POST()
+
+        assert mock_send_response.call_args[0][1] == 201
+        assert mock_validate_token.call_count == 1
+
+    @mock.patch('handlers.neutron.ovn_connection.write_lock')
+    @mock.patch('handlers.neutron.NeutronApi', autospec=True)
+    @mock.patch('handlers.neutron.NeutronHandler.end_headers')
+    @mock.patch('handlers.neutron.NeutronHandler.send_header')
+    @mock.patch('handlers.neutron.NeutronHandler.send_response', autospec=True)
+    @mock.patch('handlers.neutron.validate_token', return_value=True)
+    def test_stale_request_validated_again_up_to_limit(
+        self,
+        mock_validate_token,
+        mock_send_response,
+        mock_send_header,
+        mock_end_headers,
+        mock_ovn_north,
+        mock_write_lock,
+    ):
+        handler = NeutronHandler(None, None, None)
+        handler.wfile = MagicMock()
+        handler.rfile = MagicMock()
+        handler.rfile.read.return_value = 'content'
+        handler.client_address = CLIENT_ADDRESS
+        handler.headers = {'Content-Length': 7}
+        handler.path = '/v2.0/stale'
+
+        handler.do_POST()
+
+        assert mock_send_response.call_args[0][1] == http_client.CONFLICT
+        assert mock_write_lock.call_args_list == [
+            mock.call(exclusive=False),
+            mock.call(exclusive=True),
+            mock.call(exclusive=True),
+        ]
@@ -51,6 +51,7 @@ from handlers.neutron_responses import SUBNETS
 from handlers.neutron_responses import EXTENSIONS
 from handlers.neutron_responses import EXTENSION_ENTITY
 
+from handlers.selecting_handler import QUERY_PARAMETER
 from handlers.selecting_handler import SelectingHandler
 
 from neutron.neutron_api_mappers import NetworkMapper
@@ -67,6 +68,7 @@ NOT_RELEVANT = None
 NETWORK_ID01 = UUID(int=1)
 NETWORK_NAME1 = 'network_name_1'
 PORT_ID07 = UUID(int=7)
+PORT_ID08 = UUID(int=8)
 EXT_ROUTES_ALIAS = 'extraroute'
 
 
@@ -171,6 +173,9 @@ class TestNeutronResponse(object):
     def test_invalid_content_json(self):
         self._test_invalid_content('invalid JSON')
 
+    def test_invalid_bulk_content(self):
+        self._test_invalid_content('{"networks": {}, "ports": 1}')
+
     def test_show_network(self):
         nb_db = Mock()
         nb_db.get_network.return_value = {
@@ -206,41 +211,97 @@ class TestNeutronResponse(object):
 
     def test_get_networks(self):
         nb_db = Mock()
-        nb_db.list_networks.return_value = [
-            {
-                NetworkMapper.REST_NETWORK_ID: str(NETWORK_ID01),
-                NetworkMapper.REST_NETWORK_NAME: NETWORK_NAME1,
-            }
-        ]
+        nb_db.iter_networks.return_value = iter(
+            [
+                {
+                    NetworkMapper.REST_NETWORK_ID: str(NETWORK_ID01),
+                    NetworkMapper.REST_NETWORK_NAME: NETWORK_NAME1,
+                }
+            ]
+        )
         handler, params = SelectingHandler.get_response_handler(
             responses(), GET, NETWORKS.split('/')
         )
         response = handler(nb_db, NOT_RELEVANT, NOT_RELEVANT)
 
-        response_json = response.body
+        response_json = {'networks': list(response.body['networks'])}
         assert response_json['networks'][0]['id'] == str(NETWORK_ID01)
         assert response_json['networks'][0]['name'] == NETWORK_NAME1
 
     def test_get_ports(self):
         nb_db = Mock()
-        nb_db.list_ports.return_value = [
-            {
-                PortMapper.REST_PORT_ID: str(PORT_ID07),
-                PortMapper.REST_PORT_NAME: 'port_name',
-                PortMapper.REST_PORT_SECURITY_GROUPS: [],
-            }
-        ]
+        nb_db.iter_ports.return_value = iter(
+            [
+                {
+                    PortMapper.REST_PORT_ID: str(PORT_ID07),
+                    PortMapper.REST_PORT_NAME: 'port_name',
+                    PortMapper.REST_PORT_SECURITY_GROUPS: [],
+                }
+            ]
+        )
         handler, params = SelectingHandler.get_response_handler(
             responses(), GET, PORTS.split('/')
         )
 
         response = handler(nb_db, NOT_RELEVANT, NOT_RELEVANT)
 
-        response_json = response.body
+        response_json = {'ports': list(response.body['ports'])}
         assert response_json['ports'][0]['id'] == str(PORT_ID07)
         assert response_json['ports'][0]['name'] == 'port_name'
         assert response_json['ports'][0]['security_groups'] == []
 
+    def test_get_ports_passes_query_filters(self):
+        nb_db = Mock()
+        nb_db.iter_ports.return_value = iter([])
+        handler, params = SelectingHandler.get_response_handler(
+            responses(), GET, PORTS.split('/')
+        )
+
+        handler(
+            nb_db,
+            NOT_RELEVANT,
+            {QUERY_PARAMETER: {'device_id': ['vm1', 'vm2'], 'name': ['n']}},
+        )
+
+        filters, page = nb_db.iter_ports.call_args[0]
+        assert filters == {'device_id': 'vm1', 'name': 'n'}
+        assert not page.is_paginated
+
+    @mock.patch(
+        'handlers.neutron_responses.neutron_url_with_version',
+        lambda: 'http://localhost:9696/v2.0/',
+    )
+    def test_get_ports_page(self):
+        nb_db = Mock()
+        nb_db.iter_ports.return_value = iter(
+            [
+                {PortMapper.REST_PORT_ID: 'a', PortMapper.REST_PORT_NAME: 'x'},
+                {PortMapper.REST_PORT_ID: 'b', PortMapper.REST_PORT_NAME: 'y'},
+            ]
+        )
+        handler, params = SelectingHandler.get_response_handler(
+            responses(), GET, PORTS.split('/')
+        )
+
+        response = handler(
+            nb_db,
+            NOT_RELEVANT,
+            {QUERY_PARAMETER: {'limit': ['2'], 'fields': ['name']}},
+        )
+
+        filters, page = nb_db.iter_ports.call_args[0]
+        assert filters == {}
+        assert page.limit == 2
+        assert response.filtered
+        assert response.body['ports'] == [{'name': 'x'}, {'name': 'y'}]
+        assert response.body['ports_links'] == [
+            {
+                'rel': 'next',
+                'href': 'http://localhost:9696/v2.0/ports?'
+                'limit=2&fields=name&marker=b',
+            }
+        ]
+
     def test_delete_network(self):
         nb_db = Mock()
 
@@ -318,6 +379,28 @@ class TestNeutronResponse(object):
         rest_json = json.loads(rest_input)
         nb_db.add_port.assert_called_once_with(rest_json['port'])
 
+    def test_post_ports_bulk(self):
+        nb_db = Mock()
+        nb_db.add_ports.return_value = [
+            {PortMapper.REST_PORT_ID: str(PORT_ID07)},
+            {PortMapper.REST_PORT_ID: str(PORT_ID08)},
+        ]
+        rest_input = '{"ports":[{"name":"port1"}, {"name":"port2"}]}'
+
+        handler, params = SelectingHandler.get_response_handler(
+            responses(), POST, PORTS.split('/')
+        )
+        response = handler(nb_db, rest_input, NOT_RELEVANT)
+
+        assert [port['id'] for port in response.body['ports']] == [
+            str(PORT_ID07),
+            str(PORT_ID08),
+        ]
+        nb_db.add_ports.assert_called_once_with(
+            json.loads(rest_input)['ports']
+        )
+        assert not nb_db.add_port.called
+
     def test_put_port(self):
         nb_db = Mock()
         nb_db.update_port.return_value = {
@@ -331,6 +414,7 @@ class TestNeutronResponse(object):
         assert response_json['port']['id'] == str(PORT_ID07)
 
     @mock.patch('ovsdbapp.backend.ovs_idl.connection', autospec=False)
+    @mock.patch('ovn_connection._create_idl', new=mock.MagicMock())
     def test_post_routers(self, mock_connection):
         nb_db = NeutronApi()
         nb_db._add_router = Mock()
@@ -407,6 +491,7 @@ class TestNeutronResponse(object):
         assert response_json['extensions'][0]['links'] == []
 
     @mock.patch('ovsdbapp.backend.ovs_idl.connection', autospec=False)
+    @mock.patch('ovn_connection._create_idl', new=mock.MagicMock())
     def test_get_valid_extension(self, mock_connection):
         nb_db = NeutronApi()
         nb_db.ovn_north.idl = Mock()
@@ -420,6 +505,7 @@ class TestNeutronResponse(object):
         assert response
 
     @mock.patch('ovsdbapp.backend.ovs_idl.connection', autospec=False)
+    @mock.patch('ovn_connection._create_idl', new=mock.MagicMock())
     def test_get_invalid_extension(self, mock_connection):
         nb_db = NeutronApi()
         nb_db.ovn_north.idl = Mock()
@@ -0,0 +1,183 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import time
+
+import mock
+import pytest
+
+import ovirt_provider_config
+from ovirt_provider_config import DEFAULT_DHCP_MTU
+from ovirt_provider_config import DEFAULT_OPENSTACK_TENANT_ID
+from ovirt_provider_config_common import config_snapshot
+from ovirt_provider_config_common import dhcp_mtu
+from ovirt_provider_config_common import tenant_id
+
+TENANT_ID = '0000000000000000000000000000000a'
+OTHER_TENANT_ID = '0000000000000000000000000000000b'
+
+
+@pytest.fixture
+def config_files(tmpdir):
+    config_file = tmpdir.join('ovirt-provider-ovn.conf')
+    confd_dir = tmpdir.mkdir('conf.d')
+    with mock.patch(
+        'ovirt_provider_config.CONFIG_FILE', str(config_file)
+    ), mock.patch('ovirt_provider_config.CONFD_DIR', str(confd_dir)):
+        yield config_file, confd_dir
+    ovirt_provider_config._config = None
+    for listener in ovirt_provider_config._load_listeners:
+        listener()()
+
+
+@pytest.fixture
+def watch():
+    watchers = []
+
+    def start(interval):
+        watchers.append(ovirt_provider_config.watch(interval))
+
+    yield start
+    for watcher in watchers:
+        watcher.stop()
+
+
+def write_tenant(path, tenant):
+    path.write('[PROVIDER]\nopenstack-tenant-id={}\n'.format(tenant))
+
+
+def write_mtu(path, mtu):
+    path.write('[DHCP]\ndhcp-mtu={}\n'.format(mtu))
+
+
+class TestOvirtProviderConfig(object):
+    def test_snapshot_taken_on_load(self, config_files):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        snapshot = config_snapshot()
+
+        ovirt_provider_config.load()
+
+        assert config_snapshot().tenant_id == TENANT_ID
+        assert config_snapshot().generation > snapshot.generation
+        assert snapshot.tenant_id == DEFAULT_OPENSTACK_TENANT_ID
+
+    def test_confd_overrides_config_file(self, config_files):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        write_tenant(confd_dir.join('10-tenant.conf'), OTHER_TENANT_ID)
+
+        ovirt_provider_config.load()
+
+        assert config_snapshot().tenant_id == OTHER_TENANT_ID
+        assert tenant_id() == OTHER_TENANT_ID
+
+    def test_snapshot_is_immutable(self, config_files):
+        with pytest.raises(AttributeError):
+            config_snapshot().tenant_id = TENANT_ID
+
+    def test_url_filter_exceptions_parsed(self, config_files):
+        config_file, confd_dir = config_files
+        config_file.write('[PROVIDER]\nurl_filter_exception=a,b\n')
+
+        ovirt_provider_config.load()
+
+        assert config_snapshot().url_filter_exceptions == {'a', 'b'}
+
+    def test_invalid_config_keeps_previous(self, config_files):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        ovirt_provider_config.load()
+        snapshot = config_snapshot()
+        confd_dir.join('10-invalid.conf').write('no section\n')
+
+        with pytest.raises(ovirt_provider_config.configparser.Error):
+            ovirt_provider_config.load()
+
+        assert config_snapshot() is snapshot
+        assert tenant_id() == TENANT_ID
+
+    def test_malformed_value_keeps_previous(self, config_files):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        ovirt_provider_config.load()
+        snapshot = config_snapshot()
+        write_mtu(confd_dir.join('10-mtu.conf'), 'abc')
+
+        with pytest.raises(ValueError):
+            ovirt_provider_config.load()
+
+        assert config_snapshot() is snapshot
+        assert dhcp_mtu() == DEFAULT_DHCP_MTU
+
+    def test_dhcp_mtu_parsed(self, config_files):
+        config_file, confd_dir = config_files
+        write_mtu(config_file, '1400')
+
+        ovirt_provider_config.load()
+
+        assert config_snapshot().dhcp_mtu == 1400
+
+
+class TestConfigWatcher(object):
+    def test_reload_on_request(self, config_files, watch):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        ovirt_provider_config.load()
+        # The files are not checked for changes
+        watch(0)
+        write_tenant(config_file, OTHER_TENANT_ID)
+        time.sleep(0.05)
+        assert config_snapshot().tenant_id == TENANT_ID
+
+        ovirt_provider_config.request_reload()
+
+        _wait_for(lambda: config_snapshot().tenant_id == OTHER_TENANT_ID)
+
+    def test_reload_on_confd_change(self, config_files, watch):
+        config_file, confd_dir = config_files
+        write_tenant(config_file, TENANT_ID)
+        ovirt_provider_config.load()
+        watch(0.01)
+
+        write_tenant(confd_dir.join('10-tenant.conf'), OTHER_TENANT_ID)
+
+        _wait_for(lambda: config_snapshot().tenant_id == OTHER_TENANT_ID)
+
+    def test_reload_after_malformed_value(self, config_files, watch):
+        config_file, confd_dir = config_files
+        mtu_file = confd_dir.join('10-mtu.conf')
+        write_mtu(mtu_file, 'abc')
+        watch(0)
+        ovirt_provider_config.request_reload()
+        time.sleep(0.05)
+        write_tenant(config_file, TENANT_ID)
+        write_mtu(mtu_file, '1400')
+
+        ovirt_provider_config.request_reload()
+
+        _wait_for(lambda: config_snapshot().dhcp_mtu == 1400)
+        assert config_snapshot().tenant_id == TENANT_ID
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
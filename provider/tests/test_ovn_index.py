@@ -0,0 +1,201 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import uuid
+
+import pytest
+
+import constants as ovnconst
+
+from neutron.neutron_api_mappers import RouterMapper
+from neutron.neutron_api_mappers import SecurityGroupRuleMapper
+from neutron.neutron_api_mappers import SubnetMapper
+from ovndb.ovn_index import OvnNorthIndex
+
+
+class Table(object):
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+
+
+class Row(object):
+    def __init__(self, table, **columns):
+        self._table = table
+        self.uuid = uuid.uuid4()
+        self.external_ids = {}
+        self.other_config = {}
+        self.addresses = []
+        self.dynamic_addresses = []
+        self.__dict__.update(columns)
+
+
+class FakeIdl(object):
+    def __init__(self):
+        self.tables = {
+            name: Table(name)
+            for name in (
+                ovnconst.TABLE_LS,
+                ovnconst.TABLE_LSP,
+                ovnconst.TABLE_DHCP_Options,
+                ovnconst.TABLE_LR,
+                ovnconst.TABLE_LRP,
+                ovnconst.TABLE_ACL,
+            )
+        }
+        self.index = OvnNorthIndex(self.tables)
+
+    def insert(self, table_name, **columns):
+        table = self.tables[table_name]
+        row = Row(table, **columns)
+        table.rows[row.uuid] = row
+        self.index.notify('create', row)
+        return row
+
+    def update(self, row, **columns):
+        row.__dict__.update(columns)
+        self.index.notify('update', row)
+
+    def delete(self, row):
+        del row._table.rows[row.uuid]
+        self.index.notify('delete', row)
+
+
+@pytest.fixture
+def idl():
+    return FakeIdl()
+
+
+def _add_network(idl, ports=1):
+    lsps = [idl.insert(ovnconst.TABLE_LSP) for _ in range(ports)]
+    ls = idl.insert(ovnconst.TABLE_LS, ports=lsps)
+    dhcp = idl.insert(
+        ovnconst.TABLE_DHCP_Options,
+        external_ids={SubnetMapper.OVN_NETWORK_ID: str(ls.uuid)},
+    )
+    return ls, lsps, dhcp
+
+
+class TestOvnNorthIndex(object):
+    def test_network_and_subnet_of_port(self, idl):
+        ls, lsps, dhcp = _add_network(idl, ports=2)
+        _add_network(idl)
+
+        for lsp in lsps:
+            assert idl.index.get_ls_by_lsp(lsp.uuid) is ls
+            assert idl.index.get_dhcp_by_lsp(str(lsp.uuid)) is dhcp
+        assert idl.index.get_dhcp_by_ls(str(ls.uuid)) is dhcp
+        assert idl.index.get_ls_by_dhcp(dhcp) is ls
+
+    def test_port_moved_between_networks(self, idl):
+        ls1, lsps, _ = _add_network(idl)
+        ls2, _, _ = _add_network(idl, ports=0)
+
+        idl.update(ls1, ports=[])
+        idl.update(ls2, ports=lsps)
+
+        assert idl.index.get_ls_by_lsp(lsps[0].uuid) is ls2
+
+    def test_deleted_rows_are_not_returned(self, idl):
+        ls, lsps, dhcp = _add_network(idl)
+
+        idl.delete(dhcp)
+        assert idl.index.get_dhcp_by_ls(ls.uuid) is None
+        assert idl.index.get_dhcp_by_lsp(lsps[0].uuid) is None
+
+        idl.delete(ls)
+        assert idl.index.get_ls_by_lsp(lsps[0].uuid) is None
+
+    def test_rows_removed_without_notification(self, idl):
+        ls, lsps, _ = _add_network(idl)
+        ls._table.rows.clear()
+
+        assert idl.index.get_ls_by_lsp(lsps[0].uuid) is None
+
+    def test_lrp_by_name(self, idl):
+        lrp = idl.insert(ovnconst.TABLE_LRP, name='lrp1')
+        assert idl.index.get_lrp_by_name('lrp1') is lrp
+
+        idl.update(lrp, name='lrp2')
+        assert idl.index.get_lrp_by_name('lrp1') is None
+        assert idl.index.get_lrp_by_name('lrp2') is lrp
+
+    def test_gateway_port_of_router(self, idl):
+        lsp = idl.insert(ovnconst.TABLE_LSP)
+        lr = idl.insert(
+            ovnconst.TABLE_LR,
+            external_ids={RouterMapper.OVN_ROUTER_GATEWAY_PORT: str(lsp.uuid)},
+        )
+        assert idl.index.get_gateway_lsp_by_lr(lr.uuid) is lsp
+
+        idl.update(lr, external_ids={})
+        assert idl.index.get_gateway_lsp_by_lr(lr.uuid) is None
+
+    def test_acls_of_security_group(self, idl):
+        sec_group = Row(None, name='pg1')
+
+        def add_acl(sec_group_id):
+            return idl.insert(
+                ovnconst.TABLE_ACL,
+                external_ids={
+                    SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_SEC_GROUP_ID: (
+                        sec_group_id
+                    )
+                },
+            )
+
+        by_name = add_acl('pg1')
+        by_uuid = add_acl(str(sec_group.uuid))
+        add_acl('other')
+
+        acls = idl.index.get_acls_by_sec_group(sec_group)
+        assert sorted(acls, key=id) == sorted([by_name, by_uuid], key=id)
+
+        idl.delete(by_name)
+        assert idl.index.get_acls_by_sec_group(sec_group) == [by_uuid]
+
+    def test_ip_availability(self, idl):
+        ls, lsps, _ = _add_network(idl, ports=2)
+        other_ls, _, _ = _add_network(idl)
+        idl.update(lsps[0], addresses=['00:00:00:00:00:01 10.0.0.1'])
+        idl.update(
+            lsps[1],
+            addresses=['dynamic'],
+            dynamic_addresses=['00:00:00:00:00:02 10.0.0.2'],
+        )
+        idl.update(
+            ls,
+            other_config={
+                ovnconst.LS_OPTION_EXCLUDE_IPS: '10.0.0.10..10.0.0.20'
+            },
+        )
+
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.15'):
+            assert not idl.index.is_ip_available(ls.uuid, ip)
+            assert idl.index.is_ip_available(other_ls.uuid, ip)
+        assert idl.index.is_ip_available(str(ls.uuid), '10.0.0.3')
+
+        idl.update(lsps[0], addresses=['00:00:00:00:00:01 10.0.0.3'])
+        assert idl.index.is_ip_available(ls.uuid, '10.0.0.1')
+        assert not idl.index.is_ip_available(ls.uuid, '10.0.0.3')
+
+        idl.update(ls, ports=lsps[:1])
+        assert idl.index.is_ip_available(ls.uuid, '10.0.0.2')
+        idl.delete(lsps[0])
+        assert idl.index.is_ip_available(ls.uuid, '10.0.0.3')
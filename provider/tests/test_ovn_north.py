@@ -20,12 +20,15 @@ from __future__ import absolute_import
 
 from uuid import UUID
 import mock
+import threading
 import pytest
 
 from ovsdbapp.backend.ovs_idl.idlutils import RowNotFound
+from ovsdbapp.schema.ovn_northbound.commands import DhcpOptionsAddCommand
 import constants as ovnconst
 from handlers.base_handler import BadRequestError
 from handlers.base_handler import ConflictError
+from handlers.pagination import query_page
 import neutron.constants as neutron_constants
 from neutron.neutron_api_mappers import InvalidRestData
 from neutron.neutron_api_mappers import MandatoryDataMissing
@@ -33,6 +36,7 @@ from neutron.neutron_api_mappers import Network
 from neutron.neutron_api_mappers import NetworkMapper
 from neutron.neutron_api_mappers import NetworkPort
 from neutron.neutron_api_mappers import PortMapper
+from neutron.neutron_api_mappers import RestDataError
 from neutron.neutron_api_mappers import SecurityGroup
 from neutron.neutron_api_mappers import SecurityGroupRule
 from neutron.neutron_api_mappers import SecurityGroupMapper
@@ -45,6 +49,7 @@ from ovirt_provider_config_common import dhcp_lease_time
 from ovirt_provider_config_common import dhcp_mtu
 from ovirt_provider_config_common import dhcp_server_mac
 from ovirt_provider_config_common import tenant_id
+from ovndb.exclude_ips_command import UpdateExcludeIpsCommand
 
 from ovntestlib import assert_network_equal
 from ovntestlib import assert_port_equal
@@ -66,6 +71,7 @@ from ovntestlib import OvnSubnetRow
 
 
 @mock.patch('ovsdbapp.backend.ovs_idl.connection', autospec=False)
+@mock.patch('ovn_connection._create_idl', new=mock.MagicMock())
 class TestOvnNorth(object):
     MAC_ADDRESS = '01:00:00:00:00:11'
     DEVICE_ID = 'device-id-123456'
@@ -359,6 +365,52 @@ class TestOvnNorth(object):
             },
         )
 
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LsGetCommand.execute',
+        lambda cmd, check_error: TestOvnNorth.NETWORK_10,
+    )
+    @mock.patch('ovsdbapp.backend.ovs_idl.transaction.Transaction.commit')
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LsAddCommand', autospec=False
+    )
+    def test_add_networks_commits_once(
+        self, mock_add_command, mock_commit, mock_connection
+    ):
+        ovn_north = NeutronApi()
+        result = ovn_north.add_networks(
+            [NetworkApiInputMaker('net{}'.format(i)).get() for i in range(3)]
+        )
+
+        assert len(result) == 3
+        assert mock_add_command.call_count == 3
+        assert mock_commit.call_count == 1
+
+    @mock.patch('ovsdbapp.backend.ovs_idl.transaction.Transaction.commit')
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LsAddCommand', autospec=False
+    )
+    def test_add_networks_fail_together(
+        self, mock_add_command, mock_commit, mock_connection
+    ):
+        ovn_north = NeutronApi()
+        with pytest.raises(RestDataError):
+            ovn_north.add_networks([NetworkApiInputMaker('net').get(), {}])
+
+        assert mock_add_command.call_count == 1
+        assert mock_commit.call_count == 0
+
+    def test_add_ports_with_same_fixed_ip(self, mock_connection):
+        ovn_north = NeutronApi()
+        fixed_ips = [{PortMapper.REST_PORT_IP_ADDRESS: '10.0.0.5'}]
+        rest_ports = [
+            PortApiInputMaker(
+                name, str(TestOvnNorth.NETWORK_ID10), fixed_ips=fixed_ips
+            ).get()
+            for name in ('port1', 'port2')
+        ]
+        with pytest.raises(RestDataError):
+            ovn_north.add_ports(rest_ports)
+
     @mock.patch(
         'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
         lambda x: None,
@@ -433,8 +485,11 @@ class TestOvnNorth(object):
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsAddCommand.'
-        'execute',
-        lambda cmd, check_error: TestOvnNorth.SUBNET_MTU,
+        'result',
+        property(
+            lambda cmd: TestOvnNorth.SUBNET_MTU, lambda cmd, result: None
+        ),
+        create=True,
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
@@ -481,7 +536,7 @@ class TestOvnNorth(object):
 
         expected_options_call = mock.call(
             ovn_north.idl,
-            TestOvnNorth.SUBNET_IDMTU,
+            mock.ANY,
             dns_server='1.1.1.1',
             lease_time=dhcp_lease_time(),
             router='1.1.1.0',
@@ -493,6 +548,9 @@ class TestOvnNorth(object):
         subnet_creation_result = ovn_north.add_subnet(subnet_rest_data)
         assert mock_setoptions_command.call_count == 1
         assert mock_setoptions_command.mock_calls[0] == expected_options_call
+        assert isinstance(
+            mock_setoptions_command.mock_calls[0][1][1], DhcpOptionsAddCommand
+        )
         assert mock_dbset_command.call_count == 1
         assert_subnet_equal(subnet_creation_result, TestOvnNorth.SUBNET_MTU)
 
@@ -507,8 +565,11 @@ class TestOvnNorth(object):
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsAddCommand.'
-        'execute',
-        lambda cmd, check_error: TestOvnNorth.SUBNET_MTU,
+        'result',
+        property(
+            lambda cmd: TestOvnNorth.SUBNET_MTU, lambda cmd, result: None
+        ),
+        create=True,
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.LsAddCommand.execute',
@@ -949,6 +1010,185 @@ class TestOvnNorth(object):
         assert_port_equal(ports[1], second_port)
         assert_port_equal(ports[2], third_port)
 
+    def test_shared_api_is_reused(self, mock_connection):
+        with mock.patch.object(NeutronApi, '_shared', None):
+            neutron_api = NeutronApi.shared()
+            assert NeutronApi.shared() is neutron_api
+
+    def test_security_group_support_follows_schema(self, mock_connection):
+        neutron_api = NeutronApi()
+        with mock.patch.object(
+            neutron_api, 'are_security_groups_supported', return_value=True
+        ) as mock_supported:
+            assert neutron_api.security_group_support
+            assert neutron_api.security_group_support
+            assert mock_supported.call_count == 1
+
+            neutron_api.idl.ovsdb_connection.idl.tables = {}
+            assert neutron_api.security_group_support
+            assert mock_supported.call_count == 2
+
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
+        lambda x: None,
+    )
+    def test_transactions_are_kept_per_thread(self, mock_connection):
+        tx_manager = NeutronApi().tx_manager
+        transactions = []
+
+        def in_other_thread():
+            with tx_manager.transaction() as tx:
+                transactions.append(tx)
+
+        with tx_manager.transaction() as tx:
+            thread = threading.Thread(target=in_other_thread)
+            thread.start()
+            thread.join(5)
+            assert transactions and transactions[0] is not tx
+            assert tx_manager._tx is tx
+        assert tx_manager._tx is None
+
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
+        'execute',
+        lambda cmd, check_error: [],
+    )
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LsListCommand.execute',
+        lambda cmd, check_error: TestOvnNorth.networks,
+    )
+    def test_list_ports_filtered(self, mock_connection):
+        ovn_north = NeutronApi()
+
+        ports = ovn_north.list_ports(
+            {PortMapper.REST_PORT_DEVICE_ID: str(TestOvnNorth.PORT_ID02)}
+        )
+        assert [port['name'] for port in ports] == [TestOvnNorth.PORT_NAME02]
+
+        ports = ovn_north.list_ports(
+            {PortMapper.REST_PORT_NETWORK_ID: str(TestOvnNorth.NETWORK_ID12)}
+        )
+        assert [port['name'] for port in ports] == [TestOvnNorth.PORT_NAME03]
+
+        network_id = str(TestOvnNorth.NETWORK_ID12)
+        assert not ovn_north.list_ports(
+            {
+                PortMapper.REST_PORT_NETWORK_ID: network_id,
+                PortMapper.REST_PORT_NAME: TestOvnNorth.PORT_NAME01,
+            }
+        )
+
+    def test_list_ports_paginated(self, mock_connection):
+        lsps = [
+            OvnPortRow(
+                UUID(int=i),
+                name=name,
+                external_ids={
+                    PortMapper.OVN_NIC_NAME: name,
+                    PortMapper.OVN_DEVICE_ID: TestOvnNorth.DEVICE_ID,
+                },
+            )
+            for i, name in enumerate(['d', 'a', 'c', 'b'])
+        ]
+        network = OvnNetworkRow(TestOvnNorth.NETWORK_ID10, ports=lsps)
+        dhcp_list = mock.Mock(return_value=[])
+
+        def ids(fields=None, **page):
+            return [
+                port['id']
+                for port in ovn_north.list_ports(
+                    page=query_page(
+                        dict(
+                            {key: [value] for key, value in page.items()},
+                            fields=fields,
+                        )
+                    )
+                )
+            ]
+
+        with mock.patch(
+            'ovsdbapp.schema.ovn_northbound.commands.LsListCommand.execute',
+            lambda cmd, check_error: [network],
+        ), mock.patch(
+            'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
+            'execute',
+            lambda cmd, check_error: dhcp_list(),
+        ):
+            ovn_north = NeutronApi()
+            assert ids(limit='2') == ['a', 'b']
+            assert ids(limit='2', marker='b') == ['c', 'd']
+            assert ids(limit='2', marker='d') == []
+            assert ids(limit='2', marker='d', page_reverse='True') == [
+                'b',
+                'c',
+            ]
+            assert ids(marker='b') == ['c', 'd']
+            assert dhcp_list.call_count == 5
+
+            assert ids(fields=['id', 'name'], limit='3') == ['a', 'b', 'c']
+            assert dhcp_list.call_count == 5
+
+    def test_list_ports_joins_subnets_and_router_ports(self, mock_connection):
+        subnet = OvnSubnetRow(
+            TestOvnNorth.SUBNET_ID101,
+            network_id=str(TestOvnNorth.NETWORK_ID10),
+            cidr=TestOvnNorth.SUBNET_CIDR,
+        )
+        lrp = OvnRouterPort()
+        lrp.name = 'lrp' + str(TestOvnNorth.PORT_ID02)
+        lrp.networks = ['1.1.1.2/24']
+        vm_port = OvnPortRow(
+            TestOvnNorth.PORT_ID01,
+            name=TestOvnNorth.PORT_NAME01,
+            addresses=[TestOvnNorth.MAC_ADDRESS + ' 1.1.1.5'],
+            external_ids={
+                PortMapper.OVN_NIC_NAME: TestOvnNorth.PORT_NAME01,
+                PortMapper.OVN_DEVICE_ID: TestOvnNorth.DEVICE_ID,
+            },
+        )
+        router_port = OvnPortRow(
+            TestOvnNorth.PORT_ID02,
+            name=TestOvnNorth.PORT_NAME02,
+            addresses=['router'],
+            options={ovnconst.LSP_OPTION_ROUTER_PORT: lrp.name},
+            external_ids={
+                PortMapper.OVN_NIC_NAME: TestOvnNorth.PORT_NAME02,
+                PortMapper.OVN_DEVICE_ID: TestOvnNorth.DEVICE_ID,
+            },
+        )
+        network = OvnNetworkRow(
+            TestOvnNorth.NETWORK_ID10, ports=[vm_port, router_port]
+        )
+        lrp_list = mock.Mock(return_value=[lrp])
+
+        with mock.patch(
+            'ovsdbapp.schema.ovn_northbound.commands.LsListCommand.execute',
+            lambda cmd, check_error: [network],
+        ), mock.patch(
+            'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
+            'execute',
+            lambda cmd, check_error: [subnet],
+        ), mock.patch(
+            'ovsdbapp.backend.ovs_idl.command.DbListCommand.execute',
+            lambda cmd, check_error: lrp_list(),
+        ):
+            ports = list(NeutronApi().iter_ports())
+
+        assert lrp_list.call_count == 1
+        assert_port_equal(
+            ports[0],
+            NetworkPort(
+                lsp=vm_port, ls=network, dhcp_options=subnet, lrp=None
+            ),
+        )
+        assert_port_equal(
+            ports[1],
+            NetworkPort(
+                lsp=router_port, ls=network, dhcp_options=subnet, lrp=lrp
+            ),
+        )
+        assert ports[1]['fixed_ips'][0]['ip_address'] == '1.1.1.2'
+
     @mock.patch(
         'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
         lambda x: None,
@@ -1041,6 +1281,10 @@ class TestOvnNorth(object):
         )
         assert mock_del_command.mock_calls[0] == expected_del_call
 
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
+        lambda x: None,
+    )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
         'execute',
@@ -1073,8 +1317,7 @@ class TestOvnNorth(object):
         mock_dbset_command,
         mock_connection,
     ):
-        add_execute = mock_add_command.return_value.execute
-        add_execute.return_value = TestOvnNorth.SUBNET_102
+        mock_add_command.return_value.result = TestOvnNorth.SUBNET_102
         ovn_north = NeutronApi()
         rest_data = SubnetApiInputMaker(
             TestOvnNorth.SUBNET_102.external_ids.get(SubnetMapper.OVN_NAME),
@@ -1114,7 +1357,7 @@ class TestOvnNorth(object):
 
         expected_options_call = mock.call(
             ovn_north.idl,
-            TestOvnNorth.SUBNET_ID102,
+            mock_add_command.return_value,
             dns_server='1.1.1.1',
             lease_time=dhcp_lease_time(),
             router='1.1.1.0',
@@ -1124,6 +1367,10 @@ class TestOvnNorth(object):
         )
         assert mock_setoptions_command.mock_calls[0] == expected_options_call
 
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
+        lambda x: None,
+    )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
         'execute',
@@ -1156,8 +1403,7 @@ class TestOvnNorth(object):
         mock_dbset_command,
         mock_connection,
     ):
-        add_execute = mock_add_command.return_value.execute
-        add_execute.return_value = TestOvnNorth.SUBNET_102
+        mock_add_command.return_value.result = TestOvnNorth.SUBNET_102
         ovn_north = NeutronApi()
         rest_data = SubnetApiInputMaker(
             'subnet_name',
@@ -1390,6 +1636,74 @@ class TestOvnNorth(object):
             ovnconst.TABLE_LR, str(TestOvnNorth.ROUTER_ID20)
         )
 
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.impl_idl.OvnNbApiIdlImpl.lookup',
+        lambda idl, table, uuid: TestOvnNorth.ROUTER_20,
+    )
+    @mock.patch('ovsdbapp.backend.ovs_idl.transaction.Transaction.commit')
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LrRouteAddCommand',
+        autospec=False,
+    )
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.commands.LrAddCommand', autospec=False
+    )
+    def test_add_router_commits_once(
+        self,
+        mock_add_command,
+        mock_route_command,
+        mock_commit,
+        mock_connection,
+    ):
+        ovn_north = NeutronApi()
+        ovn_north.add_router(
+            {
+                'name': TestOvnNorth.ROUTER_NAME20,
+                'routes': [
+                    {'destination': '10.0.1.0/24', 'nexthop': '10.0.0.1'},
+                    {'destination': '10.0.2.0/24', 'nexthop': '10.0.0.2'},
+                ],
+            }
+        )
+
+        assert mock_commit.call_count == 1
+        assert mock_add_command.call_count == 1
+        assert mock_route_command.call_count == 2
+        # the routes reference the router created in the same transaction
+        add_lr_command = mock_add_command.return_value
+        for route_call in mock_route_command.call_args_list:
+            assert route_call[0][1] is add_lr_command
+
+    def test_update_exclude_ips(self, mock_connection):
+        api = mock.Mock()
+        ls = api.lookup.return_value
+        ls.other_config = {
+            ovnconst.LS_OPTION_EXCLUDE_IPS: '10.0.0.1 10.0.0.2'
+        }
+        UpdateExcludeIpsCommand(
+            api,
+            str(TestOvnNorth.NETWORK_ID10),
+            add=['10.0.0.3', '10.0.0.2'],
+            remove=['10.0.0.1'],
+        ).run_idl(None)
+        ls.setkey.assert_called_once_with(
+            ovnconst.ROW_LS_OTHER_CONFIG,
+            ovnconst.LS_OPTION_EXCLUDE_IPS,
+            '10.0.0.2..10.0.0.3',
+        )
+
+        ls.other_config = {ovnconst.LS_OPTION_EXCLUDE_IPS: '10.0.0.1'}
+        UpdateExcludeIpsCommand(
+            api, str(TestOvnNorth.NETWORK_ID10), remove=['10.0.0.1']
+        ).run_idl(None)
+        ls.delkey.assert_called_once_with(
+            ovnconst.ROW_LS_OTHER_CONFIG, ovnconst.LS_OPTION_EXCLUDE_IPS
+        )
+
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
+        lambda x: None,
+    )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.LrDelCommand', autospec=False
     )
@@ -1779,6 +2093,70 @@ class TestOvnNorth(object):
             ),
         )
 
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.command.DbListCommand.execute',
+        autospec=True,
+    )
+    @mock.patch(
+        'ovsdbapp.schema.ovn_northbound.impl_idl.OvnNbApiIdlImpl.lookup'
+    )
+    def test_list_security_group_rules_single_pass(
+        self, mock_lookup, mock_list, mock_connection
+    ):
+        other_group = OvnSecurityGroupRow(UUID(int=667), 'other')
+        remote_rule = OvnSecurityGroupRuleRow(
+            UUID(int=4),
+            str(UUID(int=4)),
+            'to-lport',
+            'ip4',
+            1001,
+            'other',
+            'allow',
+            {
+                SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_SEC_GROUP_ID: (
+                    'other'
+                ),
+                SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_REMOTE_GROUP_ID: (
+                    str(TestOvnNorth.SECURITY_GROUP_ID)
+                ),
+                SecurityGroupRuleMapper.OVN_SEC_GROUP_RULE_ETHERTYPE: 'IPv4',
+            },
+        )
+        rows = {
+            'Port_Group': [TestOvnNorth.SECURITY_GROUP, other_group],
+            'ACL': [
+                TestOvnNorth.SECURITY_GROUP_RULE_01,
+                TestOvnNorth.SECURITY_GROUP_RULE_02,
+                remote_rule,
+                TestOvnNorth.SECURITY_GROUP_RULE_03,
+            ],
+        }
+        mock_list.side_effect = lambda command, check_error: rows[
+            command.table
+        ]
+        mock_lookup.side_effect = RowNotFound(
+            table='Port_Group', col='name', match='Default'
+        )
+        ovn_north = NeutronApi(sec_group_support=True)
+
+        with mock.patch.object(
+            ovn_north, 'are_security_groups_supported', return_value=True
+        ):
+            result = ovn_north.list_security_group_rules()
+
+        assert [rule['id'] for rule in result] == [
+            str(TestOvnNorth.SECURITY_GROUP_RULE_ID_01),
+            str(TestOvnNorth.SECURITY_GROUP_RULE_ID_03),
+            str(UUID(int=4)),
+        ]
+        assert result[2]['remote_group_id'] == str(
+            TestOvnNorth.SECURITY_GROUP_ID
+        )
+        assert [
+            call[0][0].table for call in mock_list.call_args_list
+        ] == ['Port_Group', 'ACL']
+        assert mock_lookup.call_count == 1
+
     @mock.patch(
         'ovsdbapp.backend.ovs_idl.command.DbListCommand.execute',
         lambda idl, check_error: [
@@ -1909,6 +2287,10 @@ class TestOvnNorth(object):
             'cidr=1.1.1.0/24 or gateway=1.1.1.0'
         )
 
+    @mock.patch(
+        'ovsdbapp.backend.ovs_idl.transaction.Transaction.commit',
+        lambda x: None,
+    )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsGetCommand.'
         'execute',
@@ -1916,8 +2298,11 @@ class TestOvnNorth(object):
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsAddCommand.'
-        'execute',
-        lambda cmd, check_error: TestOvnNorth.SUBNET_IPV6,
+        'result',
+        property(
+            lambda cmd: TestOvnNorth.SUBNET_IPV6, lambda cmd, result: None
+        ),
+        create=True,
     )
     @mock.patch(
         'ovsdbapp.schema.ovn_northbound.commands.DhcpOptionsListCommand.'
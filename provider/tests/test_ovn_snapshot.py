@@ -0,0 +1,164 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import json
+import threading
+
+import mock
+from ovs.db.idl import Idl
+from ovs.db.idl import SchemaHelper
+import pytest
+
+import ovndb.ovn_snapshot as ovn_snapshot
+
+LS_UUID = '00000000-0000-0000-0000-00000000000a'
+LSP_UUID = '00000000-0000-0000-0000-00000000000b'
+LAST_ID = '00000000-0000-0000-0000-0000000000ff'
+
+SCHEMA = {
+    'name': 'OVN_Northbound',
+    'version': '5.23.0',
+    'tables': {
+        'Logical_Switch': {
+            'columns': {
+                'name': {'type': 'string'},
+                'ports': {
+                    'type': {
+                        'key': {
+                            'type': 'uuid',
+                            'refTable': 'Logical_Switch_Port',
+                        },
+                        'min': 0,
+                        'max': 'unlimited',
+                    }
+                },
+                'external_ids': {
+                    'type': {
+                        'key': 'string',
+                        'value': 'string',
+                        'min': 0,
+                        'max': 'unlimited',
+                    }
+                },
+            }
+        },
+        'Logical_Switch_Port': {'columns': {'name': {'type': 'string'}}},
+    },
+}
+
+
+def _create_idl(schema=SCHEMA):
+    helper = SchemaHelper(schema_json=schema)
+    helper.register_all()
+    # The IDL does not connect until it is run
+    return Idl('tcp:127.0.0.1:1', helper)
+
+
+def _snapshot(idl):
+    header = ovn_snapshot._header(idl)
+    header['last_id'] = LAST_ID
+    header['rows'] = {
+        'Logical_Switch': {
+            LS_UUID: {
+                'name': 'network',
+                'ports': ['uuid', LSP_UUID],
+            }
+        },
+        'Logical_Switch_Port': {LSP_UUID: {'name': 'port'}},
+    }
+    return header
+
+
+@pytest.fixture
+def snapshot_file(tmpdir):
+    return tmpdir.join('north.snapshot')
+
+
+def _connection(idl):
+    return mock.Mock(idl=idl, lock=threading.RLock())
+
+
+class TestOvnSnapshot(object):
+    def test_load(self, snapshot_file):
+        idl = _create_idl()
+        snapshot_file.write(json.dumps(_snapshot(idl)))
+
+        rows = ovn_snapshot.load(idl, str(snapshot_file))
+
+        assert len(rows) == 2
+        assert idl.last_id == LAST_ID
+        ls = next(iter(idl.tables['Logical_Switch'].rows.values()))
+        assert ls.name == 'network'
+        assert ls.external_ids == {}
+        assert [port.name for port in ls.ports] == ['port']
+
+    def test_save_and_load(self, snapshot_file):
+        idl = _create_idl()
+        snapshot_file.write(json.dumps(_snapshot(idl)))
+        ovn_snapshot.load(idl, str(snapshot_file))
+        snapshot_file.remove()
+
+        saved_id = ovn_snapshot.save(_connection(idl), str(snapshot_file))
+
+        assert saved_id == LAST_ID
+        assert json.loads(snapshot_file.read()) == _snapshot(idl)
+        loaded_idl = _create_idl()
+        assert len(ovn_snapshot.load(loaded_idl, str(snapshot_file))) == 2
+        assert loaded_idl.last_id == LAST_ID
+
+    def test_save_without_transaction_id(self, snapshot_file):
+        idl = _create_idl()
+
+        assert ovn_snapshot.save(_connection(idl), str(snapshot_file)) is None
+        assert not snapshot_file.exists()
+
+    def test_missing_snapshot_ignored(self, snapshot_file):
+        idl = _create_idl()
+
+        assert ovn_snapshot.load(idl, str(snapshot_file)) == []
+        assert not idl.tables['Logical_Switch'].rows
+
+    def test_snapshot_of_other_columns_ignored(self, snapshot_file):
+        snapshot = _snapshot(_create_idl())
+        snapshot['columns']['Logical_Switch'].remove('external_ids')
+        snapshot_file.write(json.dumps(snapshot))
+        idl = _create_idl()
+
+        assert ovn_snapshot.load(idl, str(snapshot_file)) == []
+        assert idl.last_id != LAST_ID
+
+    def test_corrupted_snapshot_ignored(self, snapshot_file):
+        snapshot_file.write('{"format": ')
+        idl = _create_idl()
+
+        assert ovn_snapshot.load(idl, str(snapshot_file)) == []
+
+
+class TestSnapshotWriter(object):
+    def test_saved_when_stopped(self, snapshot_file):
+        idl = _create_idl()
+        writer = ovn_snapshot.SnapshotWriter(
+            _connection(idl), str(snapshot_file), 60
+        )
+        writer.start()
+        idl.last_id = LAST_ID
+
+        writer.stop()
+
+        assert json.loads(snapshot_file.read())['last_id'] == LAST_ID
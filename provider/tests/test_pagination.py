@@ -0,0 +1,108 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import pytest
+
+from six.moves import urllib_parse
+
+from handlers.base_handler import BadRequestError
+from handlers.pagination import ALL
+from handlers.pagination import page_links
+from handlers.pagination import query_page
+from handlers.query_filter import query_filters
+
+URL = 'http://localhost:9696/v2.0/ports'
+
+
+def _link_query(link):
+    return urllib_parse.parse_qs(urllib_parse.urlparse(link['href']).query)
+
+
+class TestQueryPage(object):
+    def test_no_pagination(self):
+        assert query_page({}) == ALL
+        assert not query_page({'name': ['x']}).is_paginated
+
+    def test_pagination(self):
+        page = query_page(
+            {
+                'limit': ['2'],
+                'marker': ['id1'],
+                'page_reverse': ['True'],
+                'fields': ['id', 'name'],
+            }
+        )
+        assert page.limit == 2
+        assert page.marker == 'id1'
+        assert page.reverse
+        assert page.fields == ['id', 'name']
+        assert page.is_paginated
+
+    @pytest.mark.parametrize('limit', ['-1', 'ten'])
+    def test_invalid_limit(self, limit):
+        with pytest.raises(BadRequestError):
+            query_page({'limit': [limit]})
+
+    def test_pagination_keys_are_not_filters(self):
+        query = {'limit': ['2'], 'fields': ['id'], 'name': ['x']}
+        assert query_filters(query) == {'name': 'x'}
+
+    def test_fields(self):
+        page = query_page({'fields': ['id', 'fixed_ips']})
+        assert page.requires('fixed_ips')
+        assert page.requires('name', {'name': 'x'})
+        assert not page.requires('name')
+        assert ALL.requires('name')
+        assert page.project({'id': 1, 'name': 'x'}) == {'id': 1}
+
+
+class TestPageLinks(object):
+    ITEMS = [{'id': 'b'}, {'id': 'c'}]
+
+    def test_not_paginated(self):
+        assert page_links(URL, self.ITEMS, ALL, {}) == []
+
+    def test_first_full_page(self):
+        query = {'limit': ['2'], 'name': ['x']}
+        links = page_links(URL, self.ITEMS, query_page(query), query)
+        assert [link['rel'] for link in links] == ['next']
+        assert links[0]['href'].startswith(URL + '?')
+        assert _link_query(links[0]) == {
+            'limit': ['2'],
+            'name': ['x'],
+            'marker': ['c'],
+        }
+
+    def test_last_page(self):
+        query = {'limit': ['3'], 'marker': ['a']}
+        links = page_links(URL, self.ITEMS, query_page(query), query)
+        assert [link['rel'] for link in links] == ['previous']
+        assert _link_query(links[0]) == {
+            'limit': ['3'],
+            'marker': ['b'],
+            'page_reverse': ['True'],
+        }
+
+    def test_reversed_page(self):
+        query = {'limit': ['2'], 'marker': ['d'], 'page_reverse': ['True']}
+        links = page_links(URL, self.ITEMS, query_page(query), query)
+        assert [link['rel'] for link in links] == ['next', 'previous']
+        assert _link_query(links[0])['marker'] == ['c']
+        assert 'page_reverse' not in _link_query(links[0])
+        assert _link_query(links[1])['marker'] == ['b']
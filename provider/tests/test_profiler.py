@@ -0,0 +1,117 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import os
+
+import mock
+
+import profiler
+from profiler import PROFILE_HEADER
+from profiler import RequestProfiler
+
+
+def _profiles(directory):
+    return sorted(os.listdir(directory))
+
+
+def _read_profile(directory):
+    profiles = _profiles(directory)
+    assert len(profiles) == 1
+    with open(os.path.join(directory, profiles[0])) as f:
+        return f.read()
+
+
+class TestRequestProfiler(object):
+    def test_slow_request_is_written(self, tmpdir):
+        directory = str(tmpdir)
+        request_profiler = RequestProfiler(
+            directory, sample_rate=1, slow_threshold=0.5
+        )
+        profile = request_profiler.start({})
+        profiler.record_commands(['LsListCommand()'], 0.25)
+        profiler.record_commands(
+            ['LsAddCommand()', 'LspAddCommand()'], 0.125, transaction=True
+        )
+        request_profiler.finish(profile, 0.5, 'GET /v2.0/networks')
+
+        content = _read_profile(directory)
+        assert content.startswith('GET /v2.0/networks\nDuration: 0.500s')
+        assert '  0.250s LsListCommand()' in content
+        assert '  0.125s transaction of 2 commands' in content
+        assert '    LspAddCommand()' in content
+        assert 'function calls' in content
+
+    def test_fast_request_is_not_written(self, tmpdir):
+        request_profiler = RequestProfiler(
+            str(tmpdir), sample_rate=1, slow_threshold=0.5
+        )
+        profile = request_profiler.start({})
+        request_profiler.finish(profile, 0.1, 'GET /v2.0/networks')
+        assert _profiles(str(tmpdir)) == []
+
+    @mock.patch('profiler.random.random', return_value=0.5)
+    def test_requests_are_sampled(self, random, tmpdir):
+        assert RequestProfiler(str(tmpdir), sample_rate=0.4).start({}) is None
+        profile = RequestProfiler(str(tmpdir), sample_rate=0.6).start({})
+        assert profile is not None
+        profile.profiler.disable()
+
+    def test_requested_profile_is_always_written(self, tmpdir):
+        directory = str(tmpdir)
+        request_profiler = RequestProfiler(
+            directory, slow_threshold=10, header_enabled=True
+        )
+        assert request_profiler.start({}) is None
+        profile = request_profiler.start({PROFILE_HEADER: '1'})
+        request_profiler.finish(
+            profile, 0.1, 'GET /v2.0/ports', authenticated=True
+        )
+        assert len(_profiles(directory)) == 1
+
+    def test_header_of_anonymous_request_is_ignored(self, tmpdir):
+        directory = str(tmpdir)
+        request_profiler = RequestProfiler(
+            directory, slow_threshold=0, header_enabled=True
+        )
+        profile = request_profiler.start({PROFILE_HEADER: '1'})
+        request_profiler.finish(profile, 0.1, 'GET /v2.0/ports')
+        assert _profiles(directory) == []
+
+    def test_header_is_ignored_unless_enabled(self, tmpdir):
+        request_profiler = RequestProfiler(str(tmpdir))
+        assert request_profiler.start({PROFILE_HEADER: '1'}) is None
+
+    def test_oldest_profiles_are_removed(self, tmpdir):
+        directory = str(tmpdir)
+        request_profiler = RequestProfiler(
+            directory, sample_rate=1, max_profiles=2
+        )
+        for i in range(3):
+            profile = request_profiler.start({})
+            request_profiler.finish(profile, i, 'GET /{}'.format(i))
+            if i == 0:
+                first = _profiles(directory)[0]
+                os.utime(os.path.join(directory, first), (0, 0))
+        profiles = _profiles(directory)
+        assert len(profiles) == 2
+        assert first not in profiles
+
+    def test_commands_are_not_recorded_outside_of_profiles(self):
+        profiler.record_commands(['LsListCommand()'], 0.1)
+        assert getattr(profiler._local, 'profile', None) is None
@@ -0,0 +1,75 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+from handlers.response_cache import ResponseCache
+
+
+class TestResponseCache(object):
+    def test_body_is_served_for_its_version_only(self):
+        cache = ResponseCache(100)
+        cache.put('/networks', '"1"', b'{}')
+
+        assert cache.get('/networks', '"1"') == b'{}'
+        assert cache.get('/networks', '"2"') is None
+        assert cache.get('/ports', '"1"') is None
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+
+    def test_least_recently_used_bodies_are_evicted(self):
+        cache = ResponseCache(10)
+        cache.put('/a', '"1"', b'aaaa')
+        cache.put('/b', '"1"', b'bbbb')
+        cache.get('/a', '"1"')
+        cache.put('/c', '"1"', b'cccc')
+
+        assert cache.get('/b', '"1"') is None
+        assert cache.get('/a', '"1"') == b'aaaa'
+        assert cache.get('/c', '"1"') == b'cccc'
+        stats = cache.stats()
+        assert stats['evictions'] == 1
+        assert stats['entries'] == 2
+        assert stats['size'] == 8
+
+    def test_replaced_body_is_not_counted_twice(self):
+        cache = ResponseCache(10)
+        cache.put('/a', '"1"', b'aaaa')
+        cache.put('/a', '"2"', b'aaaaaa')
+
+        assert cache.stats()['size'] == 6
+        assert cache.get('/a', '"2"') == b'aaaaaa'
+
+    def test_collected_chunks_are_kept_once_sent(self):
+        cache = ResponseCache(10)
+        chunks = cache.collect('/a', '"1"', iter([b'{"a": ', b'1}']))
+
+        assert next(chunks) == b'{"a": '
+        assert cache.get('/a', '"1"') is None
+        assert list(chunks) == [b'1}']
+        assert cache.get('/a', '"1"') == b'{"a": 1}'
+
+    def test_too_large_body_is_not_kept(self):
+        cache = ResponseCache(4)
+        cache.put('/a', '"1"', b'aaaaa')
+        assert list(cache.collect('/b', '"1"', iter([b'bbb', b'bb']))) == [
+            b'bbb',
+            b'bb',
+        ]
+
+        assert cache.stats()['entries'] == 0
@@ -0,0 +1,152 @@
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+from __future__ import absolute_import
+
+import threading
+import uuid
+
+import mock
+from ovs.db import data
+from ovs.db import types
+
+import constants as ovnconst
+import ovn_connection
+
+from ovndb.table_versions import TableVersions
+
+
+class Table(object):
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+
+
+def _datum(value):
+    return data.Datum(
+        types.Type(types.BaseType(types.StringType)),
+        {data.Atom(types.StringType, value): None},
+    )
+
+
+class Row(object):
+    def __init__(self, table, name='', row_uuid=None):
+        self._table = table
+        self.uuid = row_uuid or uuid.uuid4()
+        self._data = {'name': _datum(name)}
+        table.rows[self.uuid] = self
+
+    def set_name(self, name):
+        self._data = {'name': _datum(name)}
+
+
+def _tables():
+    return {
+        name: Table(name) for name in (ovnconst.TABLE_LS, ovnconst.TABLE_LSP)
+    }
+
+
+class TestTableVersions(object):
+    def test_version_changes_with_the_rows_of_its_tables(self):
+        tables = _tables()
+        versions = TableVersions(tables)
+        ls_version = versions.version([ovnconst.TABLE_LS])
+        both_version = versions.version(
+            [ovnconst.TABLE_LS, ovnconst.TABLE_LSP]
+        )
+
+        lsp = Row(tables[ovnconst.TABLE_LSP])
+        versions.notify('create', lsp)
+
+        assert versions.version([ovnconst.TABLE_LS]) == ls_version
+        changed_version = versions.version(
+            [ovnconst.TABLE_LS, ovnconst.TABLE_LSP]
+        )
+        assert changed_version != both_version
+
+        lsp.set_name('port')
+        versions.notify('update', lsp)
+        assert (
+            versions.version([ovnconst.TABLE_LS, ovnconst.TABLE_LSP])
+            != changed_version
+        )
+
+        del tables[ovnconst.TABLE_LSP].rows[lsp.uuid]
+        versions.notify('delete', lsp)
+        assert (
+            versions.version([ovnconst.TABLE_LS, ovnconst.TABLE_LSP])
+            == both_version
+        )
+
+    def test_rows_dropped_without_notification(self):
+        tables = _tables()
+        versions = TableVersions(tables)
+        lsp = Row(tables[ovnconst.TABLE_LSP])
+        versions.notify('create', lsp)
+        version = versions.version([ovnconst.TABLE_LSP])
+
+        tables[ovnconst.TABLE_LSP].rows.clear()
+        assert versions.version([ovnconst.TABLE_LSP]) != version
+
+    def test_notified_rows_not_digested_again(self):
+        tables = _tables()
+        versions = TableVersions(tables)
+        lsp = Row(tables[ovnconst.TABLE_LSP])
+        versions.notify('create', lsp)
+
+        with mock.patch(
+            'ovndb.table_versions._row_hash', side_effect=AssertionError
+        ):
+            versions.version([ovnconst.TABLE_LSP])
+
+    def test_replicas_of_same_rows_have_same_version(self):
+        leader_tables = _tables()
+        leader = TableVersions(leader_tables)
+        follower_tables = _tables()
+        follower = TableVersions(follower_tables)
+        row_uuid = uuid.uuid4()
+        # The leader saw the row created and renamed, the follower connected
+        # afterwards and got it as it is
+        leader_row = Row(leader_tables[ovnconst.TABLE_LS], 'a', row_uuid)
+        leader.notify('create', leader_row)
+        leader_row.set_name('b')
+        leader.notify('update', leader_row)
+        follower_row = Row(follower_tables[ovnconst.TABLE_LS], 'b', row_uuid)
+        follower.notify('create', follower_row)
+
+        assert leader.version([ovnconst.TABLE_LS]) == follower.version(
+            [ovnconst.TABLE_LS]
+        )
+
+    def test_read_under_connection_lock(self):
+        tables = _tables()
+        versions = TableVersions(tables)
+        lock = threading.Lock()
+        api = mock.Mock(ovsdb_connection=mock.Mock(lock=lock))
+
+        def version(table_names):
+            assert lock.locked()
+            return 'version'
+
+        versions.version = version
+        with mock.patch('ovn_connection._table_versions', versions):
+            assert (
+                ovn_connection.table_version(api, [ovnconst.TABLE_LS])
+                == 'version'
+            )
+        with mock.patch('ovn_connection._table_versions', None):
+            assert ovn_connection.table_version(api, []) is None